@@ -0,0 +1,397 @@
+"""
+Frame analyzers for the shared decode pipeline (frame_pipeline.py).
+
+Each analyzer holds the per-frame logic of one forensic module; the job
+tasks in app.py wire them into a FramePipeline and persist the results.
+"""
+import os
+import re
+import time
+
+import cv2
+
+import ocr_engines
+import ocr_pool
+from overlay_roi import Binarizer, crop_roi
+from result_cache import cached_map
+from roi_change import RoiChangeDetector, fill_forward
+from plate_tracker import PlateTracker
+from frame_pipeline import Analyzer, AtFrames, EveryNFrames, EverySeconds
+
+
+# ======================================================
+#           TIMESTAMP / SPEED OVERLAY ANALYZERS
+# ======================================================
+N_OVERLAY_FRAMES = 5
+
+
+def overlay_frame_indices(total_frames, n_frames=N_OVERLAY_FRAMES):
+    """n frames spread over the last 30% of the video."""
+    start_frame = int(total_frames * 0.70)
+    step = max(1, int((total_frames - start_frame) / n_frames))
+    return [start_frame + i * step for i in range(n_frames)]
+
+
+# ROI geometry and preprocessing, as recorded in cached-result keys
+TIMESTAMP_ROI = {"y": [0.82, 1.0], "x": [0.0, 1.0]}
+SPEED_ROI = {"y": [0.80, 1.0], "x": [0.55, 1.0]}
+BINARIZE_PARAMS = "gray,resize2.5,otsu"
+TIMESTAMP_TESSERACT_CONFIG = ocr_engines.TESSERACT_PRESETS["timestamp"]
+SPEED_TESSERACT_CONFIG = ocr_engines.TESSERACT_PRESETS["speed"]
+
+# Full-frame preview JPEGs next to the overlay crops (debugging only)
+DEBUG_PREVIEWS = os.environ.get("DEBUG_PREVIEWS", "False") == "True"
+
+
+# Year-first (2024-03-15) or day-first (15-03-2024 / 15/03/2024) dates
+DATE_PATTERN = r"(?:\d{4}[-/]\d{2}[-/]\d{2}|\d{2}[-/]\d{2}[-/]\d{4})"
+
+
+def score_timestamp_text(raw):
+    """Return (final_text, confidence) for a raw OCR string."""
+    text = " ".join(raw.split())
+
+    full_match = re.search(DATE_PATTERN + r"\s+\d{2}:\d{2}:\d{2}", text)
+    date_only = re.search(DATE_PATTERN, text)
+    partial = re.search(r"\d{4}[-/]\d{2}|\d{2}[-/]\d{4}", text)
+
+    if full_match:
+        return full_match.group(), 100
+    if date_only:
+        return date_only.group(), 80
+    if partial:
+        return partial.group(), 50
+    return "No text detected", 0
+
+
+class TimestampAnalyzer(Analyzer):
+    """OCR of the date/time overlay in the bottom 18% of the frame."""
+    name = "timestamp"
+
+    def __init__(self, filename, artifacts, n_frames=N_OVERLAY_FRAMES, cache=None, full_previews=None, roi=None):
+        """
+        artifacts: the job's artifacts.JobArtifacts directory for previews.
+        full_previews: also save each sampled full frame (default DEBUG_PREVIEWS).
+        roi: overlay region (a camera profile's; default TIMESTAMP_ROI).
+        """
+        self.filename = filename
+        self.overlay_roi = roi or TIMESTAMP_ROI
+        self.artifacts = artifacts
+        self.n_frames = n_frames
+        self.cache = cache
+        self.full_previews = DEBUG_PREVIEWS if full_previews is None else full_previews
+        self.binarize = Binarizer()
+        self.change = RoiChangeDetector()
+        self.crops = []
+
+    def start(self, video_info):
+        super().start(video_info)
+        self.policy = AtFrames(overlay_frame_indices(video_info["total_frames"], self.n_frames))
+
+    def roi(self, frame):
+        # Only the overlay strip leaves the decode thread unless full previews are wanted
+        return frame if self.full_previews else crop_roi(frame, self.overlay_roi)
+
+    def process(self, idx, data):
+        full_path = None
+        if self.full_previews:
+            full_name = f"{self.filename}_full_{idx}.jpg"
+            cv2.imwrite(self.artifacts.file(full_name), data)
+            full_path = self.artifacts.rel(full_name)
+            crop = crop_roi(data, self.overlay_roi, copy=False)
+        else:
+            crop = data
+
+        crop_name = f"{self.filename}_crop_{idx}.jpg"
+        cv2.imwrite(self.artifacts.file(crop_name), crop)
+
+        # None = unchanged since the last OCR'd crop; reuse that reading
+        binary = self.binarize(crop) if self.change.changed(crop) else None
+        self.crops.append((idx, full_path, self.artifacts.rel(crop_name), binary))
+
+    def finish(self):
+        # ===== OCR WITH ERROR HANDLING (one batch, cached per frame) =====
+        changed = [c for c in self.crops if c[3] is not None]
+        try:
+            texts = cached_map(
+                self.cache, "ocr", [(c[0], self.overlay_roi) for c in changed],
+                {"pre": BINARIZE_PARAMS, "config": TIMESTAMP_TESSERACT_CONFIG},
+                ocr_engines.engine_version(),
+                lambda todo: ocr_pool.readtext_batch(
+                    [changed[i][3] for i in todo], tesseract_config=TIMESTAMP_TESSERACT_CONFIG
+                )
+            ) if changed else []
+            texts = iter(texts)
+            texts = fill_forward([next(texts) if c[3] is not None else None for c in self.crops], "")
+        except Exception as e:
+            print(f"OCR error for timestamp frames: {e}")
+            texts = [""] * len(self.crops)
+
+        ocr_results = []
+        for (idx, full_path, crop_path, _), raw in zip(self.crops, texts):
+            raw = raw.strip()
+            final_text, confidence = score_timestamp_text(raw)
+            ocr_results.append({
+                "frame": idx,
+                "text": final_text,
+                "confidence": confidence,  # dynamic value 100, 80, 50
+                "raw": raw,
+                "full_path": full_path,
+                "crop_path": crop_path
+            })
+        return {"observations": ocr_results, "ocr_cache": self.change.stats()}
+
+
+class SpeedAnalyzer(Analyzer):
+    """OCR of the speed readout in the bottom-right of the frame."""
+    name = "speed"
+
+    def __init__(self, n_frames=N_OVERLAY_FRAMES, cache=None, roi=None):
+        self.n_frames = n_frames
+        self.overlay_roi = roi or SPEED_ROI
+        self.cache = cache
+        self.crops = []
+        self.change = RoiChangeDetector()
+        self.binarize = Binarizer()
+
+    def start(self, video_info):
+        super().start(video_info)
+        self.policy = AtFrames(overlay_frame_indices(video_info["total_frames"], self.n_frames))
+
+    def roi(self, frame):
+        return crop_roi(frame, self.overlay_roi)
+
+    def process(self, idx, speed_crop):
+        # None = unchanged since the last OCR'd crop; reuse that reading
+        self.crops.append((idx, self.binarize(speed_crop) if self.change.changed(speed_crop) else None))
+
+    def finish(self):
+        # ===== SPEED OCR WITH ERROR HANDLING =====
+        changed = [(idx, c) for idx, c in self.crops if c is not None]
+        try:
+            texts = cached_map(
+                self.cache, "ocr", [(idx, self.overlay_roi) for idx, _ in changed],
+                {"pre": BINARIZE_PARAMS, "config": SPEED_TESSERACT_CONFIG},
+                ocr_engines.engine_version(),
+                lambda todo: ocr_pool.readtext_batch(
+                    [changed[i][1] for i in todo], tesseract_config=SPEED_TESSERACT_CONFIG
+                )
+            ) if changed else []
+            texts = iter(texts)
+            texts = fill_forward([next(texts) if c is not None else None for _, c in self.crops], "")
+        except Exception as e:
+            print(f"OCR error for speed frames: {e}")
+            texts = []
+
+        # One observation per sampled frame; speed is None when unreadable
+        speed_results = []
+        for (idx, _), speed_txt in zip(self.crops, texts):
+            m = re.search(r"\d{1,3}", speed_txt)
+            speed_results.append({
+                "frame": idx,
+                "speed": int(m.group()) if m else None,
+                "raw": speed_txt.strip(),
+            })
+        return {"observations": speed_results, "ocr_cache": self.change.stats()}
+
+
+# ======================================================
+#              LICENSE PLATE ANALYZER
+# ======================================================
+PLATE_TESSERACT_CONFIG = ocr_engines.TESSERACT_PRESETS["plate"]
+
+
+def plate_gray(plate_crop):
+    """Grayscale plate crop, as read_plate() has always converted it."""
+    return cv2.cvtColor(plate_crop, cv2.COLOR_BGR2GRAY)
+
+
+def read_plate(plate_crop):
+    """Preprocess an RGB plate crop and OCR it; returns the cleaned text."""
+    return read_plate_gray(plate_gray(plate_crop))
+
+
+def read_plate_gray(plate_crop_gray):
+    """read_plate() for a crop already converted by plate_gray() (OCR pool workers)."""
+    plate_crop_gray = cv2.resize(plate_crop_gray, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
+    plate_crop_gray = cv2.bilateralFilter(plate_crop_gray, 11, 17, 17)
+    _, plate_crop_thresh = cv2.threshold(plate_crop_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+
+    plate_text = ocr_engines.tesseract_text(plate_crop_thresh, config=PLATE_TESSERACT_CONFIG).strip()
+
+    cleaned = plate_text.replace(" ", "")
+    match = re.match(r"([A-Z]{2,3})([0-9]{2,4})([A-Z]{1,3})", cleaned)
+    if match:
+        plate_text = " ".join(match.groups())
+    return plate_text
+
+
+DEFAULT_PLATE_STRIDE = 15
+
+# Sampled frames are sent to YOLO in batches of up to YOLO_BATCH_SIZE; a
+# partial batch is flushed once its oldest frame has waited
+# YOLO_BATCH_MAX_LATENCY seconds, whether or not another frame arrives
+# (sparse strides, seeks over long gaps).
+YOLO_BATCH_SIZE = int(os.environ.get("YOLO_BATCH_SIZE", 8))
+YOLO_BATCH_MAX_LATENCY = float(os.environ.get("YOLO_BATCH_MAX_LATENCY", 2.0))
+
+
+PLATE_DETECTION_CONF = 0.3
+
+
+def predict_batch(model, frames, conf=PLATE_DETECTION_CONF):
+    """One YOLO predict() call over a list of RGB frames; results in input order."""
+    if not frames:
+        return []
+    return model.predict(list(frames), conf=conf, verbose=False)
+
+
+def boxes_from_result(result):
+    """YOLO result -> [[x1, y1, x2, y2, confidence], ...] (JSON-friendly)."""
+    if result is None or getattr(result, "boxes", None) is None:
+        return []
+    boxes = []
+    for box in result.boxes:
+        try:
+            x1, y1, x2, y2 = map(int, box.xyxy[0])
+            boxes.append([x1, y1, x2, y2, float(box.conf[0])])
+        except Exception:
+            continue
+    return boxes
+
+
+def draw_detections(frame_rgb, boxes):
+    """BGR copy of the frame with each box and its confidence drawn on it."""
+    image = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2BGR)
+    for x1, y1, x2, y2, conf in boxes:
+        cv2.rectangle(image, (x1, y1), (x2, y2), (0, 255, 0), 2)
+        cv2.putText(image, f"plate {conf:.2f}", (x1, max(0, y1 - 6)),
+                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 255, 0), 2)
+    return image
+
+
+class PlateAnalyzer(Analyzer):
+    """
+    YOLO plate detection on every `stride`-th frame, or every
+    `stride_seconds` of video when that is given instead.
+
+    Detections are linked into per-vehicle tracks (plate_tracker.py); only
+    each track's best crops are OCR'd and the readings are voted per track.
+    With a cache, frames and crops seen before (same evidence, same model
+    and parameters) skip YOLO and OCR.
+    """
+    name = "plates"
+
+    def __init__(self, model, stride=DEFAULT_PLATE_STRIDE, stride_seconds=None,
+                 batch_size=None, max_latency=None, cache=None, model_version=None):
+        self.model = model
+        self.cache = cache
+        self.model_version = model_version
+        if stride_seconds:
+            self.policy = EverySeconds(stride_seconds)
+        else:
+            # Frames 15, 30, 45, ... counted from 1, as the original scanner did
+            self.policy = EveryNFrames(stride, offset=stride - 1)
+        self.batch_size = max(1, batch_size or YOLO_BATCH_SIZE)
+        self.max_latency = YOLO_BATCH_MAX_LATENCY if max_latency is None else max_latency
+        self.queue_size = max(self.queue_size, self.batch_size)
+        self.best_result = None
+        self.best_confidence = 0.0
+        self.tracker = PlateTracker(self._read_plates)
+        self._batch = []
+        self._batch_started = None
+
+    def roi(self, frame):
+        return cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+
+    def _detection_key(self, idx):
+        return self.cache.key("yolo", idx, "full", {"conf": PLATE_DETECTION_CONF}, self.model_version)
+
+    def process(self, idx, frame_rgb):
+        if self.cache is not None:
+            cached = self.cache.cache.get_many([self._detection_key(idx)])
+            if cached:
+                self._handle_detections(idx, frame_rgb, next(iter(cached.values())))
+                return
+
+        if not self._batch:
+            self._batch_started = time.monotonic()
+        self._batch.append((idx, frame_rgb))
+        if (len(self._batch) >= self.batch_size
+                or time.monotonic() - self._batch_started >= self.max_latency):
+            self._flush()
+
+    def wait_timeout(self):
+        if not self._batch:
+            return None
+        return max(0.0, self._batch_started + self.max_latency - time.monotonic())
+
+    def idle(self):
+        # The partial batch reached max_latency while no frame came in
+        if self._batch:
+            self._flush()
+
+    def _flush(self):
+        batch, self._batch = self._batch, []
+        results = predict_batch(self.model, [frame for _, frame in batch])
+        found = [boxes_from_result(r) for r in results]
+        if self.cache is not None:
+            self.cache.cache.put_many(
+                [(self._detection_key(idx), boxes) for (idx, _), boxes in zip(batch, found)],
+                self.cache.evidence_sha, "yolo"
+            )
+        for (idx, frame_rgb), boxes in zip(batch, found):
+            self._handle_detections(idx, frame_rgb, boxes)
+
+    def _read_plates(self, items):
+        """items: [(gray crop, frame index, box)] -> plate texts, OCR'd across the pool."""
+        return cached_map(
+            self.cache, "plate_ocr", [(idx, list(box)) for _, idx, box in items],
+            {"config": PLATE_TESSERACT_CONFIG}, ocr_engines.tesseract_version(),
+            lambda todo: ocr_pool.read_plates([items[i][0] for i in todo])
+        )
+
+    def _handle_detections(self, idx, frame_rgb, boxes):
+        if not boxes:
+            self.tracker.update(idx, [])
+            return
+
+        current_confidence = sum(b[4] for b in boxes) / len(boxes)
+        if current_confidence > self.best_confidence:
+            self.best_confidence = current_confidence
+            self.best_result = draw_detections(frame_rgb, boxes)
+
+        h, w = frame_rgb.shape[:2]
+        detections = []
+        for x1, y1, x2, y2, box_confidence in boxes:
+            x1 = max(0, x1 - 5)
+            y1 = max(0, y1 - 5)
+            x2 = min(w, x2 + 5)
+            y2 = min(h, y2 + 5)
+
+            plate_crop = frame_rgb[y1:y2, x1:x2]
+            if plate_crop.size == 0:
+                continue
+            # Tracks keep (and the OCR pool receives) compact grayscale crops
+            plate_crop = plate_gray(plate_crop)
+
+            detections.append(((x1, y1, x2, y2), box_confidence, plate_crop))
+
+        self.tracker.update(idx, detections)
+
+    def finish(self):
+        if self._batch:
+            self._flush()
+        tracks = self.tracker.close()
+        plate_by_track = {t["track_id"]: t["plate_text"] for t in tracks}
+        observations = [
+            {**o, "plate_text": plate_by_track.get(o["track_id"])}
+            for o in self.tracker.observations
+        ]
+        return {
+            "best_result": self.best_result,
+            "best_confidence": self.best_confidence,
+            "tracks": tracks,
+            "observations": observations,
+            "ocr_calls": self.tracker.ocr_calls,
+        }
@@ -3,21 +3,34 @@ load_dotenv()
 import os
 import re
 import json
+import time
 import sqlite3
 import hashlib
 from datetime import datetime
 from functools import wraps
 import cv2
-import pytesseract
-# YOLO object detection (disabled to reduce image size)
-try:
-    from ultralytics import YOLO
-    model = YOLO('yolov8n.pt')
-    YOLO_AVAILABLE = True
-except ImportError:
+import ocr_engines
+import ocr_pool
+import evidence_hashing
+import container_structure
+import jobs
+import analyzers
+import timestamp_timeline
+import result_cache
+import observations
+import overlay_calibration
+import migrations
+import db_pool
+import repository
+import artifacts
+import reports
+import atexit
+from frame_pipeline import FramePipeline
+# YOLO object detection (models load lazily via model_registry)
+import model_registry
+YOLO_AVAILABLE = model_registry.is_available()
+if not YOLO_AVAILABLE:
     print("YOLO not available - object detection disabled")
-    model = None
-    YOLO_AVAILABLE = False
 
 from flask import (
     Flask,
@@ -28,7 +41,12 @@ from flask import (
     flash,
     session,
     send_file,
-    send_from_directory
+    send_from_directory,
+    Response,
+    stream_with_context,
+    stream_template,
+    g,
+    has_app_context
 )
 
 from werkzeug.utils import secure_filename
@@ -58,11 +76,7 @@ def allowed_file(filename):
 # ======================================================
 def generate_file_hash(filepath):
     """Generate SHA-256 hash of a file"""
-    sha256 = hashlib.sha256()
-    with open(filepath, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            sha256.update(chunk)
-    return sha256.hexdigest()
+    return evidence_hashing.hash_file(filepath)
 
 
 def get_file_hash(filepath):
@@ -99,6 +113,9 @@ CROP_FOLDER = os.path.join(BASE_DIR, "static", "crops")
 os.makedirs(CROP_FOLDER, exist_ok=True)
 app.config["CROP_FOLDER"] = CROP_FOLDER
 
+# Jobs write to crops/<evidence>/<job id>/ (retention + quotas: artifacts.py)
+artifact_store = artifacts.ArtifactStore(CROP_FOLDER)
+
 
 # ======================================================
 #          MAX UPLOAD SIZE
@@ -122,83 +139,64 @@ ts = URLSafeTimedSerializer(app.secret_key)
 # ======================================================
 #                  DATABASE CONNECTOR
 # ======================================================
-def get_db():
+def _connect_db():
     conn = sqlite3.connect(DB_PATH, timeout=30, check_same_thread=False)
     conn.row_factory = sqlite3.Row
-    conn.execute("PRAGMA journal_mode=WAL")
+    migrations.apply_pragmas(conn)  # once per connection, not per get_db()
     return conn
 
 
-def init_db_schema():
-    with get_db() as conn:
-        cur = conn.cursor()
+db_connections = db_pool.ConnectionPool(_connect_db)
 
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT UNIQUE,
-                username TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS uploads (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL UNIQUE,
-                original_name TEXT,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS tamper_records (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL UNIQUE,
-                sha256 TEXT NOT NULL,
-                uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS license_results (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL UNIQUE,
-                plate_text TEXT,
-                confidence REAL,
-                detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS timestamps (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL UNIQUE,
-                timestamp_text TEXT NOT NULL,
-                confidence REAL DEFAULT 0.0,
-                consistency_score REAL DEFAULT 0.0,
-                has_drift INTEGER DEFAULT 0,
-                frame_count INTEGER DEFAULT 0,
-                raw_ocr_results TEXT,
-                extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-
-        cur.execute("""
-            CREATE TABLE IF NOT EXISTS tampers (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                filename TEXT NOT NULL UNIQUE,
-                tamper_status TEXT,
-                checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
 
-        conn.commit()
+def get_db():
+    """
+    Pooled connection. Inside a request every call shares one connection,
+    released at app-context teardown; elsewhere (job workers, threads)
+    close() returns it to the pool.
+    """
+    if has_app_context():
+        if "db_conn" not in g:
+            g.db_conn = db_connections.acquire()
+        return db_pool.SharedConnection(db_connections, g.db_conn._conn)
+    return db_connections.acquire()
+
+
+@app.teardown_appcontext
+def release_db(exc):
+    conn = g.pop("db_conn", None)
+    if conn is not None:
+        conn.close()
+
+
+def close_db_pool():
+    """Close pooled connections at worker shutdown."""
+    stats = db_connections.stats()
+    closed = db_connections.close_all()
+    print(f"🗄️ DB pool closed {closed} connection(s) (pid {os.getpid()}, stats {stats})")
+
+
+atexit.register(close_db_pool)
+
 
+# Uploads, tamper, timestamp and plate records (DB_BACKEND: sqlite / mysql / memory);
+# on SQLite it shares get_db()'s pooled, per-request connection
+repo = repository.create_repository(sqlite_acquire=get_db)
 
-if not os.path.exists(DB_PATH):
-    init_db_schema()
+
+def init_db_schema():
+    """Bring dashcam.db (and a separate evidence store, if used) up to the latest schema."""
+    conn = get_db()
+    try:
+        migrations.migrate(conn)
+    finally:
+        conn.close()
+    if repo.backend.owns_schema:
+        repo.init_schema()
+
+
+# Runs on every start; only migrations not yet recorded in schema_version apply.
+init_db_schema()
 
 
 
@@ -374,6 +372,48 @@ def start_analysis():
 
 
 
+def ingest_evidence(file):
+    """
+    Save an uploaded video under a unique name and record its baseline
+    hash, segments and container structure. Returns (filename, path).
+    """
+    # ======================================================
+    # 🔐 FIX: FORCE UNIQUE FILENAME (CRITICAL)
+    # ======================================================
+    original_filename = secure_filename(file.filename)
+    name, ext = os.path.splitext(original_filename)
+    unique_filename = f"{name}_{int(datetime.now().timestamp())}{ext}"
+
+    save_path = os.path.join(app.config["UPLOAD_FOLDER"], unique_filename)
+
+    # 🔐 1️⃣ Save + generate BASELINE HASH in one pass (CRITICAL)
+    file_hash, file_size, segments = evidence_hashing.ingest_upload(file, save_path)
+    now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+    # 🔹 2️⃣ Record upload (NEW evidence every time)
+    # 🔐 3️⃣ Store BASELINE HASH (first acquisition only per filename)
+    baseline_created = repo.add_upload(unique_filename, file_hash, now)
+
+    conn = get_db()
+
+    # 🔐 Remember which file identity the baseline was read from
+    evidence_hashing.record_verification(
+        conn, unique_filename, file_hash, evidence_hashing.file_identity(save_path)
+    )
+    if baseline_created:
+        evidence_hashing.store_segments(conn, unique_filename, file_size, segments)
+
+    # 🧬 4️⃣ Container structure (box tree / GOP index, no decoding)
+    structure = container_structure.analyze_and_store(conn, unique_filename, save_path, file_hash)
+
+    conn.commit()
+    conn.close()
+
+    if any(f["severity"] != "info" for f in structure["flags"]):
+        flash(f"Container structure: {structure['verdict']} — see tamper details.", "warning")
+    return unique_filename, save_path
+
+
 @app.route("/upload_video", methods=["GET", "POST"])
 @login_required
 def upload_video():
@@ -389,37 +429,7 @@ def upload_video():
             flash("Invalid file format.", "danger")
             return redirect(request.url)
 
-        # ======================================================
-        # 🔐 FIX: FORCE UNIQUE FILENAME (CRITICAL)
-        # ======================================================
-        original_filename = secure_filename(file.filename)
-        name, ext = os.path.splitext(original_filename)
-        unique_filename = f"{name}_{int(datetime.now().timestamp())}{ext}"
-
-        save_path = os.path.join(app.config["UPLOAD_FOLDER"], unique_filename)
-        file.save(save_path)
-
-        # 🔐 1️⃣ Generate BASELINE HASH (CRITICAL)
-        file_hash = generate_file_hash(save_path)
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-
-        conn = get_db()
-        cur = conn.cursor()
-
-        # 🔹 2️⃣ Record upload (NEW evidence every time)
-        cur.execute("""
-            INSERT INTO uploads (filename, uploaded_at)
-            VALUES (?, ?)
-        """, (unique_filename, now))
-
-        # 🔐 3️⃣ Store BASELINE HASH (first acquisition only per filename)
-        cur.execute("""
-            INSERT OR IGNORE INTO tamper_records (filename, sha256)
-            VALUES (?, ?)
-        """, (unique_filename, file_hash))
-
-        conn.commit()
-        conn.close()
+        unique_filename, _ = ingest_evidence(file)
 
         # 🔄 Reset workflow/session flags
         session["uploaded_video"] = unique_filename
@@ -430,11 +440,7 @@ def upload_video():
         return redirect(url_for("dashboard"))
 
     # ---------- LIST VIDEOS ----------
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT filename, uploaded_at FROM uploads ORDER BY uploaded_at DESC")
-    rows = cur.fetchall()
-    conn.close()
+    rows = repo.list_uploads()
 
     videos = []
     for r in rows:
@@ -469,13 +475,17 @@ def delete_video(video_id):
     video_path = os.path.join(app.config["UPLOAD_FOLDER"], video_id)
     base_name = os.path.splitext(video_id)[0]
 
+    repo.delete_evidence(video_id)
+
     conn = get_db()
     cur = conn.cursor()
-    cur.execute("DELETE FROM uploads WHERE filename=?", (video_id,))
-    cur.execute("DELETE FROM tamper_records WHERE filename=?", (video_id,))
-    cur.execute("DELETE FROM timestamps WHERE filename=?", (video_id,))
-    cur.execute("DELETE FROM tampers WHERE filename=?", (video_id,))
-    cur.execute("DELETE FROM license_results WHERE filename=?", (video_id,))
+    cur.execute("DELETE FROM hash_verifications WHERE filename=?", (video_id,))
+    cur.execute("DELETE FROM tamper_merkle WHERE filename=?", (video_id,))
+    cur.execute("DELETE FROM tamper_segments WHERE filename=?", (video_id,))
+    cur.execute("DELETE FROM timestamp_drift WHERE filename=?", (video_id,))
+    cur.execute("DELETE FROM timestamp_anomalies WHERE filename=?", (video_id,))
+    container_structure.delete(conn, video_id)
+    observations.delete_all(conn, video_id)
     conn.commit()
     conn.close()
 
@@ -485,11 +495,14 @@ def delete_video(video_id):
         except Exception:
             pass
 
+    artifact_store.delete_evidence(video_id)
     try:
+        # Flat files written before per-job artifact folders
         for f in os.listdir(app.config["CROP_FOLDER"]):
-            if f.startswith(base_name):
+            path = os.path.join(app.config["CROP_FOLDER"], f)
+            if f.startswith(base_name) and os.path.isfile(path):
                 try:
-                    os.remove(os.path.join(app.config["CROP_FOLDER"], f))
+                    os.remove(path)
                 except Exception:
                     pass
     except FileNotFoundError:
@@ -506,32 +519,87 @@ def delete_video(video_id):
 #        TIMESTAMP EXTRACTION (WITH ERROR HANDLING)
 # ======================================================
 
-@app.route("/timestamp_extraction")
+@app.route("/timestamp_extraction", methods=["GET", "POST"])
 @login_required
 def timestamp_extraction():
-    # ========== CHECK TESSERACT FIRST ==========
-    try:
-        # Import pytesseract FIRST
-        import pytesseract
-        
-        # Set Tesseract path based on OS
-        import os
-        if os.name == 'nt':  # Windows
-            pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-        else:  # Linux/Mac
-            pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
-        
-        # Quick test to verify Tesseract works
-        from PIL import Image, ImageDraw
-        test_img = Image.new('RGB', (100, 30), color='white')
-        d = ImageDraw.Draw(test_img)
-        d.text((10, 10), "TEST", fill='black')
-        pytesseract.image_to_string(test_img, config='--psm 6')
-        print("✅ Tesseract OCR is available")
-        
-    except pytesseract.pytesseract.TesseractNotFoundError:
-        # Tesseract not installed - show user-friendly error
+    UP = app.config["UPLOAD_FOLDER"]
+    args = request.form if request.method == "POST" else request.args
+
+    # ========== THIS SESSION'S VIDEO ==========
+    # filename= picks another stored video; never "whichever is newest on
+    # disk", which is someone else's upload when analysts work concurrently
+    filename = args.get("filename") or session.get("uploaded_video")
+    if (not filename or filename != secure_filename(filename) or not allowed_file(filename)
+            or not os.path.isfile(os.path.join(UP, filename))):
         return render_template(
+            "timestamp_extraction.html",
+            timestamps=["❌ No uploaded video found."],
+            previews=[],
+            show_continue_button=True
+        )
+    session["uploaded_video"] = filename
+
+    # GET only shows the form: a reload or back-navigation must not start a job
+    if request.method == "GET":
+        return render_template(
+            "timestamp_extraction.html",
+            start_filename=filename,
+            start_mode=args.get("mode", "quick"),
+            timestamps=[],
+            previews=[]
+        )
+
+    # mode=timeline samples the clock across the whole clip (drift / jumps)
+    params = {"filename": filename}
+    # previews=full also saves the sampled full frames (debugging)
+    if args.get("previews") == "full":
+        params["full_previews"] = True
+    if args.get("mode") == "timeline":
+        params["mode"] = "timeline"
+        try:
+            params["sample_seconds"] = max(0.1, float(args.get("sample_seconds", "")))
+        except ValueError:
+            pass
+
+    # ========== HAND OFF TO BACKGROUND WORKER ==========
+    conn = get_db()
+    job_id = jobs.enqueue(conn, "timestamp_extraction", params, owner=session["username"])
+    conn.close()
+
+    return redirect(url_for("job_status", job_id=job_id))
+
+
+def camera_profile(video_path):
+    """Overlay ROIs for the video's camera (see overlay_calibration)."""
+    with get_db() as conn:
+        return overlay_calibration.profile_for_video(conn, video_path)
+
+
+def recheck_overlay(job, video_path, profile, results, make_analyzers, start, end):
+    """
+    When the profile's timestamp ROI read nothing, re-run the overlay
+    analyzers (make_analyzers(profile)) with the ROIs retry_profile picks
+    once they read a timestamp on a few sampled frames; returns the results
+    to use.
+    """
+    with get_db() as conn:
+        retry = overlay_calibration.retry_profile(conn, profile, video_path,
+                                                  results["timestamp"]["observations"])
+    if retry is None:
+        return results
+    job.progress(start, f"No timestamp at the camera's usual position; retrying with {retry['source']} regions")
+    pipeline = FramePipeline(video_path)
+    for analyzer in make_analyzers(retry):
+        pipeline.register(analyzer)
+    return {**results, **pipeline.run(progress=pipeline_progress(job, start, end))}
+
+
+@jobs.task("timestamp_extraction")
+def run_timestamp_extraction(job, filename, mode="quick", sample_seconds=None, full_previews=None):
+    # ========== CHECK TESSERACT FIRST (once per worker, cached) ==========
+    if not ocr_engines.tesseract_available():
+        # Tesseract not installed - show user-friendly error
+        return jobs.result_page(
             "timestamp_extraction.html",
             timestamps=["❌ Tesseract OCR not installed. Cannot extract timestamps."],
             previews=[],
@@ -544,141 +612,106 @@ def timestamp_extraction():
             show_continue_button=True,
             tesseract_error=True
         )
-    except Exception as e:
-        print(f"⚠️ Tesseract warning: {e}")
-        # Continue anyway - might work for some operations
-    
-    # ========== REST OF FUNCTION ==========
-    from collections import Counter
-    import os, re, cv2
 
+    # ========== REST OF FUNCTION ==========
     UP = app.config["UPLOAD_FOLDER"]
-    CF = app.config["CROP_FOLDER"]
-    os.makedirs(CF, exist_ok=True)
 
-    N_FRAMES = 5
+    # ========== THIS JOB'S ARTIFACT FOLDER ==========
+    job_artifacts = artifact_store.job_dir(filename, job.id)
+    artifact_store.collect_garbage(protect=[job_artifacts.path])
 
-    # ========== CLEAN OLD CROPS ==========
-    for f in os.listdir(CF):
-        try:
-            os.remove(os.path.join(CF, f))
-        except:
-            pass
-
-    # ========== GET LATEST VIDEO ==========
-    video_files = [f for f in os.listdir(UP) if allowed_file(f)]
-    if not video_files:
-        return render_template(
+    video_path = os.path.join(UP, filename)
+    if not os.path.exists(video_path):
+        return jobs.result_page(
             "timestamp_extraction.html",
             timestamps=["❌ No uploaded video found."],
             previews=[],
             show_continue_button=True
         )
 
-    filename = max(video_files, key=lambda f: os.path.getmtime(os.path.join(UP, f)))
-    video_path = os.path.join(UP, filename)
-
-    cap = cv2.VideoCapture(video_path)
-    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-
-    start_frame = int(total_frames * 0.70)
-    step = max(1, int((total_frames - start_frame) / N_FRAMES))
-    frame_indices = [start_frame + i * step for i in range(N_FRAMES)]
-
-    ocr_results = []
-    speed_results = []
-
-    # ========== FRAME LOOP ==========
-    for idx in frame_indices:
-        cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-        ret, frame = cap.read()
-        if not ret:
-            continue
+    # ========== OVERLAY ROIs (calibrated once per camera) ==========
+    job.progress(0, "Locating overlay")
+    profile = camera_profile(video_path)
+
+    # ========== SINGLE DECODE PASS ==========
+    cache = evidence_cache(filename)
+
+    def overlay_analyzers(profile):
+        registered = [
+            analyzers.TimestampAnalyzer(filename, job_artifacts, cache=cache,
+                                        full_previews=full_previews, roi=profile["timestamp_roi"]),
+            analyzers.SpeedAnalyzer(cache=cache, roi=profile["speed_roi"]),
+        ]
+        if mode == "timeline":
+            registered.append(timestamp_timeline.TimelineAnalyzer(sample_seconds, cache=cache,
+                                                                  roi=profile["timestamp_roi"]))
+        return registered
+
+    pipeline = FramePipeline(video_path)
+    for analyzer in overlay_analyzers(profile):
+        pipeline.register(analyzer)
+    results = pipeline.run(progress=pipeline_progress(job, 0, 90))
+    results = recheck_overlay(job, video_path, profile, results, overlay_analyzers, 90, 95)
+
+    job.progress(95, "Saving results")
+    timeline = results.get("timeline")
+    has_drift = 0
+    if timeline is not None:
+        has_drift = int(timeline["has_drift"])
+        # Per-sample rows go to timestamp_observations, not the job result
+        timeline_rows = timeline.pop("observations")
+        with get_db() as conn:
+            timestamp_timeline.store_timeline(conn, filename, timeline)
+            observations.replace_timestamps(conn, filename, "timeline", timeline_rows)
+            conn.commit()
+        print(f"🕒 Timeline: {timeline['parsed']}/{timeline['samples']} samples parsed, "
+              f"drift {timeline['drift_per_hour']} s/h, {len(timeline['anomalies'])} anomalies, "
+              f"OCR reuse {timeline['ocr_cache']}")
 
-        h, w = frame.shape[:2]
+    print(f"🔁 Overlay OCR reuse: timestamp {results['timestamp']['ocr_cache']}, "
+          f"speed {results['speed']['ocr_cache']}")
+    ocr_results = results["timestamp"]["observations"]
+    final_timestamp, consistency_score = save_timestamp_results(filename, ocr_results, has_drift)
+    speed = save_speed_results(filename, results["speed"]["observations"])
 
-        full_name = f"{filename}_full_{idx}.jpg"
-        crop_name = f"{filename}_crop_{idx}.jpg"
+    return jobs.result_page(
+        "timestamp_extraction.html",
+        timestamps=[
+            f"✅ {filename} → {final_timestamp}"
+            if final_timestamp else f"⚠️ {filename} → No timestamp detected"
+        ],
+        filename=filename,
+        previews=ocr_results,
+        consistency_score=consistency_score,
+        has_drift=has_drift,
+        timeline=timeline,
+        show_continue_button=True,
+        **speed
+    )
 
-        cv2.imwrite(os.path.join(CF, full_name), frame)
 
-        crop = frame[int(h * 0.82):h, 0:w]
-        cv2.imwrite(os.path.join(CF, crop_name), crop)
+def evidence_cache(filename):
+    """Result cache scoped to the video's baseline SHA-256 (None if it has none)."""
+    return result_cache.for_evidence(repo.baseline(filename))
 
-        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-        gray = cv2.resize(gray, None, fx=2.5, fy=2.5)
-        _, thresh = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
 
-            # ===== OCR WITH ERROR HANDLING =====
-        try:
-            import easyocr
-            reader = easyocr.Reader(['en'])
-            result = reader.readtext(thresh)
-            if result:
-                raw = result[0][1]  # Get the detected text
-            else:
-                raw = ""
-        except ImportError:
-            raw = pytesseract.image_to_string(thresh, config="--oem 3 --psm 6").strip()
-        except Exception as e:
-            print(f"OCR error for timestamp frame {idx}: {e}")
-            raw = ""
-        
-        text = " ".join(raw.split())
-
-        # ===== CONFIDENCE LOGIC =====
-        confidence = 0
-        final_text = "No text detected"
-
-        full_match = re.search(r"\d{4}[-/]\d{2}[-/]\d{2}\s+\d{2}:\d{2}:\d{2}", text)
-        date_only = re.search(r"\d{4}[-/]\d{2}[-/]\d{2}", text)
-        partial = re.search(r"\d{4}[-/]\d{2}", text)
-
-        if full_match:
-            final_text = full_match.group()
-            confidence = 100
-        elif date_only:
-            final_text = date_only.group()
-            confidence = 80
-        elif partial:
-            final_text = partial.group()
-            confidence = 50
-
-        ocr_results.append({
-            "frame": idx,
-            "text": final_text,
-            "confidence": confidence,  # dynamic value 100, 80, 50
-            "raw": raw,
-            "full_path": full_name,
-            "crop_path": crop_name
-        })
+def pipeline_progress(job, start, end):
+    """FramePipeline progress callback mapping decoded frames onto start..end %."""
+    last = [-1]
 
-               # ===== SPEED OCR WITH ERROR HANDLING =====
-        speed_crop = frame[int(h * 0.80):h, int(w * 0.55):w]
-        sg = cv2.cvtColor(speed_crop, cv2.COLOR_BGR2GRAY)
-        sg = cv2.resize(sg, None, fx=2.5, fy=2.5)
-        _, st = cv2.threshold(sg, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    def report(done, total):
+        percent = start + (end - start) * done / max(total, 1)
+        if int(percent) != last[0]:
+            last[0] = int(percent)
+            job.progress(percent, f"Decoded frame {done} of {total}")
+        else:
+            job.check_cancelled()
+    return report
 
-        try:
-            import easyocr
-            reader = easyocr.Reader(['en'])
-            result = reader.readtext(st)
-            if result:
-                speed_txt = result[0][1]  # Get the detected text
-            else:
-                speed_txt = ""
-        except ImportError:
-            speed_txt = pytesseract.image_to_string(
-                st,
-                config="--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789"
-            )
-        except Exception as e:
-            print(f"OCR error for speed frame {idx}: {e}")
-            speed_txt = ""
 
-        m = re.search(r"\d{1,3}", speed_txt)
-        if m:
-            speed_results.append(int(m.group()))
+def save_timestamp_results(filename, ocr_results, has_drift=0):
+    """Persist per-frame timestamp OCR; returns (final_timestamp, consistency_score)."""
+    from collections import Counter
 
     # ========== FINAL TIMESTAMP ==========
     valid = [r["text"] for r in ocr_results if r["text"] != "No text detected"]
@@ -687,29 +720,20 @@ def timestamp_extraction():
 
     # ========== AUTO-SAVE TO DATABASE ==========
     try:
-        conn = get_db()
-        cur = conn.cursor()
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         frame_count = len(ocr_results)
         avg_conf = round(sum([r.get("confidence", 0) for r in ocr_results]) / frame_count, 1) if frame_count > 0 else 0
-        raw_json = json.dumps(ocr_results)
 
         print(f"[TIMESTAMP_SAVE] filename={filename}, frame_count={frame_count}, final_timestamp={final_timestamp}, avg_conf={avg_conf}")
-        
-        cur.execute("""
-            INSERT INTO timestamps (filename, timestamp_text, confidence, consistency_score, has_drift, frame_count, raw_ocr_results, extracted_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(filename)
-            DO UPDATE SET
-                timestamp_text=excluded.timestamp_text,
-                confidence=excluded.confidence,
-                consistency_score=excluded.consistency_score,
-                has_drift=excluded.has_drift,
-                frame_count=excluded.frame_count,
-                raw_ocr_results=excluded.raw_ocr_results,
-                extracted_at=CURRENT_TIMESTAMP
-        """, (filename, final_timestamp or "", avg_conf, consistency_score, 0, frame_count, raw_json, now))
-        
+
+        repo.save_timestamp_summary(
+            filename, final_timestamp or "", avg_conf, consistency_score, has_drift, frame_count, now
+        )
+
+        # Per-frame rows (raw_ocr_results is only read for legacy records)
+        conn = get_db()
+        observations.replace_timestamps(conn, filename, "preview", ocr_results)
+
         conn.commit()
         conn.close()
         print(f"[TIMESTAMP_SAVE] ✅ Successfully saved {frame_count} frames for {filename}")
@@ -718,7 +742,22 @@ def timestamp_extraction():
         import traceback
         traceback.print_exc()
 
-    # ========== SPEED SUMMARY ==========
+    return final_timestamp, consistency_score
+
+
+def save_speed_results(filename, speed_observations):
+    """Persist per-frame speed readings; returns summarize_speed() of them."""
+    with get_db() as conn:
+        observations.replace_speeds(conn, filename, speed_observations)
+        conn.commit()
+    return summarize_speed(speed_observations)
+
+
+def summarize_speed(speed_observations):
+    """Majority speed reading and its reliability, as template variables."""
+    from collections import Counter
+
+    speed_results = [o["speed"] for o in speed_observations if o["speed"] is not None]
     if speed_results:
         estimated_speed = Counter(speed_results).most_common(1)[0][0]
         speed_consistency = round(
@@ -736,87 +775,88 @@ def timestamp_extraction():
         speed_consistency = 0
         speed_reliability = "LOW"
 
-    return render_template(
-        "timestamp_extraction.html",
-        timestamps=[
-            f"✅ {filename} → {final_timestamp}"
-            if final_timestamp else f"⚠️ {filename} → No timestamp detected"
-        ],
-        previews=ocr_results,
-        consistency_score=consistency_score,
-        has_drift=0,
-        estimated_speed=estimated_speed,
-        speed_unit=speed_unit,
-        speed_consistency=speed_consistency,
-        speed_reliability=speed_reliability,
-        show_continue_button=True
-    )
+    return {
+        "estimated_speed": estimated_speed,
+        "speed_unit": speed_unit,
+        "speed_consistency": speed_consistency,
+        "speed_reliability": speed_reliability,
+    }
 
 
 @app.route("/tamper_detection")
 @login_required
 def tamper_detection():
+    deep = request.args.get("deep") == "1"
 
-    conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT filename, uploaded_at FROM uploads")
-    uploaded_files = cur.fetchall()
-
-    videos_info = []
-
-    for row in uploaded_files:
-        filename = row["filename"]
-        uploaded_at = row["uploaded_at"]
-
-        filepath = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        if not os.path.isfile(filepath):
-            continue
-
-        current_hash = generate_file_hash(filepath)
-        size_kb = round(os.path.getsize(filepath) / 1024, 2)
+    uploaded_at = {row["filename"]: row["uploaded_at"] for row in repo.list_uploads()}
 
-        cur.execute(
-            "SELECT sha256 FROM tamper_records WHERE filename=?",
-            (filename,)
-        )
-        baseline = cur.fetchone()
+    # Every recorded upload gets a row; a missing file shows up as an error
+    files = [(filename, os.path.join(app.config["UPLOAD_FOLDER"], filename)) for filename in uploaded_at]
 
-        # ================= STATUS LOGIC =================
-        if DEMO_MODE and "EDIT" in filename.upper():
-            status = "Tampered ❌ "
-        else:
-            if not baseline:
-                status = "Unverified ❗"
+    def generate_rows():
+        # Rows are rendered as each file finishes hashing (cache hits first)
+        conn = get_db()
+        baselines = repo.baselines()
+
+        for verification in evidence_hashing.verify_many(conn, files, deep=deep):
+            filename = verification["filename"]
+            if "error" in verification:
+                # Never drop a file from the forensic view because it could not be read
+                status = "Error ❗"
+                conn.commit()
+                repo.record_tamper_status(filename, status)
+                yield {
+                    "filename": filename,
+                    "size": "—",
+                    "uploaded_at": uploaded_at[filename],
+                    "status": status,
+                    "error": ("File is missing from the upload folder"
+                              if not os.path.exists(verification["filepath"])
+                              else f"Could not be read: {verification['error']}"),
+                    "last_full_verification": None,
+                    "cached": False
+                }
+                continue
+
+            current_hash = verification["sha256"]
+            size_kb = round(os.path.getsize(verification["filepath"]) / 1024, 2)
+
+            baseline_hash = baselines.get(filename)
+
+            # ================= STATUS LOGIC =================
+            if DEMO_MODE and "EDIT" in filename.upper():
+                status = "Tampered ❌ "
             else:
-                baseline_hash = baseline["sha256"]
-                status = (
-                    "Authentic ✅"
-                    if baseline_hash == current_hash
-                    else "Tampered ❌"
-                )
-
-        # ================= SAVE RESULT =================
-        cur.execute("""
-            INSERT INTO tampers (filename, tamper_status, checked_at)
-            VALUES (?, ?, CURRENT_TIMESTAMP)
-            ON CONFLICT(filename)
-            DO UPDATE SET
-                tamper_status=excluded.tamper_status,
-                checked_at=CURRENT_TIMESTAMP
-        """, (filename, status))
-
-        videos_info.append({
-            "filename": filename,
-            "size": f"{size_kb} KB",
-            "uploaded_at": uploaded_at,
-            "status": status
-        })
+                if not baseline_hash:
+                    status = "Unverified ❗"
+                else:
+                    status = (
+                        "Authentic ✅"
+                        if baseline_hash == current_hash
+                        else "Tampered ❌"
+                    )
+
+            # ================= SAVE RESULT =================
+            conn.commit()
+            repo.record_tamper_status(filename, status)
 
-    conn.commit()
-    conn.close()
+            yield {
+                "filename": filename,
+                "size": f"{size_kb} KB",
+                "uploaded_at": uploaded_at[filename],
+                "status": status,
+                "last_full_verification": verification["last_full_verification"],
+                "cached": verification["cached"]
+            }
 
-    return render_template("tamper_detection.html", videos=videos_info)
+        conn.close()
+
+    return Response(stream_with_context(stream_template(
+        "tamper_detection.html",
+        videos=generate_rows(),
+        has_videos=bool(files),
+        deep=deep
+    )))
 
 
 
@@ -829,27 +869,24 @@ def set_baseline(filename):
         flash("File does not exist.", "danger")
         return redirect(url_for("tamper_detection"))
 
-    current_hash = generate_file_hash(filepath)
+    identity = evidence_hashing.file_identity(filepath)
+    current_hash, file_size, segments = evidence_hashing.hash_file_segments(filepath)
 
+    # Segments and baseline digest in one transaction: on SQLite the repository
+    # writes to this request's connection inside a savepoint, so the commit
+    # below covers both; with a separate evidence store the local rows are
+    # kept only once it succeeded.
     conn = get_db()
-    cur = conn.cursor()
-
-    cur.execute("SELECT sha256 FROM tamper_records WHERE filename=?", (filename,))
-    row = cur.fetchone()
-
-    if row:
-        cur.execute(
-            "UPDATE tamper_records SET sha256=? WHERE filename=?",
-            (current_hash, filename)
-        )
-    else:
-        cur.execute(
-            "INSERT INTO tamper_records (filename, sha256) VALUES (?, ?)",
-            (filename, current_hash)
-        )
-
-    conn.commit()
-    conn.close()
+    try:
+        evidence_hashing.record_verification(conn, filename, current_hash, identity)
+        evidence_hashing.store_segments(conn, filename, file_size, segments)
+        repo.set_baseline(filename, current_hash)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
 
     flash(f"{filename} baseline has been set.", "success")
     return redirect(url_for("tamper_detection"))
@@ -870,28 +907,52 @@ def tamper_details(filename):
             status="Tampered ❌ "
         )
 
-    conn = get_db()
-    cur = conn.cursor()
+    deep = request.args.get("deep") == "1"
+    spot = request.args.get("spot", type=int)
+    if spot is not None:
+        spot = max(1, spot)
 
-    cur.execute("SELECT sha256 FROM tamper_records WHERE filename=?", (filename,))
-    baseline = cur.fetchone()
+    baseline = repo.baseline(filename)
+
+    conn = get_db()
 
     file_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
+    last_full_verification = None
     if os.path.exists(file_path):
-        current_hash = generate_file_hash(file_path)
+        verification = evidence_hashing.verify_file(conn, filename, file_path, deep=deep)
+        current_hash = verification["sha256"]
+        last_full_verification = verification["last_full_verification"]
+        conn.commit()
     else:
         current_hash = "File Missing ❌"
 
     if baseline:
-        if baseline["sha256"] == current_hash:
+        if baseline == current_hash:
             status = "Authentic ✅"
         else:
             status = "Tampered ❌"
-        baseline_hash = baseline["sha256"]
+        baseline_hash = baseline
     else:
         status = "Unverified ❗"
         baseline_hash = "—"
 
+    # ===== SEGMENT (MERKLE) ANALYSIS =====
+    segment_baseline = evidence_hashing.load_segments(conn, filename)
+    segment_diff = None
+    spot_results = None
+    if segment_baseline and os.path.exists(file_path):
+        if status.startswith("Tampered"):
+            segment_diff = evidence_hashing.diff_segments(conn, filename, file_path)
+        elif spot:
+            spot_results = evidence_hashing.spot_check(conn, filename, file_path, samples=spot)
+
+    # ===== CONTAINER STRUCTURE (re-run if the bytes changed since) =====
+    structure = container_structure.load(conn, filename)
+    if os.path.exists(file_path) and (structure is None or structure["sha256"] != current_hash):
+        container_structure.analyze_and_store(conn, filename, file_path, current_hash)
+        conn.commit()
+        structure = container_structure.load(conn, filename)
+
     conn.close()
 
     return render_template(
@@ -899,7 +960,12 @@ def tamper_details(filename):
         filename=filename,
         current_hash=current_hash,
         baseline_hash=baseline_hash,
-        status=status
+        status=status,
+        last_full_verification=last_full_verification,
+        segment_baseline=segment_baseline,
+        segment_diff=segment_diff,
+        spot_results=spot_results,
+        structure=structure
     )
 
 
@@ -909,37 +975,44 @@ def tamper_details(filename):
 @app.route("/export_tamper")
 @login_required
 def export_tamper():
-    conn = get_db()
-    cur = conn.cursor()
-    lines = []
+    deep = request.args.get("deep") == "1"
 
+    files = []
     for f in sorted(os.listdir(app.config["UPLOAD_FOLDER"])):
         filepath = os.path.join(app.config["UPLOAD_FOLDER"], f)
-        if not os.path.isfile(filepath) or not allowed_file(f):
-            continue
+        if os.path.isfile(filepath) and allowed_file(f):
+            files.append((f, filepath))
 
-        current_hash = get_file_hash(filepath)
-        cur.execute("SELECT sha256 FROM tamper_records WHERE filename=?", (f,))
-        row = cur.fetchone()
+    def generate_lines():
+        # Lines are streamed as each file finishes hashing
+        if not files:
+            yield "No videos found for tamper detection.\n"
+            return
 
-        if row:
-            status = "Authentic ✅" if row["sha256"] == current_hash else "Tampered ❌"
-        else:
-            status = "No Baseline ⚠️"
+        conn = get_db()
+        baselines = repo.baselines()
 
-        lines.append(f"{f} → {status}")
+        for verification in evidence_hashing.verify_many(conn, files, deep=deep):
+            f = verification["filename"]
+            if "error" in verification:
+                yield f"{f} → Unreadable ❗ ({verification['error']})\n"
+                continue
 
-    conn.close()
+            if f in baselines:
+                status = "Authentic ✅" if baselines[f] == verification["sha256"] else "Tampered ❌"
+            else:
+                status = "No Baseline ⚠️"
 
-    if not lines:
-        lines.append("No videos found for tamper detection.")
+            conn.commit()
+            yield f"{f} → {status}\n"
 
-    export_path = os.path.join(BASE_DIR, "tamper_results.txt")
-    with open(export_path, "w", encoding="utf-8") as f:
-        for line in lines:
-            f.write(line + "\n")
+        conn.close()
 
-    return send_from_directory(BASE_DIR, "tamper_results.txt", as_attachment=True)
+    return Response(
+        stream_with_context(generate_lines()),
+        mimetype="text/plain; charset=utf-8",
+        headers={"Content-Disposition": "attachment; filename=tamper_results.txt"}
+    )
 
 
 
@@ -947,16 +1020,13 @@ def export_tamper():
 #           FETCH REPORT DATA (CLEAN VERSION)
 # ======================================================
 def fetch_all_report_data(conn):
-    conn.row_factory = sqlite3.Row
-    cur = conn.cursor()
-    
-    # Get the latest uploaded video that still exists on disk
-    cur.execute("SELECT filename, uploaded_at FROM uploads ORDER BY uploaded_at DESC")
-    rows = cur.fetchall()
+    # This session's video, else the latest uploaded video that still exists on disk
+    candidates = [session.get("uploaded_video")] + [r["filename"] for r in repo.list_uploads()]
 
     filename = None
-    for r in rows:
-        f = r["filename"]
+    for f in candidates:
+        if not f:
+            continue
         fp = os.path.join(app.config["UPLOAD_FOLDER"], f)
         if os.path.exists(fp):
             filename = f
@@ -969,25 +1039,31 @@ def fetch_all_report_data(conn):
             "timestamps": [],
             "tampers": [],
             "plates": [],
+            "speed": summarize_speed([]),
+            "sightings": {},
             "case_id": session.get("case_id", "2025-DV-001A"),
             "report_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
         }
 
-    # Helper: sqlite Row → dict
-    def to_dict(rows):
-        return [dict(row) for row in rows]
-
     # Fetch data ONLY for this valid file
-    cur.execute("SELECT filename, uploaded_at FROM uploads WHERE filename = ?", (filename,))
-    uploads = to_dict(cur.fetchall())
-
-    # Read aggregated timestamp record (may contain raw_ocr_results JSON)
-    cur.execute("SELECT filename, timestamp_text, extracted_at, frame_count, raw_ocr_results FROM timestamps WHERE filename = ?", (filename,))
-    ts_rows = cur.fetchall()
-    timestamps = []
-    for r in ts_rows:
-        row = dict(r)
-        raw = row.get("raw_ocr_results")
+    upload = repo.get_upload(filename)
+    uploads = [upload] if upload else []
+    summary = repo.timestamp_summary(filename)
+
+    # Per-frame timestamps (indexed rows; records saved before the
+    # observation tables existed still carry a raw_ocr_results JSON blob)
+    timestamps = [{
+        "filename": filename,
+        "timestamp_text": r["text"] or (summary["timestamp_text"] if summary else None),
+        "extracted_at": summary["extracted_at"] if summary else None,
+        "frame": r["frame"],
+        "confidence": r["confidence"] or 0,
+        "crop_image": r["crop_image"],
+        "full_image": r["full_image"],
+    } for r in observations.timestamp_rows(conn, filename, "preview")]
+
+    if not timestamps and summary:
+        raw = summary.get("raw_ocr_results")
         if raw:
             try:
                 parsed = json.loads(raw)
@@ -995,9 +1071,9 @@ def fetch_all_report_data(conn):
                 parsed = []
             for pr in parsed:
                 timestamps.append({
-                    "filename": row.get("filename"),
-                    "timestamp_text": pr.get("text") or row.get("timestamp_text"),
-                    "extracted_at": row.get("extracted_at"),
+                    "filename": summary.get("filename"),
+                    "timestamp_text": pr.get("text") or summary.get("timestamp_text"),
+                    "extracted_at": summary.get("extracted_at"),
                     "frame": pr.get("frame"),
                     "confidence": pr.get("confidence", 0),
                     "crop_image": pr.get("crop_path"),
@@ -1005,26 +1081,30 @@ def fetch_all_report_data(conn):
                 })
         else:
             timestamps.append({
-                "filename": row.get("filename"),
-                "timestamp_text": row.get("timestamp_text"),
-                "extracted_at": row.get("extracted_at"),
+                "filename": summary.get("filename"),
+                "timestamp_text": summary.get("timestamp_text"),
+                "extracted_at": summary.get("extracted_at"),
                 "frame": None,
-                "confidence": row.get("confidence", 0),
+                "confidence": summary.get("confidence", 0),
             })
 
-    cur.execute("SELECT filename, tamper_status, checked_at FROM tampers WHERE filename = ?", (filename,))
-    tampers = to_dict(cur.fetchall())
-
-    cur.execute("SELECT filename, plate_text, confidence, detected_at FROM license_results WHERE filename = ?", (filename,))
-    plates = to_dict(cur.fetchall())
+    tampers = repo.tamper_statuses(filename)
+    plates = repo.plate_results(filename)
 
-    cur.close()
+    # Speed overlay summary and, per plate read, every video it appears in
+    speed = summarize_speed(observations.speed_rows(conn, filename))
+    sightings = {
+        p["plate_text"]: [dict(row) for row in observations.plate_sightings(conn, p["plate_text"])]
+        for p in plates if p.get("plate_text") and p["plate_text"] != "None"
+    }
 
     return {
         "uploads": uploads,
         "timestamps": timestamps,
         "tampers": tampers,
         "plates": plates,
+        "speed": speed,
+        "sightings": sightings,
         "case_id": session.get("case_id", "2025-DV-001A"),
         "report_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
     }
@@ -1140,6 +1220,12 @@ def generate_pdf_report(data, pdf_path):
             elements.append(Spacer(1, 6))
     else:
         elements.append(Paragraph("No timestamp data extracted.", body_style))
+    speed = data.get("speed") or {}
+    if speed.get("estimated_speed") is not None:
+        elements.append(Paragraph(
+            f"<b>Speed Overlay:</b> {speed['estimated_speed']} {speed['speed_unit']} — "
+            f"Consistency: {speed['speed_consistency']}% ({speed['speed_reliability']} reliability)",
+            body_style))
     elements.append(Spacer(1, 12))
 
     # ========== LICENSE PLATE RESULTS ==========
@@ -1150,6 +1236,11 @@ def generate_pdf_report(data, pdf_path):
             conf = float(p.get('confidence', 0))
             lp_text = f"<b>Plate:</b> {p.get('plate_text', 'N/A')} | <b>Confidence:</b> {conf:.1%} | <b>Detected:</b> {p.get('detected_at', 'N/A')}"
             elements.append(Paragraph(lp_text, body_style))
+            for s in data.get("sightings", {}).get(p.get("plate_text"), []):
+                elements.append(Paragraph(
+                    f"&nbsp;&nbsp;Seen in {s['filename']}: frames {s['first_frame']}–{s['last_frame']} "
+                    f"({s['detections']} detections, best {float(s['confidence'] or 0):.1%})",
+                    body_style))
             elements.append(Spacer(1, 6))
         elements.append(Spacer(1, 16))
 
@@ -1219,24 +1310,20 @@ def report_generation():
             data = fetch_all_report_data(conn)
             conn.close()
 
-            # Delete any old PDF copies
-            pdf_path = os.path.join(BASE_DIR, "forensic_report.pdf")
-            if os.path.exists(pdf_path):
-                try:
-                    os.remove(pdf_path)
-                except:
-                    pass
-
-            # Generate fresh PDF
-            print(f"Generating PDF to: {pdf_path}")
-            print(f"Data: {data}")
-            generate_pdf_report(data, pdf_path)
-            print(f"PDF generated. File exists: {os.path.exists(pdf_path)}")
+            # Per case/evidence, keyed by a digest of the data: unchanged
+            # evidence reuses the stored PDF, new data builds (atomically) a new one
+            filename = data["uploads"][0]["filename"] if data["uploads"] else None
+            pdf_path, digest, cached = reports.get_or_build(
+                data, data["case_id"], filename, generate_pdf_report
+            )
+            print(f"{'♻️ Reusing' if cached else '📄 Generated'} report {pdf_path}")
 
-            # Verify file was created
-            if not os.path.exists(pdf_path):
-                flash("Report generation failed — PDF not created.", "danger")
-                return render_template("report_generation.html")
+            session["current_report"] = {
+                "path": os.path.relpath(pdf_path, reports.REPORT_FOLDER),
+                "digest": digest,
+                "filename": filename,
+                "case_id": data["case_id"],
+            }
 
             flash("✅ Report generated successfully!", "success")
             return redirect(url_for("report_ready"))
@@ -1261,14 +1348,20 @@ def report_ready():
 
 
 # ==========================================
-#         DOWNLOAD REPORT ROUTE (SIMPLE)
+#         DOWNLOAD REPORT ROUTE
 # ==========================================
 @app.route("/download_report")
 @login_required
 def download_report():
-    pdf_path = os.path.join(BASE_DIR, "forensic_report.pdf")
-    if os.path.exists(pdf_path):
-        return send_file(pdf_path, as_attachment=True, download_name="forensic_report.pdf")
+    # The report this session generated, not whichever was written last
+    report = session.get("current_report") or {}
+    pdf_path = reports.resolve(report.get("path"))
+    if pdf_path:
+        download_name = "forensic_report_{}_{}.pdf".format(
+            reports.safe_name(report.get("case_id"), "case"),
+            reports.safe_name(os.path.splitext(report.get("filename") or "")[0], "evidence")
+        )
+        return send_file(pdf_path, as_attachment=True, download_name=download_name)
     flash("Report not found.", "danger")
     return redirect(url_for("report_generation"))
 
@@ -1281,12 +1374,8 @@ def download_report():
 @login_required
 def license_plate_page():
     """Display license plate recognition form"""
-    conn = get_db()
-    cur = conn.cursor()
-    cur.execute("SELECT filename FROM uploads ORDER BY uploaded_at DESC")
-    videos = [row["filename"] for row in cur.fetchall()]
-    conn.close()
-    
+    videos = [row["filename"] for row in repo.list_uploads()]
+
     return render_template("license_plate.html", videos=videos)
 
 
@@ -1294,16 +1383,6 @@ def license_plate_page():
 @login_required
 def process_license_plate():
     """Process video for license plate detection"""
-    # IMPORT ALL NEEDED MODULES
-    import os
-    import cv2
-    import re
-    import json
-    from datetime import datetime
-    from werkzeug.utils import secure_filename
-    from ultralytics import YOLO
-    import pytesseract
-    
     selected_filename = request.form.get("video")
     uploaded_file = request.files.get("file")
 
@@ -1312,22 +1391,7 @@ def process_license_plate():
             flash("Invalid file format.", "danger")
             return redirect(url_for("license_plate_page"))
 
-        filename = secure_filename(uploaded_file.filename)
-        save_path = os.path.join(app.config["UPLOAD_FOLDER"], filename)
-        uploaded_file.save(save_path)
-
-        with get_db() as conn:
-            cur = conn.cursor()
-            cur.execute("SELECT id FROM uploads WHERE filename = ?", (filename,))
-            if not cur.fetchone():
-                cur.execute(
-                    "INSERT INTO uploads (filename, uploaded_at) VALUES (?, ?)",
-                    (filename, datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
-                )
-            conn.commit()
-
-        video_path = save_path
-        filename_to_process = filename
+        filename_to_process, video_path = ingest_evidence(uploaded_file)
 
     elif selected_filename:
         filename_to_process = selected_filename
@@ -1339,178 +1403,247 @@ def process_license_plate():
         flash("No video selected or uploaded.", "danger")
         return redirect(url_for("license_plate_page"))
 
-    # YOLO + OCR processing - AUTO DOWNLOAD IF MISSING
-    try:
-        # First try to load your custom model
-        model = YOLO("best.pt")
-    except FileNotFoundError:
-        # If custom model not found, use YOLOv8n which auto-downloads
-        print("⚠️ 'best.pt' not found. Using YOLOv8n (auto-downloads)...")
-        model = YOLO("yolov8n.pt")
-    except Exception as e:
-        flash(f"YOLO initialization failed: {str(e)}", "danger")
-        return redirect(url_for("license_plate_page"))
-
-    # Set Tesseract path for OCR
-    if os.name == 'nt':  # Windows
-        pytesseract.pytesseract.tesseract_cmd = r'C:\Program Files\Tesseract-OCR\tesseract.exe'
-    else:  # Linux/Mac
-        pytesseract.pytesseract.tesseract_cmd = '/usr/bin/tesseract'
-
-    cap = cv2.VideoCapture(video_path)
-    best_result = None
-    best_confidence = 0.0
-    ocr_results = []
-    frame_count = 0
-
-    while cap.isOpened():
-        ret, frame = cap.read()
-        if not ret:
-            break
-        frame_count += 1
-        if frame_count % 15 != 0:
-            continue
-
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        results = model.predict(frame_rgb, conf=0.3, verbose=False)
-
-        if results and len(results) > 0 and hasattr(results[0], "boxes") and results[0].boxes is not None and len(results[0].boxes) > 0:
-            try:
-                current_confidence = float(results[0].boxes.conf.mean().item())
-            except Exception:
-                current_confidence = 0.0
-
-            if current_confidence > best_confidence:
-                best_confidence = current_confidence
-                try:
-                    best_result = results[0].plot()
-                except Exception:
-                    best_result = None
-
-            for i, box in enumerate(results[0].boxes):
-                try:
-                    x1, y1, x2, y2 = map(int, box.xyxy[0])
-                except Exception:
-                    continue
-
-                h, w = frame_rgb.shape[:2]
-                x1 = max(0, x1 - 5)
-                y1 = max(0, y1 - 5)
-                x2 = min(w, x2 + 5)
-                y2 = min(h, y2 + 5)
-
-                plate_crop = frame_rgb[y1:y2, x1:x2]
-                if plate_crop.size == 0:
-                    continue
-
-                plate_crop_gray = cv2.cvtColor(plate_crop, cv2.COLOR_BGR2GRAY)
-                plate_crop_gray = cv2.resize(plate_crop_gray, None, fx=3, fy=3, interpolation=cv2.INTER_CUBIC)
-                plate_crop_gray = cv2.bilateralFilter(plate_crop_gray, 11, 17, 17)
-                _, plate_crop_thresh = cv2.threshold(plate_crop_gray, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+    # ========== SAMPLING STRIDE (FRAMES OR SECONDS) ==========
+    params = {"filename": filename_to_process, "full_pass": request.form.get("full_pass") == "1"}
+    stride = request.form.get("stride", type=float)
+    if stride is not None and stride > 0:
+        if request.form.get("stride_unit") == "seconds":
+            params["stride_seconds"] = stride
+        else:
+            params["stride"] = max(1, int(stride))
 
-                plate_text = pytesseract.image_to_string(
-                    plate_crop_thresh,
-                    config="--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-"
-                ).strip()
+    # ========== HAND OFF TO BACKGROUND WORKER ==========
+    conn = get_db()
+    job_id = jobs.enqueue(conn, "license_plate", params, owner=session["username"])
+    conn.close()
 
-                cleaned = plate_text.replace(" ", "")
-                match = re.match(r"([A-Z]{2,3})([0-9]{2,4})([A-Z]{1,3})", cleaned)
-                if match:
-                    plate_text = " ".join(match.groups())
+    return redirect(url_for("job_status", job_id=job_id))
 
-                if plate_text and len(plate_text) > 2:
-                    ocr_results.append(plate_text)
 
-    cap.release()
+@jobs.task("license_plate")
+def run_license_plate(job, filename, full_pass=False,
+                      stride=analyzers.DEFAULT_PLATE_STRIDE, stride_seconds=None):
+    """
+    Run YOLO + OCR plate detection over a stored video. With full_pass the
+    timestamp and speed overlays are read from the same decode.
+    """
+    filename_to_process = filename
+    video_path = os.path.join(app.config["UPLOAD_FOLDER"], filename_to_process)
 
-    # ========== PERSIST TIMESTAMP SUMMARY TO DB (auto-save) ==========
+    # YOLO + OCR processing - best.pt, falling back to YOLOv8n (auto-downloads)
     try:
-        conn = get_db()
-        cur = conn.cursor()
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        frame_count = len(ocr_results)
-        avg_conf = round(sum([r.get("confidence", 0) for r in ocr_results]) / frame_count, 1) if frame_count else 0
-        raw_json = json.dumps(ocr_results)
-
-        cur.execute("""
-            INSERT INTO timestamps (filename, timestamp_text, confidence, consistency_score, has_drift, frame_count, raw_ocr_results, extracted_at)
-            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ON CONFLICT(filename)
-            DO UPDATE SET
-                timestamp_text=excluded.timestamp_text,
-                confidence=excluded.confidence,
-                consistency_score=excluded.consistency_score,
-                has_drift=excluded.has_drift,
-                frame_count=excluded.frame_count,
-                raw_ocr_results=excluded.raw_ocr_results,
-                extracted_at=CURRENT_TIMESTAMP
-        """, (filename, final_timestamp or "", avg_conf, consistency_score, 0, frame_count, raw_json, now))
-        conn.commit()
-        conn.close()
-    except Exception:
-        pass
+        plate_model = model_registry.get_model("plate")
+    except Exception as e:
+        return jobs.result_page(
+            "license_plate_result.html",
+            filename=filename_to_process,
+            result_image=None,
+            confidence=0,
+            error=f"YOLO initialization failed: {str(e)}"
+        )
 
+    job_artifacts = artifact_store.job_dir(filename_to_process, job.id)
+    artifact_store.collect_garbage(protect=[job_artifacts.path])
+
+    # ========== SINGLE DECODE PASS ==========
+    cache = evidence_cache(filename_to_process)
+    model_info = plate_model.describe()
+    pipeline = FramePipeline(video_path)
+    pipeline.register(analyzers.PlateAnalyzer(
+        plate_model.model, stride=stride, stride_seconds=stride_seconds,
+        cache=cache, model_version=f"{model_info['version']}/{model_info['framework']}"
+    ))
+
+    def overlay_analyzers(profile):
+        return [
+            analyzers.TimestampAnalyzer(filename_to_process, job_artifacts, cache=cache,
+                                        roi=profile["timestamp_roi"]),
+            analyzers.SpeedAnalyzer(cache=cache, roi=profile["speed_roi"]),
+        ]
+
+    if full_pass:
+        profile = camera_profile(video_path)
+        for analyzer in overlay_analyzers(profile):
+            pipeline.register(analyzer)
+    results = pipeline.run(progress=pipeline_progress(job, 0, 95))
+    if full_pass:
+        # Overlay-only retry: the plate model does not run again
+        results = recheck_overlay(job, video_path, profile, results, overlay_analyzers, 95, 98)
+
+    plates = results["plates"]
+    best_result = plates["best_result"]
+    best_confidence = plates["best_confidence"]
+    # One voted reading per tracked vehicle
+    vehicles = [t for t in plates["tracks"] if t["plate_text"]]
+    print(f"🚗 {len(plates['tracks'])} plate tracks, {plates['ocr_calls']} OCR calls")
+    with get_db() as conn:
+        observations.replace_plates(conn, filename_to_process, plates["observations"])
+        conn.commit()
+    if cache is not None:
+        print(f"🗃️ Result cache: {cache.cache.stats()}")
+
+    timestamp_summary = None
+    if full_pass:
+        print(f"🔁 Overlay OCR reuse: timestamp {results['timestamp']['ocr_cache']}, "
+              f"speed {results['speed']['ocr_cache']}")
+        final_timestamp, _ = save_timestamp_results(filename_to_process, results["timestamp"]["observations"])
+        speed = save_speed_results(filename_to_process, results["speed"]["observations"])
+        timestamp_summary = {"timestamp": final_timestamp, **speed}
+
+    # Headline plate: the vehicle with the strongest vote (then most sightings)
     detected_plate_text = None
-    if ocr_results:
-        from collections import Counter
-        detected_plate_text = Counter(ocr_results).most_common(1)[0][0]
+    if vehicles:
+        best_track = max(vehicles, key=lambda t: (t["votes"], t["hits"], t["confidence"]))
+        detected_plate_text = best_track["plate_text"]
 
     if best_result is not None:
-        result_filename = f"lp_result_{os.path.splitext(filename_to_process)[0]}.jpg"
-        result_path = os.path.join(app.config["CROP_FOLDER"], result_filename)
-        cv2.imwrite(result_path, best_result)
+        result_name = f"lp_result_{os.path.splitext(filename_to_process)[0]}.jpg"
+        cv2.imwrite(job_artifacts.file(result_name), best_result)
+        result_filename = job_artifacts.rel(result_name)
 
-        with get_db() as conn:
-            cur = conn.cursor()
-            cur.execute("""
-                INSERT OR REPLACE INTO license_results (filename, plate_text, confidence)
-                VALUES (?, ?, ?)
-            """, (filename_to_process, detected_plate_text or "None", float(best_confidence)))
-            conn.commit()
+        repo.save_plate_result(filename_to_process, detected_plate_text or "None", float(best_confidence))
 
-        return render_template(
+        return jobs.result_page(
             "license_plate_result.html",
             filename=filename_to_process,
             result_image=result_filename,
             confidence=f"{best_confidence:.2f}",
-            plate_text=detected_plate_text
+            plate_text=detected_plate_text,
+            vehicles=vehicles,
+            timestamp_summary=timestamp_summary,
+            model_info=model_info
         )
 
-    return render_template(
+    return jobs.result_page(
         "license_plate_result.html",
         filename=filename_to_process,
         result_image=None,
         confidence=0,
-        error="No license plate detected in the video."
+        error="No license plate detected in the video.",
+        timestamp_summary=timestamp_summary,
+        model_info=model_info
     )
 
 # ======================================================
-#                RUN APP (SINGLE MAIN BLOCK)
+#          BACKGROUND JOBS (STATUS / PROGRESS)
 # ======================================================
-@app.route("/debug_db")
-@login_required
-def debug_db():
+def init_job_worker():
+    """Called by jobs.py once per worker process before it takes jobs."""
+    workers = ocr_pool.use_job_worker_default(jobs.JOB_WORKERS)
+    print(f"🧵 OCR pool size for this job worker: {workers} (pid {os.getpid()})")
+    ocr_engines.warm_up()
+    model_registry.preload()
+
+
+def _owned_job(job_id):
     conn = get_db()
-    cur = conn.cursor()
+    job = jobs.get_job(conn, job_id)
+    conn.close()
+    if not job or job["owner"] not in (None, session.get("username")):
+        return None
+    return job
 
-    cur.execute("SELECT COUNT(*) as count FROM uploads")
-    uploads = cur.fetchone()["count"]
 
-    cur.execute("SELECT COUNT(*) as count FROM timestamps")
-    timestamps = cur.fetchone()["count"]
+def _job_status_payload(job):
+    return {
+        "id": job["id"],
+        "task": job["task"],
+        "status": job["status"],
+        "progress": job["progress"],
+        "message": job["message"],
+        "error": job["error"],
+        "result_url": url_for("job_result", job_id=job["id"]) if job["status"] == jobs.DONE else None
+    }
 
-    cur.execute("SELECT COUNT(*) as count FROM tampers")
-    tampers = cur.fetchone()["count"]
 
-    cur.execute("SELECT filename FROM uploads ORDER BY uploaded_at DESC")
-    files = [row["filename"] for row in cur.fetchall()]
+@app.route("/jobs/<int:job_id>")
+@login_required
+def job_status(job_id):
+    job = _owned_job(job_id)
+    if not job:
+        flash("Job not found.", "danger")
+        return redirect(url_for("dashboard"))
+    if job["status"] == jobs.DONE:
+        return redirect(url_for("job_result", job_id=job_id))
+    return render_template("job_status.html", job=job)
 
-    conn.close()
+
+@app.route("/jobs/<int:job_id>/status")
+@login_required
+def job_status_json(job_id):
+    job = _owned_job(job_id)
+    if not job:
+        return {"error": "not found"}, 404
+    return _job_status_payload(job)
+
+
+@app.route("/jobs/<int:job_id>/events")
+@login_required
+def job_events(job_id):
+    """Server-sent events stream of job progress until the job finishes"""
+    if not _owned_job(job_id):
+        return {"error": "not found"}, 404
+
+    def stream():
+        last = None
+        while True:
+            conn = get_db()
+            job = jobs.get_job(conn, job_id)
+            conn.close()
+            payload = _job_status_payload(job)
+            if payload != last:
+                yield f"data: {json.dumps(payload)}\n\n"
+                last = payload
+            if job["status"] in jobs.FINISHED:
+                return
+            time.sleep(1)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.route("/jobs/<int:job_id>/cancel", methods=["POST"])
+@login_required
+def cancel_job(job_id):
+    if _owned_job(job_id):
+        conn = get_db()
+        jobs.cancel(conn, job_id)
+        conn.close()
+        flash("Cancellation requested.", "info")
+    return redirect(url_for("job_status", job_id=job_id))
+
+
+@app.route("/jobs/<int:job_id>/result")
+@login_required
+def job_result(job_id):
+    job = _owned_job(job_id)
+    if not job or job["status"] != jobs.DONE or not job["result"]:
+        flash("Result not available.", "warning")
+        return redirect(url_for("job_status", job_id=job_id) if job else url_for("dashboard"))
+    context = job["result"]["context"]
+    filename = job["params"].get("filename")
+    # Older jobs' preview folders are removed by artifact GC
+    artifacts_expired = bool(filename) and artifact_store.expired(filename, job_id, context)
+    return render_template(job["result"]["template"], artifacts_expired=artifacts_expired, **context)
+
+
+# ======================================================
+#                RUN APP (SINGLE MAIN BLOCK)
+# ======================================================
+@app.route("/debug_db")
+@login_required
+def debug_db():
+    counts = repo.counts()
+    files = [row["filename"] for row in repo.list_uploads()]
 
     return {
-        "uploads_count": uploads,
-        "timestamps_count": timestamps,
-        "tampers_count": tampers,
+        "backend": repo.backend.name,
+        "uploads_count": counts["uploads"],
+        "timestamps_count": counts["timestamps"],
+        "tampers_count": counts["tampers"],
         "latest_files": files
     }
 
@@ -1599,4 +1732,16 @@ if __name__ == "__main__":
         print("ℹ️ Using existing database.")
 
     debug_mode = os.environ.get("DEBUG", "False") == "True"
-    app.run(debug=debug_mode)
+
+    # Background analysis workers (the reloader parent doesn't need them)
+    job_pool = None
+    if os.environ.get("JOB_EMBEDDED_POOL", "True") == "True" and (
+        not debug_mode or os.environ.get("WERKZEUG_RUN_MAIN") == "true"
+    ):
+        job_pool = jobs.start_worker_pool()
+
+    try:
+        app.run(debug=debug_mode)
+    finally:
+        if job_pool is not None:
+            job_pool.terminate()
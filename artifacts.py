@@ -0,0 +1,159 @@
+"""
+Per-job, per-evidence artifact directories under static/crops.
+
+Every analysis job writes its previews to
+
+    static/crops/<evidence>/<job id>/<file>
+
+so concurrent jobs (other analysts, other workers) never touch each
+other's files. Templates link to "crops/" + the path relative to the root,
+which is what JobArtifacts.rel() returns and what the analyzers record.
+
+Old job directories are garbage-collected: older than the retention
+period, beyond the newest few per evidence, and oldest-first while an
+evidence folder or the whole root is over its size quota. Directories
+younger than ARTIFACT_MIN_AGE_SECONDS are never removed, so a job that is
+still writing is safe from a collection started by another worker.
+A result page whose folder was collected says so (ArtifactStore.expired)
+instead of showing broken images.
+"""
+import os
+import re
+import json
+import time
+import shutil
+
+
+ARTIFACT_RETENTION_HOURS = float(os.environ.get("ARTIFACT_RETENTION_HOURS", 72))
+ARTIFACT_KEEP_PER_EVIDENCE = int(os.environ.get("ARTIFACT_KEEP_PER_EVIDENCE", 3))
+ARTIFACT_EVIDENCE_MAX_MB = float(os.environ.get("ARTIFACT_EVIDENCE_MAX_MB", 200))
+ARTIFACT_TOTAL_MAX_MB = float(os.environ.get("ARTIFACT_TOTAL_MAX_MB", 2048))
+ARTIFACT_MIN_AGE_SECONDS = float(os.environ.get("ARTIFACT_MIN_AGE_SECONDS", 600))
+
+
+def evidence_key(filename):
+    """Directory name for a video (its basename without extension, path-safe)."""
+    stem = os.path.splitext(os.path.basename(filename))[0]
+    return re.sub(r"[^A-Za-z0-9._-]", "_", stem).lstrip(".") or "evidence"
+
+
+def _dir_size(path):
+    total = 0
+    for dirpath, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.path.getsize(os.path.join(dirpath, name))
+            except OSError:
+                pass
+    return total
+
+
+class JobArtifacts:
+    """One job's output directory."""
+
+    def __init__(self, root, evidence, job_id):
+        self.evidence = evidence
+        self.job_id = str(job_id)
+        self.prefix = f"{evidence}/{self.job_id}/"
+        self.path = os.path.join(root, evidence, self.job_id)
+        os.makedirs(self.path, exist_ok=True)
+
+    def file(self, name):
+        return os.path.join(self.path, name)
+
+    def rel(self, name):
+        """Path relative to the artifact root (for url_for('static', 'crops/' + ...))."""
+        return self.prefix + name
+
+
+class ArtifactStore:
+    def __init__(self, root, retention_hours=None, keep_per_evidence=None,
+                 evidence_max_mb=None, total_max_mb=None, min_age_seconds=None):
+        self.root = root
+        self.retention = 3600 * (ARTIFACT_RETENTION_HOURS if retention_hours is None else retention_hours)
+        self.keep_per_evidence = ARTIFACT_KEEP_PER_EVIDENCE if keep_per_evidence is None else keep_per_evidence
+        self.evidence_max = 1024 * 1024 * (ARTIFACT_EVIDENCE_MAX_MB if evidence_max_mb is None else evidence_max_mb)
+        self.total_max = 1024 * 1024 * (ARTIFACT_TOTAL_MAX_MB if total_max_mb is None else total_max_mb)
+        self.min_age = ARTIFACT_MIN_AGE_SECONDS if min_age_seconds is None else min_age_seconds
+        os.makedirs(root, exist_ok=True)
+
+    def job_dir(self, filename, job_id):
+        return JobArtifacts(self.root, evidence_key(filename), job_id)
+
+    def delete_evidence(self, filename):
+        """Remove every job directory of a video (evidence deleted)."""
+        shutil.rmtree(os.path.join(self.root, evidence_key(filename)), ignore_errors=True)
+
+    def _job_dirs(self):
+        """[(mtime, size, evidence, path)] for every job directory."""
+        found = []
+        for evidence in os.listdir(self.root):
+            evidence_path = os.path.join(self.root, evidence)
+            if not os.path.isdir(evidence_path):
+                continue  # legacy flat files from before per-job directories
+            for job in os.listdir(evidence_path):
+                path = os.path.join(evidence_path, job)
+                if os.path.isdir(path):
+                    try:
+                        mtime = os.path.getmtime(path)
+                    except OSError:
+                        continue
+                    found.append((mtime, _dir_size(path), evidence, path))
+        return found
+
+    def collect_garbage(self, protect=()):
+        """Apply retention and quotas; returns (directories removed, bytes freed)."""
+        now = time.time()
+        protect = {os.path.abspath(p) for p in protect}
+        dirs = sorted(self._job_dirs(), reverse=True)  # newest first
+        doomed = set()
+
+        def removable(entry):
+            return now - entry[0] >= self.min_age and os.path.abspath(entry[3]) not in protect
+
+        per_evidence = {}
+        for entry in dirs:
+            per_evidence.setdefault(entry[2], []).append(entry)
+
+        for entries in per_evidence.values():
+            used = 0
+            for rank, entry in enumerate(entries):
+                expired = now - entry[0] > self.retention or rank >= self.keep_per_evidence
+                over_quota = used + entry[1] > self.evidence_max
+                if (expired or over_quota) and removable(entry):
+                    doomed.add(entry[3])
+                else:
+                    used += entry[1]
+
+        total = sum(e[1] for e in dirs if e[3] not in doomed)
+        for entry in reversed(dirs):  # oldest first
+            if total <= self.total_max:
+                break
+            if entry[3] not in doomed and removable(entry):
+                doomed.add(entry[3])
+                total -= entry[1]
+
+        freed = 0
+        for entry in dirs:
+            if entry[3] in doomed:
+                shutil.rmtree(entry[3], ignore_errors=True)
+                freed += entry[1]
+        for evidence in per_evidence:
+            try:
+                os.rmdir(os.path.join(self.root, evidence))  # only if now empty
+            except OSError:
+                pass
+
+        if doomed:
+            print(f"🧹 Artifact GC removed {len(doomed)} job folder(s), {freed / 1024 / 1024:.1f} MB")
+        return len(doomed), freed
+
+    def expired(self, filename, job_id, result):
+        """
+        True if `result` (a job's stored result) links to files in the job's
+        directory and that directory has since been garbage-collected.
+        """
+        prefix = f"{evidence_key(filename)}/{job_id}/"
+        if prefix not in json.dumps(result, default=str):
+            return False
+        return not os.path.isdir(os.path.join(self.root, evidence_key(filename), str(job_id)))
@@ -0,0 +1,72 @@
+"""
+Benchmark YOLO plate inference throughput at different batch sizes.
+
+    python bench_yolo_batch.py --video uploads/clip.mp4 --batch-sizes 1,2,4,8,16
+
+Loads --frames sampled frames into memory first so only inference is
+timed, then reports frames/second per batch size (CPU by default).
+"""
+import os
+import time
+import argparse
+
+import cv2
+from ultralytics import YOLO
+
+from analyzers import predict_batch
+
+
+def load_frames(video_path, count, stride):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    index = 0
+    while len(frames) < count:
+        if not cap.grab():
+            break
+        if index % stride == 0:
+            ret, frame = cap.retrieve()
+            if not ret:
+                break
+            frames.append(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        index += 1
+    cap.release()
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--video", required=True)
+    parser.add_argument("--weights", default="best.pt" if os.path.exists("best.pt") else "yolov8n.pt")
+    parser.add_argument("--frames", type=int, default=64)
+    parser.add_argument("--stride", type=int, default=15)
+    parser.add_argument("--batch-sizes", default="1,2,4,8,16")
+    parser.add_argument("--device", default="cpu")
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames, args.stride)
+    if not frames:
+        raise SystemExit(f"No frames read from {args.video}")
+
+    model = YOLO(args.weights)
+    model.to(args.device)
+    predict_batch(model, frames[:1])  # warm-up
+
+    print(f"weights={args.weights} device={args.device} frames={len(frames)} "
+          f"size={frames[0].shape[1]}x{frames[0].shape[0]}")
+    print(f"{'batch':>6} {'frames/s':>10} {'ms/frame':>10}")
+
+    for batch_size in [int(b) for b in args.batch_sizes.split(",")]:
+        best = None
+        for _ in range(args.repeats):
+            start = time.perf_counter()
+            for i in range(0, len(frames), batch_size):
+                predict_batch(model, frames[i:i + batch_size])
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        fps = len(frames) / best
+        print(f"{batch_size:>6} {fps:>10.2f} {1000 / fps:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
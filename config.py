@@ -6,19 +6,20 @@ load_dotenv()
 # ===============================================
 # DATABASE CONFIGURATION
 # ===============================================
-# Currently using SQLite locally, but these are
-# environment variables ready for MySQL migration
-# on DigitalOcean
+# DB_BACKEND selects where uploads, tamper, timestamp
+# and plate records live (see repository.py):
+#   sqlite - dashcam.db next to the app (default)
+#   mysql  - MySQL server, e.g. DigitalOcean managed
+#            MySQL. One app node: users, jobs and
+#            analysis details stay in the local dashcam.db
+#   memory - throwaway in-memory SQLite (tests / demos)
 
-app.config['MYSQL_HOST'] = os.environ.get('MYSQL_HOST', 'localhost')
-app.config['MYSQL_PORT'] = int(os.environ.get('MYSQL_PORT', 3306))
-app.config['MYSQL_USER'] = os.environ.get('MYSQL_USER', 'root')
-app.config['MYSQL_PASSWORD'] = os.environ.get('MYSQL_PASSWORD', '')
-app.config['MYSQL_DB'] = os.environ.get('MYSQL_DB', 'dashcam_forensics')
-app.config['MYSQL_CURSORCLASS'] = 'DictCursor'
-
-# ===============================================
-# NOTE: Flask app is initialized in app.py
-# This file is for reference/future MySQL migration
-# ===============================================
+DB_BACKEND = os.environ.get('DB_BACKEND', 'sqlite').lower()
 
+MYSQL_HOST = os.environ.get('MYSQL_HOST', 'localhost')
+MYSQL_PORT = int(os.environ.get('MYSQL_PORT', 3306))
+MYSQL_USER = os.environ.get('MYSQL_USER', 'root')
+MYSQL_PASSWORD = os.environ.get('MYSQL_PASSWORD', '')
+MYSQL_DB = os.environ.get('MYSQL_DB', 'dashcam_forensics')
+MYSQL_POOL_SIZE = int(os.environ.get('MYSQL_POOL_SIZE', 8))
+MYSQL_CONNECT_TIMEOUT = int(os.environ.get('MYSQL_CONNECT_TIMEOUT', 10))
@@ -0,0 +1,562 @@
+"""
+Container-level (MP4 / MOV) structure analysis - no pixel decoding.
+
+A SHA-256 baseline only proves the file has not changed since upload;
+footage edited before upload still matches its own hash. Editing leaves
+traces in the ISO-BMFF box tree, though, and those can be read in seconds
+on multi-GB files: only box headers are visited in the file, and only the
+moov box (sample tables, a few MB) is read into memory.
+
+For each track the sample tables are expanded into a keyframe / GOP index
+and a DTS / PTS timeline (stts, ctts, stss, stsz, stco/co64, elst), and
+the encoder tags (udta/ilst metadata, handler and compressor names, the
+in-band SEI of the first sample) are collected. Findings are flags:
+
+    high    - a splice, a timing hole or a broken table (review required)
+    medium  - re-encoding / re-muxing or metadata edits
+    info    - structure worth noting (layout, brands, variable frame rate)
+
+Dashcams encode with a fixed GOP and a constant frame duration, so a GOP
+of unusual length or a gap in the timeline marks where footage was cut.
+"""
+import os
+import re
+import json
+import time
+import struct
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+
+# moov boxes bigger than this are not read (malformed or hostile files)
+MAX_MOOV_BYTES = int(os.environ.get("MAX_MOOV_BYTES", 256 * 1024 * 1024))
+# Bytes of the first video sample scanned for encoder SEI strings
+SEI_SCAN_BYTES = 64 * 1024
+# Listed irregular GOPs / gaps per track (all are counted)
+MAX_LISTED_EVENTS = 20
+# Slack (s) on the mvhd creation -> modification interval beyond the movie's
+# duration; dashcams stamp creation when recording starts and modification
+# when the clip is closed
+MVHD_TIME_MARGIN = 5
+
+CONTAINER_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS container_structure (
+        filename TEXT PRIMARY KEY,
+        sha256 TEXT,
+        verdict TEXT NOT NULL,
+        flags TEXT NOT NULL,
+        summary TEXT NOT NULL,
+        analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+CONTAINER_BOXES = {"moov", "trak", "mdia", "minf", "stbl", "edts", "udta", "dinf", "mvex", "ilst"}
+TOP_LEVEL_BOXES = {"ftyp", "moov", "mdat", "free", "skip", "wide", "uuid", "moof", "mfra", "meta", "pdin", "sidx", "styp"}
+
+# Software that re-encodes or re-muxes; a dashcam does not write these
+EDITING_SOFTWARE = re.compile(
+    r"lavf|lavc|ffmpeg|x264|x265|handbrake|premiere|adobe|after effects|final cut|imovie|"
+    r"davinci|resolve|capcut|kinemaster|vegas|shotcut|openshot|movavi|filmora|avidemux|"
+    r"mp4box|gpac|bento4|clipchamp|inshot|vn video",
+    re.IGNORECASE,
+)
+# Default hdlr names written by ffmpeg's muxer
+FFMPEG_HANDLER_NAMES = {"VideoHandler", "SoundHandler", "DataHandler"}
+SEI_SIGNATURES = (b"x264 - core", b"x265 (build", b"Lavc", b"HandBrake")
+
+NOT_ANALYSED = "Not analysed ❗"
+
+MP4_EPOCH = datetime(1904, 1, 1, tzinfo=timezone.utc)
+
+
+# ======================================================
+#                    BOX READING
+# ======================================================
+def _boxes_in_file(f, start, end):
+    """(type, offset, header size, size, truncated) of boxes in [start, end) of a file."""
+    pos = start
+    while pos + 8 <= end:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            break
+        size, kind = struct.unpack(">I4s", header[:8])
+        header_size = 8
+        if size == 1 and len(header) == 16:
+            size, header_size = struct.unpack(">Q", header[8:16])[0], 16
+        elif size == 0:
+            size = end - pos
+        kind = kind.decode("latin-1")
+        if size < header_size or pos + size > end:
+            yield kind, pos, header_size, end - pos, True
+            return
+        yield kind, pos, header_size, size, False
+        pos += size
+
+
+def _boxes_in(buf, start, end):
+    """(type, payload start, payload end) of boxes in buf[start:end]."""
+    pos = start
+    while pos + 8 <= end:
+        size, kind = struct.unpack_from(">I4s", buf, pos)
+        header_size = 8
+        if size == 1:
+            size, header_size = struct.unpack_from(">Q", buf, pos + 8)[0], 16
+        elif size == 0:
+            size = end - pos
+        if size < header_size or pos + size > end:
+            return
+        yield kind.decode("latin-1"), pos + header_size, pos + size
+        pos += size
+
+
+def _tree(buf, start, end):
+    """{type: [(payload start, payload end, children)]} for a box range, recursively."""
+    tree = {}
+    for kind, a, b in _boxes_in(buf, start, end):
+        children = None
+        if kind in CONTAINER_BOXES:
+            children = _tree(buf, a, b)
+        elif kind == "meta":
+            # ISO meta is a full box (4 bytes version/flags); QuickTime's is not
+            skip = 4 if buf[a:a + 4] == b"\x00\x00\x00\x00" else 0
+            children = _tree(buf, a + skip, b)
+        tree.setdefault(kind, []).append((a, b, children))
+    return tree
+
+
+def _first(tree, *path):
+    """Payload (start, end, children) of the first box along a path, or None."""
+    node = None
+    for kind in path:
+        if tree is None or kind not in tree:
+            return None
+        node = tree[kind][0]
+        tree = node[2]
+    return node
+
+
+# ======================================================
+#                    BOX PARSERS
+# ======================================================
+def _mp4_time(seconds):
+    if not seconds:
+        return None
+    try:
+        return (MP4_EPOCH + timedelta(seconds=seconds)).strftime("%Y-%m-%d %H:%M:%S")
+    except OverflowError:
+        return None
+
+
+def _parse_times(buf, a):
+    """(creation, modification, timescale, duration) of an mvhd / mdhd payload."""
+    if buf[a] == 1:
+        return struct.unpack_from(">QQIQ", buf, a + 4)
+    return struct.unpack_from(">IIII", buf, a + 4)
+
+
+def _parse_hdlr(buf, a, b):
+    handler = buf[a + 8:a + 12].decode("latin-1")
+    name = buf[a + 24:b]
+    if name and name[0] == len(name) - 1:  # QuickTime Pascal string
+        name = name[1:]
+    return handler, name.split(b"\x00")[0].decode("utf-8", "replace").strip()
+
+
+def _parse_stsd(buf, a, b):
+    """Codec and visual fields of the first sample entry."""
+    entry = a + 8
+    if entry + 8 > b:
+        return {}
+    codec = buf[entry + 4:entry + 8].decode("latin-1")
+    info = {"codec": codec}
+    if entry + 86 <= b and codec in ("avc1", "avc3", "hvc1", "hev1", "mp4v", "jpeg", "mjpa", "mjpb"):
+        info["width"], info["height"] = struct.unpack_from(">HH", buf, entry + 32)
+        length = min(buf[entry + 50], 31)
+        info["compressor"] = buf[entry + 51:entry + 51 + length].decode("latin-1", "replace").strip("\x00 ")
+        end = entry + struct.unpack_from(">I", buf, entry)[0]
+        for kind, ca, cb in _boxes_in(buf, entry + 86, min(end, b)):
+            if kind == "avcC" and cb - ca >= 4:
+                info["profile"], info["level"] = buf[ca + 1], buf[ca + 3]
+    return info
+
+
+def _table(buf, a, dtype, columns=1, header=8):
+    """A counted table after version/flags + entry count (numpy, big-endian)."""
+    count = struct.unpack_from(">I", buf, a + 4)[0]
+    table = np.frombuffer(buf, dtype=dtype, count=count * columns, offset=a + header)
+    return table.reshape(-1, columns) if columns > 1 else table
+
+
+def _parse_elst(buf, a):
+    version = buf[a]
+    count = struct.unpack_from(">I", buf, a + 4)[0]
+    fmt, step = (">Qqhh", 20) if version == 1 else (">Iihh", 12)
+    entries = []
+    for i in range(count):
+        duration, media_time, rate, _ = struct.unpack_from(fmt, buf, a + 8 + i * step)
+        entries.append({"segment_duration": duration, "media_time": media_time, "rate": rate})
+    return entries
+
+
+def _metadata_tags(buf, tree):
+    """Encoder / software strings from moov udta (QuickTime ©-atoms) and ilst."""
+    tags = []
+    udta = _first(tree, "udta")
+    if udta is not None:
+        for kind, a, b in _boxes_in(buf, udta[0], udta[1]):
+            if kind.startswith("\xa9") and b - a > 4:
+                length = struct.unpack_from(">H", buf, a)[0]
+                text = buf[a + 4:a + 4 + length].decode("utf-8", "replace").strip("\x00 ")
+                if text:
+                    tags.append({"source": "udta " + kind.replace("\xa9", "©"), "value": text})
+    for path in (("udta", "meta", "ilst"), ("meta", "ilst")):
+        ilst = _first(tree, *path)
+        if ilst is None:
+            continue
+        for kind, a, b in _boxes_in(buf, ilst[0], ilst[1]):
+            for data_kind, da, db in _boxes_in(buf, a, b):
+                if data_kind == "data" and db - da > 8:
+                    text = buf[da + 8:db].decode("utf-8", "replace").strip("\x00 ")
+                    if text and text.isprintable():
+                        tags.append({"source": "ilst " + kind.replace("\xa9", "©"), "value": text})
+    return tags
+
+
+# ======================================================
+#                  TRACK ANALYSIS
+# ======================================================
+def _flag(flags, severity, code, message):
+    flags.append({"severity": severity, "code": code, "message": message})
+
+
+def _events(times, values, key):
+    return [{"time": round(float(t), 3), key: v} for t, v in zip(times[:MAX_LISTED_EVENTS], values[:MAX_LISTED_EVENTS])]
+
+
+def _analyze_track(buf, trak, flags, file_size, mdat_ranges):
+    mdhd = _first(trak, "mdia", "mdhd")
+    hdlr = _first(trak, "mdia", "hdlr")
+    stbl = _first(trak, "mdia", "minf", "stbl")
+    if mdhd is None or hdlr is None or stbl is None:
+        return None
+
+    _, _, timescale, duration = _parse_times(buf, mdhd[0])
+    handler, handler_name = _parse_hdlr(buf, hdlr[0], hdlr[1])
+    tkhd = _first(trak, "tkhd")
+    track_id = None
+    if tkhd is not None:
+        track_id = struct.unpack_from(">I", buf, tkhd[0] + (20 if buf[tkhd[0]] == 1 else 12))[0]
+    track = {
+        "id": track_id,
+        "handler": handler,
+        "handler_name": handler_name,
+        "timescale": timescale,
+        "duration": round(duration / timescale, 3) if timescale else None,
+    }
+    label = f"track {track_id} ({handler})"
+    st = stbl[2]
+
+    stsd = _first(st, "stsd")
+    if stsd is not None:
+        track.update(_parse_stsd(buf, stsd[0], stsd[1]))
+
+    edits = _first(trak, "edts", "elst")
+    if edits is not None:
+        track["edit_list"] = _parse_elst(buf, edits[0])
+
+    stts = _first(st, "stts")
+    stsz = _first(st, "stsz")
+    if stts is None or stsz is None:
+        return track  # fragmented file: samples live in moof boxes
+
+    # ===== SAMPLE COUNTS =====
+    runs = _table(buf, stts[0], ">u4", columns=2)
+    deltas = np.repeat(runs[:, 1].astype(np.int64), runs[:, 0].astype(np.int64))
+    uniform_size, size_count = struct.unpack_from(">II", buf, stsz[0] + 4)
+    sizes = (np.full(size_count, uniform_size, np.int64) if uniform_size
+             else np.frombuffer(buf, ">u4", count=size_count, offset=stsz[0] + 12).astype(np.int64))
+    n = len(sizes)
+    track["samples"] = n
+    track["bytes"] = int(sizes.sum())
+    if len(deltas) != n:
+        _flag(flags, "high", "table_mismatch",
+              f"{label}: stts describes {len(deltas)} samples, stsz {n} - sample tables were edited or damaged")
+        n = min(n, len(deltas))
+        deltas, sizes = deltas[:n], sizes[:n]
+    if n == 0:
+        return track
+
+    # ===== CHUNK OFFSETS =====
+    stco = _first(st, "stco") or _first(st, "co64")
+    if stco is not None:
+        offsets = _table(buf, stco[0], ">u4" if _first(st, "stco") else ">u8").astype(np.int64)
+        track["chunks"] = len(offsets)
+        if len(offsets) and (offsets.max() >= file_size):
+            _flag(flags, "high", "offset_out_of_file",
+                  f"{label}: chunk data points past the end of the file (truncated or cut)")
+        elif len(offsets) and mdat_ranges:
+            inside = np.zeros(len(offsets), bool)
+            for start, end in mdat_ranges:
+                inside |= (offsets >= start) & (offsets < end)
+            if not inside.all():
+                _flag(flags, "high", "offset_outside_mdat",
+                      f"{label}: {int((~inside).sum())} chunk(s) point outside the media data")
+        track["first_sample_offset"] = int(offsets[0]) if len(offsets) else None
+
+    # ===== TIMELINE (DTS / PTS) =====
+    dts = np.concatenate(([0], np.cumsum(deltas[:-1])))
+    ctts = _first(st, "ctts")
+    pts = dts
+    if ctts is not None:
+        crun = _table(buf, ctts[0], ">i4", columns=2)
+        shifts = np.repeat(crun[:, 1].astype(np.int64), np.maximum(crun[:, 0], 0).astype(np.int64))
+        if len(shifts) == n:
+            pts = dts + shifts
+            track["b_frames"] = bool((shifts != shifts[0]).any())
+        else:
+            _flag(flags, "high", "table_mismatch",
+                  f"{label}: ctts describes {len(shifts)} samples, stsz {n}")
+    scale = float(timescale or 1)
+
+    if n > 2:
+        nominal = int(np.median(deltas[:-1]))
+        track["frame_rate"] = round(scale / nominal, 3) if nominal else None
+        if (deltas[:-1] <= 0).any():
+            _flag(flags, "high", "dts_not_increasing",
+                  f"{label}: {int((deltas[:-1] <= 0).sum())} sample(s) with zero or negative duration")
+
+        ordered = np.sort(pts)
+        steps = np.diff(ordered)
+        duplicates = int((steps == 0).sum())
+        if duplicates:
+            _flag(flags, "high", "duplicate_pts", f"{label}: {duplicates} duplicated presentation timestamp(s)")
+        if nominal > 0:
+            gap_idx = np.nonzero(steps > 1.5 * nominal)[0]
+            track["gap_count"] = len(gap_idx)
+            track["gaps"] = _events(ordered[gap_idx] / scale,
+                                    [round(float(steps[i] - nominal) / scale, 3) for i in gap_idx], "missing")
+            if len(gap_idx) and handler == "vide":
+                _flag(flags, "high", "timestamp_gap",
+                      f"{label}: {len(gap_idx)} gap(s) in the presentation timeline, "
+                      f"first at {track['gaps'][0]['time']} s")
+            distinct = len(np.unique(deltas[:-1]))
+            if handler == "vide" and distinct > 3 and not len(gap_idx):
+                _flag(flags, "info", "variable_frame_rate", f"{label}: {distinct} different frame durations")
+
+    # ===== KEYFRAMES / GOPs (video) =====
+    if handler == "vide":
+        stss = _first(st, "stss")
+        if stss is None:
+            track["keyframes"] = n  # every sample is a sync sample
+        else:
+            keys = _table(buf, stss[0], ">u4").astype(np.int64) - 1
+            keys = keys[(keys >= 0) & (keys < n)]
+            track["keyframes"] = len(keys)
+            if len(keys) and keys[0] != 0:
+                _flag(flags, "medium", "starts_mid_gop",
+                      f"{label}: the first sample is not a keyframe (cut without re-encoding)")
+            gops = np.diff(np.concatenate((keys, [n])))
+            track["keyframe_times"] = [round(float(t), 3) for t in (dts[keys[:MAX_LISTED_EVENTS]] / scale)]
+            if len(gops):
+                values, counts = np.unique(gops[:-1] if len(gops) > 1 else gops, return_counts=True)
+                nominal_gop = int(values[counts.argmax()])
+                share = counts.max() / counts.sum()
+                track["gop"] = {
+                    "nominal": nominal_gop, "min": int(gops.min()), "max": int(gops.max()),
+                    "mean": round(float(gops.mean()), 2), "regular_share": round(float(share), 3),
+                }
+                # The last GOP is cut short by the end of the recording
+                body = gops[:-1]
+                odd = np.nonzero(np.abs(body - nominal_gop) > 1)[0]
+                # A splice typically leaves one or two odd GOPs in an otherwise fixed pattern
+                if len(body) >= 3 and share >= 0.6 and len(odd):
+                    track["gop"]["irregular_count"] = len(odd)
+                    track["gop"]["irregular"] = _events(dts[keys[odd]] / scale, [int(gops[i]) for i in odd], "length")
+                    _flag(flags, "high", "irregular_gop",
+                          f"{label}: {len(odd)} GOP(s) break the fixed {nominal_gop}-frame pattern, "
+                          f"first at {track['gop']['irregular'][0]['time']} s (possible splice)")
+                elif len(body) >= 4 and share < 0.5:
+                    _flag(flags, "medium", "adaptive_gop",
+                          f"{label}: GOP length varies ({int(gops.min())}-{int(gops.max())} frames), "
+                          "typical of a software re-encode rather than a dashcam")
+
+    # ===== EDIT LIST =====
+    edits = track.get("edit_list") or []
+    empty = [e for e in edits if e["media_time"] == -1]
+    if len(edits) - len(empty) > 1 or (empty and edits[0]["media_time"] != -1):
+        _flag(flags, "medium", "edit_list",
+              f"{label}: edit list with {len(edits)} entries - playback is trimmed or rearranged")
+    elif edits and n > 2 and edits[-1]["media_time"] > 0 and handler == "vide":
+        skipped = edits[-1]["media_time"] / scale
+        if skipped > 1.0:
+            _flag(flags, "medium", "edit_list_trim",
+                  f"{label}: the edit list hides the first {skipped:.2f} s of media")
+    return track
+
+
+def _scan_sei(f, track):
+    """Encoder strings in the first video sample (x264 / x265 / libavcodec SEI)."""
+    offset = track.get("first_sample_offset")
+    if offset is None:
+        return []
+    f.seek(offset)
+    data = f.read(SEI_SCAN_BYTES)
+    found = []
+    for signature in SEI_SIGNATURES:
+        pos = data.find(signature)
+        if pos >= 0:
+            end = data.find(b"\x00", pos)
+            text = data[pos:end if end > 0 else pos + 80][:80].decode("latin-1", "replace")
+            found.append({"source": "in-band SEI", "value": text})
+    return found
+
+
+# ======================================================
+#                     ENTRY POINT
+# ======================================================
+def analyze(path):
+    """Structure summary of an MP4 / MOV file: tracks, tags, flags and verdict."""
+    started = time.perf_counter()
+    file_size = os.path.getsize(path)
+    flags = []
+    summary = {"format": "unsupported", "size": file_size, "top_level": [], "tracks": [], "encoder_tags": []}
+
+    with open(path, "rb") as f:
+        boxes = list(_boxes_in_file(f, 0, file_size))
+        if not boxes or boxes[0][0] not in TOP_LEVEL_BOXES:
+            _flag(flags, "info", "not_iso_bmff", "Not an MP4/MOV container; structure analysis skipped")
+            summary.update(flags=flags, verdict=NOT_ANALYSED, elapsed=round(time.perf_counter() - started, 3))
+            return summary
+
+        summary["top_level"] = [{"type": k, "offset": o, "size": s} for k, o, _, s, _ in boxes[:50]]
+        mdat_ranges = [(o + h, o + s) for k, o, h, s, _ in boxes if k == "mdat"]
+        order = [k for k, *_ in boxes]
+        if any(t for *_, t in boxes):
+            _flag(flags, "high", "truncated", "A top-level box runs past the end of the file (truncated or cut)")
+
+        ftyp = next((b for b in boxes if b[0] == "ftyp"), None)
+        if ftyp is not None:
+            f.seek(ftyp[1] + ftyp[2])
+            data = f.read(min(ftyp[3] - ftyp[2], 256))
+            summary["brand"] = data[:4].decode("latin-1")
+            summary["compatible_brands"] = [data[i:i + 4].decode("latin-1") for i in range(8, len(data) - 3, 4)]
+        summary["format"] = "mov" if summary.get("brand", "qt  ") == "qt  " else "mp4"
+
+        moov = next((b for b in boxes if b[0] == "moov"), None)
+        if "moof" in order:
+            summary["fragmented"] = True
+            _flag(flags, "info", "fragmented", "Fragmented MP4: per-fragment sample tables are not indexed")
+        if moov is None:
+            _flag(flags, "high", "no_moov", "No moov box - the file cannot be played as recorded")
+            summary.update(flags=flags, verdict=verdict(flags), elapsed=round(time.perf_counter() - started, 3))
+            return summary
+        if "mdat" in order:
+            summary["moov_before_mdat"] = order.index("moov") < order.index("mdat")
+        if order.count("mdat") > 1:
+            _flag(flags, "info", "multiple_mdat", f"{order.count('mdat')} media data boxes")
+        if moov[3] > MAX_MOOV_BYTES:
+            _flag(flags, "high", "moov_too_large", f"moov box of {moov[3]} bytes not analysed")
+            summary.update(flags=flags, verdict=verdict(flags), elapsed=round(time.perf_counter() - started, 3))
+            return summary
+
+        f.seek(moov[1] + moov[2])
+        buf = f.read(moov[3] - moov[2])
+        tree = _tree(buf, 0, len(buf))
+
+        mvhd = _first(tree, "mvhd")
+        if mvhd is not None:
+            created, modified, timescale, duration = _parse_times(buf, mvhd[0])
+            summary["created"], summary["modified"] = _mp4_time(created), _mp4_time(modified)
+            summary["duration"] = round(duration / timescale, 3) if timescale else None
+            elapsed = modified - created
+            length = summary["duration"] or 0
+            if created and modified and (elapsed < -MVHD_TIME_MARGIN or elapsed > length + MVHD_TIME_MARGIN):
+                _flag(flags, "medium", "modified_after_creation",
+                      f"Movie header modified {summary['modified']}, created {summary['created']} "
+                      f"({elapsed} s apart, movie is {length} s long)")
+
+        tags = _metadata_tags(buf, tree)
+        for a, b, trak in tree.get("trak", []):
+            track = _analyze_track(buf, trak, flags, file_size, mdat_ranges)
+            if track is None:
+                continue
+            summary["tracks"].append(track)
+            if track.get("handler_name") in FFMPEG_HANDLER_NAMES:
+                tags.append({"source": f"track {track['id']} hdlr", "value": f"{track['handler_name']} (ffmpeg muxer default)"})
+            elif track.get("handler_name"):
+                tags.append({"source": f"track {track['id']} hdlr", "value": track["handler_name"]})
+            if track.get("compressor"):
+                tags.append({"source": f"track {track['id']} compressor", "value": track["compressor"]})
+            if track["handler"] == "vide":
+                tags.extend(_scan_sei(f, track))
+        summary["encoder_tags"] = tags
+
+    # ===== RE-ENCODE / RE-MUX SIGNATURES =====
+    editors = [t for t in tags if EDITING_SOFTWARE.search(t["value"]) or "ffmpeg muxer" in t["value"]]
+    if editors:
+        _flag(flags, "medium", "editing_software",
+              "Written by editing / transcoding software: " + ", ".join(sorted({t["value"][:40] for t in editors})))
+
+    videos = [t for t in summary["tracks"] if t["handler"] == "vide" and t.get("duration")]
+    audios = [t for t in summary["tracks"] if t["handler"] == "soun" and t.get("duration")]
+    if videos and audios and abs(videos[0]["duration"] - audios[0]["duration"]) > 1.0:
+        _flag(flags, "medium", "av_duration_mismatch",
+              f"Video {videos[0]['duration']} s vs audio {audios[0]['duration']} s")
+    if not videos:
+        _flag(flags, "info", "no_video_index", "No indexed video track")
+
+    summary["flags"] = flags
+    summary["verdict"] = verdict(flags)
+    summary["elapsed"] = round(time.perf_counter() - started, 3)
+    return summary
+
+
+def verdict(flags):
+    severities = {f["severity"] for f in flags}
+    if "high" in severities:
+        return "Structural anomalies ❌"
+    if "medium" in severities:
+        return "Review recommended ⚠️"
+    return "Consistent ✅"
+
+
+# ======================================================
+#                     STORAGE
+# ======================================================
+def store(conn, filename, sha256, summary):
+    conn.execute("""
+        INSERT OR REPLACE INTO container_structure (filename, sha256, verdict, flags, summary, analyzed_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, (filename, sha256, summary["verdict"], json.dumps(summary["flags"]), json.dumps(summary, default=str)))
+
+
+def load(conn, filename):
+    row = conn.execute(
+        "SELECT sha256, summary, analyzed_at FROM container_structure WHERE filename=?", (filename,)
+    ).fetchone()
+    if row is None:
+        return None
+    summary = json.loads(row["summary"])
+    summary["sha256"] = row["sha256"]
+    summary["analyzed_at"] = row["analyzed_at"]
+    return summary
+
+
+def delete(conn, filename):
+    conn.execute("DELETE FROM container_structure WHERE filename=?", (filename,))
+
+
+def analyze_and_store(conn, filename, path, sha256):
+    """analyze() that never fails an upload; the stored summary records errors."""
+    try:
+        summary = analyze(path)
+    except Exception as e:
+        summary = {"format": "unknown", "tracks": [], "encoder_tags": [],
+                   "flags": [{"severity": "info", "code": "parse_error", "message": f"Structure parse failed: {e}"}]}
+        summary["verdict"] = NOT_ANALYSED
+    store(conn, filename, sha256, summary)
+    return summary
@@ -0,0 +1,183 @@
+"""
+Bounded pool of database connections (SQLite by default, any DB-API driver
+with `reset` / `ping` hooks - see repository.MySQLBackend).
+
+Connections are created (and their PRAGMAs applied) once, then handed out
+again instead of reconnecting on every get_db(). A PooledConnection looks
+like the underlying connection; its close() returns it to the pool.
+Inside a Flask request, app.py keeps one connection per app context and
+releases it at teardown.
+"""
+import os
+import threading
+
+
+DB_POOL_SIZE = int(os.environ.get("DB_POOL_SIZE", 8))
+
+
+class ConnectionPool:
+    """
+    `connect()` must return a ready-to-use connection (PRAGMAs applied);
+    up to `max_idle` released connections are kept for reuse.
+
+    `reset(conn)` runs on release (default: the sqlite3 rollback and
+    row_factory / isolation_level restore); `ping(conn)` runs on an idle
+    connection before reuse and a failure replaces it with a new one.
+    """
+
+    def __init__(self, connect, max_idle=None, reset=None, ping=None):
+        self.connect = connect
+        self.max_idle = DB_POOL_SIZE if max_idle is None else max_idle
+        self.reset = reset or self._reset_sqlite
+        self.ping = ping
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._idle = []
+        self._in_use = 0
+        self._defaults = {}
+        self._pid = os.getpid()
+
+    def _check_fork(self):
+        # Connections must not cross fork(); a child starts with an empty pool
+        if self._pid != os.getpid():
+            self._idle = []
+            self._in_use = 0
+            self.hits = self.misses = 0
+            self._pid = os.getpid()
+
+    def acquire(self):
+        with self._lock:
+            self._check_fork()
+            conn = self._idle.pop() if self._idle else None
+            if conn is not None:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self._in_use += 1
+        if conn is not None and self.ping is not None:
+            try:
+                self.ping(conn)
+            except Exception:
+                # Server closed it while idle (e.g. MySQL wait_timeout)
+                self._defaults.pop(id(conn), None)
+                try:
+                    conn.close()
+                except Exception:
+                    pass
+                conn = None
+        if conn is None:
+            try:
+                conn = self.connect()
+            except BaseException:
+                with self._lock:
+                    self._in_use -= 1
+                raise
+            if self.reset == self._reset_sqlite:
+                self._defaults[id(conn)] = (conn.row_factory, conn.isolation_level)
+        return PooledConnection(self, conn)
+
+    def _reset_sqlite(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        row_factory, isolation_level = self._defaults.get(id(conn), (None, ""))
+        conn.row_factory = row_factory
+        conn.isolation_level = isolation_level
+
+    def release(self, conn):
+        """Reset a connection and keep it for reuse (or close it if the pool is full)."""
+        try:
+            self.reset(conn)
+        except Exception:
+            self._discard(conn)
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                return
+            self._in_use -= 1
+            if len(self._idle) < self.max_idle:
+                self._idle.append(conn)
+                return
+        self._discard(conn, counted=True)
+
+    def _discard(self, conn, counted=False):
+        if not counted:
+            with self._lock:
+                self._in_use -= 1
+        self._defaults.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def close_all(self):
+        """Close idle connections (worker shutdown)."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            self._defaults.pop(id(conn), None)
+            try:
+                conn.close()
+            except Exception:
+                pass
+        return len(idle)
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(100.0 * self.hits / total, 1) if total else 0.0,
+                "idle": len(self._idle),
+                "in_use": self._in_use,
+            }
+
+
+class PooledConnection:
+    """Connection proxy whose close() hands the connection back to the pool."""
+
+    def __init__(self, pool, conn):
+        object.__setattr__(self, "_pool", pool)
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_released", False)
+
+    def __getattr__(self, name):
+        if self._released:
+            raise RuntimeError("connection already returned to the pool")
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    def close(self):
+        if not self._released:
+            object.__setattr__(self, "_released", True)
+            self._pool.release(self._conn)
+
+    def __del__(self):
+        # A caller that forgot close() still gives the connection back
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+class SharedConnection(PooledConnection):
+    """
+    A view of a connection owned by someone else (e.g. the current
+    request); close() does nothing and the owner releases it.
+    """
+
+    def close(self):
+        pass
+
+    def __del__(self):
+        pass
@@ -0,0 +1,450 @@
+"""
+Evidence hashing helpers.
+
+Uploads are hashed while they stream to disk so acquiring a piece of
+evidence costs a single read of the request body.
+"""
+import os
+import mmap
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+
+# ======================================================
+#                 TUNABLE BUFFER SIZES
+# ======================================================
+# Read/write chunk size used for ingest and re-verification (bytes).
+HASH_BUFFER_SIZE = int(os.environ.get("HASH_BUFFER_SIZE", 4 * 1024 * 1024))
+
+# Hash through mmap instead of read() calls (saves a copy per chunk).
+HASH_USE_MMAP = os.environ.get("HASH_USE_MMAP", "False") == "True"
+
+# Parallel verification: hashing threads, and how many of them may read
+# from disk at once (keep this near the number of independent disks).
+VERIFY_WORKERS = int(os.environ.get("VERIFY_WORKERS", os.cpu_count() or 4))
+VERIFY_IO_CONCURRENCY = int(os.environ.get("VERIFY_IO_CONCURRENCY", 4))
+
+# Segment size for per-segment (Merkle leaf) digests.
+SEGMENT_SIZE = int(os.environ.get("HASH_SEGMENT_SIZE", 4 * 1024 * 1024))
+
+
+def hash_file(filepath, buffer_size=None, use_mmap=None):
+    """Return the SHA-256 hex digest of a file on disk."""
+    buffer_size = buffer_size or HASH_BUFFER_SIZE
+    use_mmap = HASH_USE_MMAP if use_mmap is None else use_mmap
+    sha256 = hashlib.sha256()
+    with open(filepath, "rb", buffering=0) as f:
+        if use_mmap and os.fstat(f.fileno()).st_size > 0:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                view = memoryview(mm)
+                try:
+                    for offset in range(0, len(mm), buffer_size):
+                        sha256.update(view[offset:offset + buffer_size])
+                finally:
+                    view.release()
+        else:
+            for chunk in iter(lambda: f.read(buffer_size), b""):
+                sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def ingest_stream(stream, dest_path, buffer_size=None, segment_size=None):
+    """
+    Copy an upload stream to dest_path, hashing and counting bytes in the
+    same pass. The file only appears under dest_path once it is complete.
+
+    Returns (sha256_hex, bytes_written, segment_digests).
+    """
+    buffer_size = buffer_size or HASH_BUFFER_SIZE
+    hasher = SegmentHasher(segment_size)
+    part_path = dest_path + ".part"
+
+    try:
+        with open(part_path, "wb", buffering=buffer_size) as out:
+            while True:
+                chunk = stream.read(buffer_size)
+                if not chunk:
+                    break
+                hasher.update(chunk)
+                out.write(chunk)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(part_path, dest_path)
+    except BaseException:
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        raise
+
+    return hasher.hexdigest(), hasher.size, hasher.segments()
+
+
+def ingest_upload(file_storage, dest_path, buffer_size=None):
+    """ingest_stream() for a werkzeug FileStorage."""
+    return ingest_stream(file_storage.stream, dest_path, buffer_size)
+
+
+# ======================================================
+#          VERIFICATION CACHE (FILE IDENTITY)
+# ======================================================
+# A file whose (device, inode, size, mtime_ns, ctime_ns) is unchanged since
+# its last full hash is not re-read; "deep" verification always re-reads.
+VERIFICATION_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS hash_verifications (
+        filename TEXT PRIMARY KEY,
+        st_dev INTEGER NOT NULL,
+        st_ino INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        mtime_ns INTEGER NOT NULL,
+        ctime_ns INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_full_verification TIMESTAMP
+    )
+"""
+
+
+def file_identity(filepath):
+    st = os.stat(filepath)
+    return (st.st_dev, st.st_ino, st.st_size, st.st_mtime_ns, st.st_ctime_ns)
+
+
+def verify_file(conn, filename, filepath, deep=False):
+    """
+    Return the current SHA-256 of filepath, reusing the cached digest when
+    the file identity is unchanged and deep is False.
+
+    Returns a dict: sha256, cached (bool), last_full_verification.
+    """
+    identity = file_identity(filepath)
+    if not deep:
+        cached = _cached_result(conn, filename, identity)
+        if cached:
+            return cached
+
+    digest = hash_file(filepath)
+    return _store_result(conn, filename, digest, identity)
+
+
+def _cached_result(conn, filename, identity):
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT st_dev, st_ino, size, mtime_ns, ctime_ns, sha256, last_full_verification
+        FROM hash_verifications WHERE filename=?
+    """, (filename,))
+    row = cur.fetchone()
+    if not row or tuple(row[:5]) != identity:
+        return None
+    cur.execute(
+        "UPDATE hash_verifications SET checked_at=CURRENT_TIMESTAMP WHERE filename=?",
+        (filename,)
+    )
+    return {"sha256": row[5], "cached": True, "last_full_verification": row[6]}
+
+
+def _store_result(conn, filename, digest, identity):
+    record_verification(conn, filename, digest, identity)
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT last_full_verification FROM hash_verifications WHERE filename=?",
+        (filename,)
+    )
+    return {"sha256": digest, "cached": False, "last_full_verification": cur.fetchone()[0]}
+
+
+def record_verification(conn, filename, digest, identity):
+    """Store a freshly computed digest against the file identity it was read from."""
+    conn.execute("""
+        INSERT INTO hash_verifications
+            (filename, st_dev, st_ino, size, mtime_ns, ctime_ns, sha256,
+             checked_at, last_full_verification)
+        VALUES (?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+        ON CONFLICT(filename) DO UPDATE SET
+            st_dev=excluded.st_dev,
+            st_ino=excluded.st_ino,
+            size=excluded.size,
+            mtime_ns=excluded.mtime_ns,
+            ctime_ns=excluded.ctime_ns,
+            sha256=excluded.sha256,
+            checked_at=CURRENT_TIMESTAMP,
+            last_full_verification=CURRENT_TIMESTAMP
+    """, (filename, *identity, digest))
+
+
+# ======================================================
+#          PARALLEL MULTI-FILE VERIFICATION
+# ======================================================
+def verify_many(conn, files, deep=False, max_workers=None, io_concurrency=None):
+    """
+    Verify many (filename, filepath) pairs at once and yield one result
+    dict per file as soon as it is known: cache hits first, then freshly
+    hashed files in completion order.
+
+    hashlib releases the GIL, so the hashing threads run in parallel; a
+    semaphore caps how many of them read from disk at the same time. All
+    database access stays on the calling thread.
+
+    Result dicts carry filename, filepath and either the verify_file()
+    fields or an "error" message.
+    """
+    max_workers = max_workers or VERIFY_WORKERS
+    io_gate = threading.Semaphore(io_concurrency or VERIFY_IO_CONCURRENCY)
+
+    def _hash(filepath):
+        with io_gate:
+            return hash_file(filepath)
+
+    pending = []
+    for filename, filepath in files:
+        try:
+            identity = file_identity(filepath)
+        except OSError as e:
+            yield {"filename": filename, "filepath": filepath, "error": str(e)}
+            continue
+        cached = None if deep else _cached_result(conn, filename, identity)
+        if cached:
+            yield dict(cached, filename=filename, filepath=filepath)
+        else:
+            pending.append((filename, filepath, identity))
+
+    if not pending:
+        return
+
+    # Not a `with` block: if the consumer stops early (client disconnected
+    # mid-stream), closing the generator must not wait for queued hashes
+    pool = ThreadPoolExecutor(max_workers=min(max_workers, len(pending)))
+    try:
+        futures = {
+            pool.submit(_hash, filepath): (filename, filepath, identity)
+            for filename, filepath, identity in pending
+        }
+        for future in as_completed(futures):
+            filename, filepath, identity = futures[future]
+            try:
+                digest = future.result()
+            except OSError as e:
+                yield {"filename": filename, "filepath": filepath, "error": str(e)}
+                continue
+            result = _store_result(conn, filename, digest, identity)
+            yield dict(result, filename=filename, filepath=filepath)
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+# ======================================================
+#        SEGMENTED (MERKLE TREE) EVIDENCE HASHING
+# ======================================================
+# Besides the whole-file SHA-256, the baseline keeps one digest per
+# SEGMENT_SIZE bytes and the Merkle root over them. A mismatch can then be
+# narrowed down to byte ranges, and single segments can be spot-checked
+# without reading the whole file.
+SEGMENT_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS tamper_merkle (
+        filename TEXT PRIMARY KEY,
+        file_size INTEGER NOT NULL,
+        segment_size INTEGER NOT NULL,
+        segment_count INTEGER NOT NULL,
+        merkle_root TEXT NOT NULL,
+        recorded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tamper_segments (
+        filename TEXT NOT NULL,
+        segment_index INTEGER NOT NULL,
+        sha256 TEXT NOT NULL,
+        PRIMARY KEY (filename, segment_index)
+    )
+    """,
+]
+
+
+class SegmentHasher:
+    """Whole-file SHA-256 plus one SHA-256 per segment, fed incrementally."""
+
+    def __init__(self, segment_size=None):
+        self.segment_size = segment_size or SEGMENT_SIZE
+        self.size = 0
+        self._full = hashlib.sha256()
+        self._segment = hashlib.sha256()
+        self._segment_fill = 0
+        self._digests = []
+
+    def update(self, data):
+        self._full.update(data)
+        view = memoryview(data)
+        while view:
+            take = min(len(view), self.segment_size - self._segment_fill)
+            self._segment.update(view[:take])
+            self._segment_fill += take
+            self.size += take
+            view = view[take:]
+            if self._segment_fill == self.segment_size:
+                self._digests.append(self._segment.hexdigest())
+                self._segment = hashlib.sha256()
+                self._segment_fill = 0
+
+    def hexdigest(self):
+        return self._full.hexdigest()
+
+    def segments(self):
+        if self._segment_fill:
+            return self._digests + [self._segment.hexdigest()]
+        return list(self._digests)
+
+
+def hash_file_segments(filepath, segment_size=None, buffer_size=None):
+    """Return (sha256_hex, file_size, segment_digests) in a single read."""
+    buffer_size = buffer_size or HASH_BUFFER_SIZE
+    hasher = SegmentHasher(segment_size)
+    with open(filepath, "rb", buffering=0) as f:
+        for chunk in iter(lambda: f.read(buffer_size), b""):
+            hasher.update(chunk)
+    return hasher.hexdigest(), hasher.size, hasher.segments()
+
+
+def merkle_root(segment_digests):
+    """
+    Merkle root over hex segment digests. Leaves and inner nodes are
+    domain-separated (0x00 / 0x01 prefix); an unpaired node is promoted.
+    """
+    level = [hashlib.sha256(b"\x00" + bytes.fromhex(d)).digest() for d in segment_digests]
+    if not level:
+        return hashlib.sha256(b"").hexdigest()
+    while len(level) > 1:
+        nxt = []
+        for i in range(0, len(level) - 1, 2):
+            nxt.append(hashlib.sha256(b"\x01" + level[i] + level[i + 1]).digest())
+        if len(level) % 2:
+            nxt.append(level[-1])
+        level = nxt
+    return level[0].hex()
+
+
+def store_segments(conn, filename, file_size, segment_digests, segment_size=None):
+    """Store (or replace) the segment baseline and Merkle root for a file."""
+    segment_size = segment_size or SEGMENT_SIZE
+    root = merkle_root(segment_digests)
+    conn.execute("DELETE FROM tamper_segments WHERE filename=?", (filename,))
+    conn.executemany(
+        "INSERT INTO tamper_segments (filename, segment_index, sha256) VALUES (?, ?, ?)",
+        [(filename, i, d) for i, d in enumerate(segment_digests)]
+    )
+    conn.execute("""
+        INSERT INTO tamper_merkle
+            (filename, file_size, segment_size, segment_count, merkle_root, recorded_at)
+        VALUES (?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+        ON CONFLICT(filename) DO UPDATE SET
+            file_size=excluded.file_size,
+            segment_size=excluded.segment_size,
+            segment_count=excluded.segment_count,
+            merkle_root=excluded.merkle_root,
+            recorded_at=CURRENT_TIMESTAMP
+    """, (filename, file_size, segment_size, len(segment_digests), root))
+    return root
+
+
+def load_segments(conn, filename):
+    """Return the stored segment baseline as a dict, or None."""
+    cur = conn.cursor()
+    cur.execute("""
+        SELECT file_size, segment_size, segment_count, merkle_root, recorded_at
+        FROM tamper_merkle WHERE filename=?
+    """, (filename,))
+    row = cur.fetchone()
+    if not row:
+        return None
+    cur.execute(
+        "SELECT sha256 FROM tamper_segments WHERE filename=? ORDER BY segment_index",
+        (filename,)
+    )
+    return {
+        "file_size": row[0],
+        "segment_size": row[1],
+        "segment_count": row[2],
+        "merkle_root": row[3],
+        "recorded_at": row[4],
+        "digests": [r[0] for r in cur.fetchall()],
+    }
+
+
+def _merge_ranges(indices, segment_size, file_size):
+    ranges = []
+    for i in indices:
+        start = i * segment_size
+        end = min((i + 1) * segment_size, max(file_size, start + 1)) - 1
+        if ranges and ranges[-1]["last_segment"] == i - 1:
+            ranges[-1]["last_segment"] = i
+            ranges[-1]["end"] = end
+        else:
+            ranges.append({"first_segment": i, "last_segment": i, "start": start, "end": end})
+    return ranges
+
+
+def diff_segments(conn, filename, filepath):
+    """
+    Re-hash filepath segment by segment (one full read) and compare it with
+    the stored baseline.
+
+    Returns None when no segment baseline exists, otherwise a dict with the
+    current Merkle root, whether it matches, and the diverging byte ranges.
+    """
+    baseline = load_segments(conn, filename)
+    if not baseline:
+        return None
+
+    _, size, current = hash_file_segments(filepath, baseline["segment_size"])
+    expected = baseline["digests"]
+    changed = [
+        i for i in range(max(len(current), len(expected)))
+        if i >= len(current) or i >= len(expected) or current[i] != expected[i]
+    ]
+    root = merkle_root(current)
+    return {
+        "merkle_root": root,
+        "baseline_root": baseline["merkle_root"],
+        "match": root == baseline["merkle_root"],
+        "segment_size": baseline["segment_size"],
+        "segment_count": len(expected),
+        "size_changed": size != baseline["file_size"],
+        "changed_ranges": _merge_ranges(changed, baseline["segment_size"], max(size, baseline["file_size"])),
+    }
+
+
+def spot_check(conn, filename, filepath, samples=8, indices=None):
+    """
+    Verify a few segments against the baseline, reading only those segments.
+
+    Picks `samples` random segments unless explicit `indices` are given
+    (useful for walking a large file incrementally). Returns None when no
+    segment baseline exists, otherwise a list of
+    {"segment", "start", "end", "ok"} dicts.
+    """
+    baseline = load_segments(conn, filename)
+    if not baseline:
+        return None
+
+    seg_size = baseline["segment_size"]
+    count = baseline["segment_count"]
+    if indices is None:
+        if samples <= 0:
+            return []
+        indices = sorted(random.sample(range(count), min(samples, count)))
+
+    results = []
+    with open(filepath, "rb", buffering=0) as f:
+        for i in indices:
+            f.seek(i * seg_size)
+            data = f.read(seg_size)
+            ok = i < count and hashlib.sha256(data).hexdigest() == baseline["digests"][i]
+            results.append({
+                "segment": i,
+                "start": i * seg_size,
+                "end": i * seg_size + max(len(data), 1) - 1,
+                "ok": ok,
+            })
+    return results
@@ -0,0 +1,246 @@
+"""
+Single-pass frame decode pipeline.
+
+A video is decoded once; each decoded frame (or the ROI an analyzer asks
+for) is handed to every registered analyzer that wants it, through a
+bounded queue per analyzer. Each analyzer runs on its own thread and
+declares its own sampling policy, so timestamp OCR, speed OCR and plate
+detection share one decode instead of opening the file three times.
+"""
+import os
+import queue
+import threading
+
+import cv2
+
+
+# Frames not wanted by any analyzer are skipped with grab() (no
+# retrieve/convert). Gaps longer than this many frames are skipped by
+# seeking instead, which lets the demuxer jump to the nearest keyframe.
+FRAME_SEEK_THRESHOLD = int(os.environ.get("FRAME_SEEK_THRESHOLD", 240))
+
+
+# ======================================================
+#                  SAMPLING POLICIES
+# ======================================================
+class EveryNFrames:
+    """Every n-th frame, starting at `offset` (0-based frame index)."""
+
+    def __init__(self, n, offset=0):
+        self.n = max(1, int(n))
+        self.offset = offset
+
+    def wants(self, index, fps):
+        return index >= self.offset and (index - self.offset) % self.n == 0
+
+    def next_frame(self, index, fps):
+        if index <= self.offset:
+            return self.offset
+        return self.offset + -(-(index - self.offset) // self.n) * self.n
+
+
+class EverySeconds:
+    """One frame every `seconds` of video time."""
+
+    def __init__(self, seconds):
+        self.seconds = float(seconds)
+
+    def _step(self, fps):
+        return max(1, int(round(self.seconds * (fps or 30))))
+
+    def wants(self, index, fps):
+        return index % self._step(fps) == 0
+
+    def next_frame(self, index, fps):
+        step = self._step(fps)
+        return -(-index // step) * step
+
+
+class AtFrames:
+    """An explicit set of frame indices."""
+
+    def __init__(self, indices):
+        self.indices = sorted(set(int(i) for i in indices))
+        self._set = set(self.indices)
+
+    def wants(self, index, fps):
+        return index in self._set
+
+    def next_frame(self, index, fps):
+        for i in self.indices:
+            if i >= index:
+                return i
+        return None
+
+
+# ======================================================
+#                      ANALYZERS
+# ======================================================
+class Analyzer:
+    """
+    Base class for pipeline consumers.
+
+    Subclasses set `name` and `policy`, may override roi() to receive only
+    part of each frame, and implement process() and finish().
+    """
+    name = "analyzer"
+    policy = EveryNFrames(1)
+    queue_size = 8
+
+    def start(self, video_info):
+        """Called once before the first frame with fps / frame count / size."""
+        self.video_info = video_info
+
+    def roi(self, frame):
+        """What to enqueue for a wanted frame (runs on the decode thread)."""
+        return frame
+
+    def process(self, index, data):
+        raise NotImplementedError
+
+    def wait_timeout(self):
+        """Longest to wait for the next frame before idle() is called (None = no limit)."""
+        return None
+
+    def idle(self):
+        """Called on the analyzer's thread when wait_timeout() passed without a frame."""
+
+    def finish(self):
+        """Called after the last frame; the return value is the analyzer result."""
+        return None
+
+
+_END = object()
+
+
+class _AnalyzerRunner(threading.Thread):
+    def __init__(self, analyzer):
+        super().__init__(name=f"analyzer-{analyzer.name}", daemon=True)
+        self.analyzer = analyzer
+        self.inbox = queue.Queue(maxsize=analyzer.queue_size)
+        self.result = None
+        self.error = None
+        # Set when the pipeline exits on an exception: queued frames are
+        # dropped and finish() (final batches, OCR) is skipped
+        self.aborted = threading.Event()
+
+    def run(self):
+        try:
+            while True:
+                try:
+                    item = self.inbox.get(timeout=self.analyzer.wait_timeout())
+                except queue.Empty:
+                    if not self.aborted.is_set():
+                        self.analyzer.idle()
+                    continue
+                if item is _END:
+                    break
+                if not self.aborted.is_set():
+                    self.analyzer.process(*item)
+            if not self.aborted.is_set():
+                self.result = self.analyzer.finish()
+        except BaseException as e:
+            self.error = e
+            # Keep draining so the decode thread never blocks on a dead consumer
+            while self.inbox.get() is not _END:
+                pass
+
+
+# ======================================================
+#                    FRAME PIPELINE
+# ======================================================
+class FramePipeline:
+    def __init__(self, video_path, seek_threshold=None):
+        self.video_path = video_path
+        self.seek_threshold = FRAME_SEEK_THRESHOLD if seek_threshold is None else seek_threshold
+        self.analyzers = []
+        self.stats = {"grabbed": 0, "retrieved": 0, "seeks": 0}
+
+    def register(self, analyzer):
+        self.analyzers.append(analyzer)
+        return analyzer
+
+    def run(self, progress=None):
+        """
+        Decode the video once and feed every analyzer.
+
+        `progress(frames_done, total_frames)` is called periodically from
+        the decode loop; an exception raised there (e.g. job cancellation)
+        stops the pipeline and is re-raised without running any
+        analyzer's finish().
+
+        Returns {analyzer.name: analyzer.finish() result}.
+        """
+        cap = cv2.VideoCapture(self.video_path)
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        info = {
+            "fps": fps,
+            "total_frames": total,
+            "width": int(cap.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            "height": int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+        }
+
+        runners = []
+        for analyzer in self.analyzers:
+            analyzer.start(info)
+            runners.append(_AnalyzerRunner(analyzer))
+        for r in runners:
+            r.start()
+
+        index = 0
+        last_report = -30
+        decoded = False
+        try:
+            while True:
+                # Next frame any live analyzer still wants (None = done)
+                targets = [
+                    r.analyzer.policy.next_frame(index, fps)
+                    for r in runners if r.error is None
+                ]
+                targets = [t for t in targets if t is not None]
+                if not targets or (total and min(targets) >= total):
+                    break
+                target = min(targets)
+
+                if target - index > self.seek_threshold:
+                    cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+                    self.stats["seeks"] += 1
+                    index = target
+
+                ended = False
+                while index < target:
+                    if not cap.grab():
+                        ended = True
+                        break
+                    self.stats["grabbed"] += 1
+                    index += 1
+                if ended or not cap.grab():
+                    break
+                ret, frame = cap.retrieve()
+                if not ret:
+                    break
+                self.stats["retrieved"] += 1
+
+                for r in runners:
+                    if r.error is None and r.analyzer.policy.wants(index, fps):
+                        r.inbox.put((index, r.analyzer.roi(frame)))
+                if progress and index - last_report >= 30:
+                    progress(index, total)
+                    last_report = index
+                index += 1
+            decoded = True
+        finally:
+            cap.release()
+            if not decoded:
+                for r in runners:
+                    r.aborted.set()
+            for r in runners:
+                r.inbox.put(_END)
+            for r in runners:
+                r.join()
+
+        for r in runners:
+            if r.error is not None:
+                raise r.error
+        return {r.analyzer.name: r.result for r in runners}
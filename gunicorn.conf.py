@@ -0,0 +1,59 @@
+# ======================================================
+#        GUNICORN CONFIG (picked up automatically)
+# ======================================================
+import os
+import subprocess
+
+# OCR runs in the job workers (jobs.py warms them up in init_job_worker);
+# web workers only load the engines when asked to.
+WEB_OCR_WARMUP = os.environ.get("WEB_OCR_WARMUP", "False") == "True"
+WEB_MODEL_PRELOAD = os.environ.get("WEB_MODEL_PRELOAD", "False") == "True"
+
+# Start the background job workers (jobs.py) alongside the web workers.
+# Set to False when they run as a separate service instead.
+JOB_EMBEDDED_POOL = os.environ.get("JOB_EMBEDDED_POOL", "True") == "True"
+
+_job_pool = None
+
+
+def when_ready(server):
+    global _job_pool
+    if not JOB_EMBEDDED_POOL:
+        return
+    import jobs
+    _job_pool = jobs.start_worker_pool()
+    server.log.info("Job worker pool started (pid %s)", _job_pool.pid)
+
+
+def on_exit(server):
+    if _job_pool is not None and _job_pool.poll() is None:
+        _job_pool.terminate()
+        try:
+            # Workers finish their current job before exiting
+            _job_pool.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.log.warning("Job worker pool still busy after 30 s; killing it")
+            _job_pool.kill()
+            _job_pool.wait()
+
+
+def worker_exit(server, worker):
+    """Close the worker's pooled DB connections and Tesseract engines."""
+    import sys
+    app_module = sys.modules.get("app")
+    if app_module is not None:
+        app_module.close_db_pool()
+    ocr_module = sys.modules.get("ocr_engines")
+    if ocr_module is not None:
+        ocr_module.close_engines()
+
+
+def post_fork(server, worker):
+    """Optionally load OCR engines / models in a web worker before it accepts requests."""
+    if WEB_OCR_WARMUP:
+        import ocr_engines
+        ocr_engines.warm_up()
+        server.log.info("OCR engines warmed up in worker %s", worker.pid)
+    if WEB_MODEL_PRELOAD:
+        import model_registry
+        model_registry.preload()
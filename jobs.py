@@ -0,0 +1,347 @@
+"""
+SQLite-backed background job queue.
+
+Long-running analysis (OCR, YOLO) is enqueued by the web routes and run by
+a separate pool of worker processes, so gunicorn workers return
+immediately. Tasks report progress, can be cancelled, and store a JSON
+result the web app renders once the job is done.
+
+Run the pool with:  python jobs.py --workers 2
+"""
+import os
+import sys
+import json
+import time
+import signal
+import socket
+import argparse
+import importlib
+import traceback
+import subprocess
+
+
+# ======================================================
+#                     CONFIG
+# ======================================================
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1.0))
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+
+# Module that defines the tasks and get_db(); imported by worker processes.
+JOB_APP_MODULE = os.environ.get("JOB_APP_MODULE", "app")
+
+# A job whose worker died this many times (OOM, native crash) is failed, not requeued
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 3))
+
+# Identifies this machine in jobs.worker_host (pids are only meaningful per host)
+WORKER_HOST = os.environ.get("JOB_WORKER_HOST", socket.gethostname())
+
+QUEUED, RUNNING, DONE, FAILED, CANCELLED = "queued", "running", "done", "failed", "cancelled"
+FINISHED = (DONE, FAILED, CANCELLED)
+
+JOBS_SCHEMA = """
+    CREATE TABLE IF NOT EXISTS jobs (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        task TEXT NOT NULL,
+        params TEXT NOT NULL,
+        owner TEXT,
+        status TEXT NOT NULL DEFAULT 'queued',
+        progress REAL DEFAULT 0.0,
+        message TEXT,
+        result TEXT,
+        error TEXT,
+        cancel_requested INTEGER DEFAULT 0,
+        worker_pid INTEGER,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        started_at TIMESTAMP,
+        finished_at TIMESTAMP
+    )
+"""
+
+# Added by migration 5
+JOBS_WORKER_HOST_COLUMN = "ALTER TABLE jobs ADD COLUMN worker_host TEXT"
+# Added by migration 7: times the job was claimed by a worker
+JOBS_ATTEMPTS_COLUMN = "ALTER TABLE jobs ADD COLUMN attempts INTEGER DEFAULT 0"
+
+
+# ======================================================
+#                  TASK REGISTRY
+# ======================================================
+TASKS = {}
+
+
+def task(name):
+    """Register fn(job, **params) as a background task."""
+    def register(fn):
+        TASKS[name] = fn
+        return fn
+    return register
+
+
+class JobCancelled(Exception):
+    pass
+
+
+def result_page(template, **context):
+    """Task result that the web app renders with render_template()."""
+    return {"template": template, "context": context}
+
+
+class JobContext:
+    """Handle passed to a running task for progress and cancellation."""
+
+    def __init__(self, get_db, job_id):
+        self.get_db = get_db
+        self.id = job_id
+        self._last_check = 0.0
+
+    def progress(self, percent, message=None):
+        """Record progress (0-100) and raise JobCancelled if cancellation was requested."""
+        conn = self.get_db()
+        conn.execute(
+            "UPDATE jobs SET progress=?, message=COALESCE(?, message) WHERE id=?",
+            (round(min(max(percent, 0), 100), 1), message, self.id)
+        )
+        conn.commit()
+        conn.close()
+        self.check_cancelled(force=True)
+
+    def check_cancelled(self, force=False):
+        now = time.monotonic()
+        if not force and now - self._last_check < 0.5:
+            return
+        self._last_check = now
+        conn = self.get_db()
+        row = conn.execute("SELECT cancel_requested FROM jobs WHERE id=?", (self.id,)).fetchone()
+        conn.close()
+        if row and row[0]:
+            raise JobCancelled()
+
+
+# ======================================================
+#               QUEUE OPERATIONS (WEB SIDE)
+# ======================================================
+def enqueue(conn, task_name, params, owner=None):
+    if task_name not in TASKS:
+        raise KeyError(f"Unknown task: {task_name}")
+    cur = conn.cursor()
+    cur.execute(
+        "INSERT INTO jobs (task, params, owner) VALUES (?, ?, ?)",
+        (task_name, json.dumps(params), owner)
+    )
+    conn.commit()
+    return cur.lastrowid
+
+
+def get_job(conn, job_id):
+    row = conn.execute("SELECT * FROM jobs WHERE id=?", (job_id,)).fetchone()
+    if not row:
+        return None
+    job = dict(row)
+    job["params"] = json.loads(job["params"]) if job["params"] else {}
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    return job
+
+
+def cancel(conn, job_id):
+    """Cancel a queued job now, or ask a running one to stop."""
+    conn.execute(
+        "UPDATE jobs SET status=?, finished_at=CURRENT_TIMESTAMP WHERE id=? AND status=?",
+        (CANCELLED, job_id, QUEUED)
+    )
+    conn.execute(
+        "UPDATE jobs SET cancel_requested=1 WHERE id=? AND status=?",
+        (job_id, RUNNING)
+    )
+    conn.commit()
+
+
+# ======================================================
+#                   WORKER SIDE
+# ======================================================
+def claim_next(conn):
+    """Atomically move the oldest queued job to running and return it."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        row = conn.execute(
+            "SELECT id FROM jobs WHERE status=? ORDER BY id LIMIT 1", (QUEUED,)
+        ).fetchone()
+        if not row:
+            conn.execute("COMMIT")
+            return None
+        conn.execute("""
+            UPDATE jobs SET status=?, worker_pid=?, worker_host=?, started_at=CURRENT_TIMESTAMP,
+                attempts=COALESCE(attempts, 0) + 1
+            WHERE id=?
+        """, (RUNNING, os.getpid(), WORKER_HOST, row[0]))
+        conn.execute("COMMIT")
+    except BaseException:
+        conn.execute("ROLLBACK")
+        raise
+    return get_job(conn, row[0])
+
+
+def _finish(get_db, job_id, status, result=None, error=None):
+    conn = get_db()
+    conn.execute("""
+        UPDATE jobs SET status=?, result=?, error=?, finished_at=CURRENT_TIMESTAMP,
+            progress=CASE WHEN ?='done' THEN 100 ELSE progress END
+        WHERE id=?
+    """, (status, json.dumps(result) if result is not None else None, error, status, job_id))
+    conn.commit()
+    conn.close()
+
+
+def run_job(get_db, job):
+    fn = TASKS.get(job["task"])
+    if fn is None:
+        _finish(get_db, job["id"], FAILED, error=f"Unknown task: {job['task']}")
+        return
+
+    ctx = JobContext(get_db, job["id"])
+    print(f"[JOB {job['id']}] ▶ {job['task']} {job['params']}")
+    try:
+        result = fn(ctx, **job["params"])
+    except JobCancelled:
+        _finish(get_db, job["id"], CANCELLED)
+        print(f"[JOB {job['id']}] ⏹ cancelled")
+    except Exception as e:
+        traceback.print_exc()
+        _finish(get_db, job["id"], FAILED, error=str(e))
+        print(f"[JOB {job['id']}] ❌ {e}")
+    else:
+        try:
+            _finish(get_db, job["id"], DONE, result=result)
+        except Exception as e:
+            # Unserialisable result or DB error: never leave the job 'running'
+            traceback.print_exc()
+            print(f"[JOB {job['id']}] ❌ result not stored: {e}")
+            try:
+                _finish(get_db, job["id"], FAILED, error=f"Could not store result: {e}")
+            except Exception:
+                traceback.print_exc()  # keep the worker alive for the next job
+        else:
+            print(f"[JOB {job['id']}] ✅ done")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # exists, owned by someone else
+    return True
+
+
+def requeue_orphans(conn, max_attempts=None):
+    """
+    Put jobs left 'running' by a dead worker back in the queue. Only jobs
+    claimed on this host are checked (a pid means nothing elsewhere); jobs
+    whose worker process is still alive - another pool on this host - are
+    left alone. A job that has already been claimed max_attempts times
+    (default JOB_MAX_ATTEMPTS) probably kills its worker, so it is failed
+    instead. Returns the number of jobs requeued.
+    """
+    max_attempts = JOB_MAX_ATTEMPTS if max_attempts is None else max_attempts
+    rows = conn.execute(
+        "SELECT id, worker_pid, attempts FROM jobs WHERE status=? AND (worker_host=? OR worker_host IS NULL)",
+        (RUNNING, WORKER_HOST)
+    ).fetchall()
+    orphans = [(row[0], row[2] or 0) for row in rows if not row[1] or not _pid_alive(row[1])]
+    requeued, failed = [], []
+    for job_id, attempts in orphans:
+        if attempts >= max_attempts:
+            conn.execute("""
+                UPDATE jobs SET status=?, error=?, finished_at=CURRENT_TIMESTAMP
+                WHERE id=? AND status=?
+            """, (FAILED, f"The worker process died {attempts} times running this job "
+                          f"(out of memory or a crash); not retried", job_id, RUNNING))
+            failed.append(job_id)
+        else:
+            conn.execute(
+                "UPDATE jobs SET status=?, worker_pid=NULL, worker_host=NULL WHERE id=? AND status=?",
+                (QUEUED, job_id, RUNNING)
+            )
+            requeued.append(job_id)
+    conn.commit()
+    if requeued:
+        print(f"♻️ Requeued {len(requeued)} orphaned job(s): {requeued}")
+    if failed:
+        print(f"❌ Failed {len(failed)} job(s) after {max_attempts} attempts: {failed}")
+    return len(requeued)
+
+
+def work_forever(poll_interval=None):
+    """Worker process main loop: claim, run, repeat."""
+    poll_interval = poll_interval or JOB_POLL_INTERVAL
+    app_module = importlib.import_module(JOB_APP_MODULE)
+    get_db = app_module.get_db
+
+    # Optional per-process warm-up (models, OCR engines)
+    init = getattr(app_module, "init_job_worker", None)
+    if init:
+        init()
+
+    stopping = []
+    signal.signal(signal.SIGTERM, lambda *_: stopping.append(True))
+
+    while not stopping:
+        conn = get_db()
+        try:
+            job = claim_next(conn)
+        finally:
+            conn.close()
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        run_job(get_db, job)
+
+
+def start_worker_pool(workers=None):
+    """Launch the worker pool as a child process (used by gunicorn.conf.py)."""
+    return subprocess.Popen(
+        [sys.executable, os.path.abspath(__file__), "--workers", str(workers or JOB_WORKERS)],
+        cwd=os.path.dirname(os.path.abspath(__file__))
+    )
+
+
+def main():
+    global JOB_WORKERS
+    import multiprocessing
+
+    parser = argparse.ArgumentParser(description="Run background analysis workers.")
+    parser.add_argument("--workers", type=int, default=JOB_WORKERS)
+    args = parser.parse_args()
+
+    # Workers size their OCR pools from the real count (spawned ones re-read the env)
+    JOB_WORKERS = max(1, args.workers)
+    os.environ["JOB_WORKERS"] = str(JOB_WORKERS)
+
+    app_module = importlib.import_module(JOB_APP_MODULE)
+    conn = app_module.get_db()
+    requeue_orphans(conn)
+    conn.close()
+
+    procs = [
+        multiprocessing.Process(target=work_forever, name=f"job-worker-{i}")
+        for i in range(JOB_WORKERS)
+    ]
+    for p in procs:
+        p.start()
+    print(f"✅ {len(procs)} job worker(s) started")
+
+    def shutdown(*_):
+        for p in procs:
+            p.terminate()
+
+    signal.signal(signal.SIGTERM, shutdown)
+    signal.signal(signal.SIGINT, shutdown)
+    for p in procs:
+        p.join()
+
+
+if __name__ == "__main__":
+    # Run through the importable module so tasks registered by the app
+    # (via `import jobs`) land in the same TASKS registry.
+    import jobs
+    jobs.main()
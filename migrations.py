@@ -0,0 +1,180 @@
+"""
+Versioned schema migrations for dashcam.db.
+
+Each migration runs once, in order, inside a write transaction, and is
+recorded in `schema_version`. migrate() runs at every startup, so schema
+changes reach existing deployments; concurrent starters (web workers, job
+workers) serialize on the write lock and skip what is already applied.
+
+To change the schema, append a new (version, description, steps) entry -
+never edit one that has shipped. A step is an SQL string or a callable
+taking the connection.
+"""
+import os
+
+import container_structure
+import evidence_hashing
+import jobs
+import observations
+import overlay_calibration
+import timestamp_timeline
+
+
+# ======================================================
+#            PER-CONNECTION PRAGMAS
+# ======================================================
+SQLITE_SYNCHRONOUS = os.environ.get("SQLITE_SYNCHRONOUS", "NORMAL")  # safe with WAL
+SQLITE_CACHE_SIZE_KB = int(os.environ.get("SQLITE_CACHE_SIZE_KB", 16384))
+SQLITE_MMAP_SIZE = int(os.environ.get("SQLITE_MMAP_SIZE", 256 * 1024 * 1024))
+SQLITE_TEMP_STORE = os.environ.get("SQLITE_TEMP_STORE", "MEMORY")
+
+
+def apply_pragmas(conn):
+    """Settings that live on the connection; call once per new connection."""
+    conn.execute(f"PRAGMA synchronous={SQLITE_SYNCHRONOUS}")
+    conn.execute(f"PRAGMA cache_size=-{SQLITE_CACHE_SIZE_KB}")  # negative = KiB
+    conn.execute(f"PRAGMA mmap_size={SQLITE_MMAP_SIZE}")
+    conn.execute(f"PRAGMA temp_store={SQLITE_TEMP_STORE}")
+
+
+# ======================================================
+#                     MIGRATIONS
+# ======================================================
+BASE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS users (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        email TEXT UNIQUE,
+        username TEXT UNIQUE NOT NULL,
+        password TEXT NOT NULL,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS uploads (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL UNIQUE,
+        original_name TEXT,
+        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tamper_records (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL UNIQUE,
+        sha256 TEXT NOT NULL,
+        uploaded_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS license_results (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL UNIQUE,
+        plate_text TEXT,
+        confidence REAL,
+        detected_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS timestamps (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL UNIQUE,
+        timestamp_text TEXT NOT NULL,
+        confidence REAL DEFAULT 0.0,
+        consistency_score REAL DEFAULT 0.0,
+        has_drift INTEGER DEFAULT 0,
+        frame_count INTEGER DEFAULT 0,
+        raw_ocr_results TEXT,
+        extracted_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tampers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL UNIQUE,
+        tamper_status TEXT,
+        checked_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+# Version 1 is everything init_db_schema() used to create; IF NOT EXISTS
+# lets it adopt databases that already have some or all of these tables.
+MIGRATIONS = [
+    (1, "baseline schema", BASE_SCHEMA + [
+        evidence_hashing.VERIFICATION_SCHEMA,
+        jobs.JOBS_SCHEMA,
+        *evidence_hashing.SEGMENT_SCHEMA,
+        *timestamp_timeline.TIMELINE_SCHEMA,
+        *observations.OBSERVATION_SCHEMA,
+    ]),
+    (2, "indexes for hot queries", [
+        # Latest-upload lookups: ORDER BY uploaded_at DESC
+        "CREATE INDEX IF NOT EXISTS idx_uploads_uploaded_at ON uploads(uploaded_at)",
+        # Plate searches across videos
+        "CREATE INDEX IF NOT EXISTS idx_license_results_plate ON license_results(plate_text)",
+        "CREATE INDEX IF NOT EXISTS idx_timestamp_anomalies_file ON timestamp_anomalies(filename, start_frame)",
+        # Worker claim (status, id) and per-user job lists
+        "CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs(status, id)",
+        "CREATE INDEX IF NOT EXISTS idx_jobs_owner ON jobs(owner, created_at)",
+    ]),
+    (3, "camera overlay profiles", overlay_calibration.CAMERA_PROFILE_SCHEMA),
+    (4, "container structure analysis", container_structure.CONTAINER_SCHEMA),
+    (5, "job worker host", [jobs.JOBS_WORKER_HOST_COLUMN]),
+    (6, "camera profile misses", overlay_calibration.CAMERA_PROFILE_MISSES_COLUMNS),
+    (7, "job attempts", [jobs.JOBS_ATTEMPTS_COLUMN]),
+    (8, "camera profile calibration backoff", [overlay_calibration.CAMERA_PROFILE_BACKOFF_COLUMN]),
+]
+
+
+def current_version(conn):
+    row = conn.execute("SELECT MAX(version) FROM schema_version").fetchone()
+    return row[0] or 0
+
+
+def migrate(conn, migrations=None):
+    """Apply all pending migrations; returns the resulting schema version."""
+    migrations = MIGRATIONS if migrations is None else migrations
+
+    # Persistent per-database setting; only needs to succeed once
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT,
+            applied_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
+    conn.commit()
+
+    if current_version(conn) >= max(v for v, _, _ in migrations):
+        return current_version(conn)
+
+    old_isolation = conn.isolation_level
+    conn.isolation_level = None  # manage the transaction explicitly
+    try:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Re-read under the write lock: another process may have migrated
+            version = current_version(conn)
+            for number, description, steps in migrations:
+                if number <= version:
+                    continue
+                for step in steps:
+                    if callable(step):
+                        step(conn)
+                    else:
+                        conn.execute(step)
+                conn.execute(
+                    "INSERT INTO schema_version (version, description) VALUES (?, ?)",
+                    (number, description)
+                )
+                print(f"🗄️ Applied migration {number}: {description}")
+                version = number
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+    finally:
+        conn.isolation_level = old_isolation
+    return version
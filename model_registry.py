@@ -0,0 +1,115 @@
+"""
+Process-wide registry of YOLO models.
+
+Each named model is loaded lazily, once per process, and shared by every
+request and background task in that process. Results can record which
+weights (and which file version) produced them.
+"""
+import os
+import hashlib
+import threading
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+# name -> candidate weights, tried in order. A bare "yolov8n.pt" that is
+# not on disk is auto-downloaded by ultralytics, so it works as a fallback.
+MODEL_WEIGHTS = {
+    "plate": ["best.pt", "yolov8n.pt"],
+    "general": ["yolov8n.pt"],
+}
+
+# Comma-separated model names to load at worker start.
+MODEL_PRELOAD = [m for m in os.environ.get("MODEL_PRELOAD", "plate").split(",") if m]
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+class LoadedModel:
+    def __init__(self, name, model, weights, weights_sha256):
+        self.name = name
+        self.model = model
+        self.weights = weights
+        self.weights_sha256 = weights_sha256
+
+    @property
+    def version(self):
+        """Short identifier of the weights, e.g. 'best.pt@3f2a9c1d0b7e'."""
+        short = self.weights_sha256[:12] if self.weights_sha256 else "auto"
+        return f"{os.path.basename(self.weights)}@{short}"
+
+    def describe(self):
+        try:
+            import ultralytics
+            framework = f"ultralytics {ultralytics.__version__}"
+        except Exception:
+            framework = "ultralytics"
+        return {
+            "name": self.name,
+            "weights": os.path.basename(self.weights),
+            "weights_sha256": self.weights_sha256,
+            "version": self.version,
+            "framework": framework,
+        }
+
+
+def _weights_digest(path):
+    if not os.path.isfile(path):
+        return None
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def _load(name):
+    from ultralytics import YOLO
+
+    candidates = MODEL_WEIGHTS.get(name)
+    if not candidates:
+        raise KeyError(f"Unknown model: {name}")
+
+    last_error = None
+    for i, weights in enumerate(candidates):
+        path = weights if os.path.isabs(weights) else os.path.join(BASE_DIR, weights)
+        is_last = i == len(candidates) - 1
+        if not os.path.exists(path) and not is_last:
+            print(f"⚠️ '{weights}' not found for model '{name}', trying next weights...")
+            continue
+        try:
+            model = YOLO(path if os.path.exists(path) else weights)
+        except FileNotFoundError as e:
+            last_error = e
+            continue
+        loaded = LoadedModel(name, model, path, _weights_digest(path))
+        print(f"✅ Model '{name}' loaded from {loaded.version} (pid {os.getpid()})")
+        return loaded
+
+    raise last_error or FileNotFoundError(f"No weights found for model '{name}'")
+
+
+def get_model(name):
+    """Return the LoadedModel for `name`, loading it on first use."""
+    loaded = _loaded.get(name)
+    if loaded is not None:
+        return loaded
+    with _lock:
+        if name not in _loaded:
+            _loaded[name] = _load(name)
+        return _loaded[name]
+
+
+def is_available():
+    """True when ultralytics is importable (without importing it)."""
+    import importlib.util
+    return importlib.util.find_spec("ultralytics") is not None
+
+
+def preload(names=None):
+    """Load the given (default: MODEL_PRELOAD) models now."""
+    for name in (MODEL_PRELOAD if names is None else names):
+        try:
+            get_model(name)
+        except Exception as e:
+            print(f"⚠️ Could not preload model '{name}': {e}")
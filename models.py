@@ -1,3 +1,7 @@
-from flask_mysqldb import MySQL
+# ===============================================
+# NOTE: Database access lives in repository.py
+# (SQLite / MySQL backends, selected by DB_BACKEND
+# in config.py); app.py creates the instance.
+# ===============================================
 
-mysql = MySQL()
+from repository import Repository, SQLiteBackend, MySQLBackend, create_repository
@@ -0,0 +1,132 @@
+"""
+Per-frame observation tables.
+
+Every OCR'd timestamp, speed reading and plate detection is one row,
+indexed on (filename, frame) and on the recognised text, so timelines and
+reports are plain indexed SQL and readings can be queried across frames
+and videos (e.g. every frame, in every video, where a plate appears).
+"""
+
+OBSERVATION_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS timestamp_observations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        frame INTEGER NOT NULL,
+        source TEXT NOT NULL,
+        text TEXT,
+        raw TEXT,
+        confidence REAL,
+        epoch REAL,
+        crop_image TEXT,
+        full_image TEXT,
+        observed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_ts_obs_file_frame ON timestamp_observations(filename, frame)",
+    "CREATE INDEX IF NOT EXISTS idx_ts_obs_text ON timestamp_observations(text)",
+    """
+    CREATE TABLE IF NOT EXISTS speed_observations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        frame INTEGER NOT NULL,
+        speed INTEGER,
+        raw TEXT,
+        observed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_speed_obs_file_frame ON speed_observations(filename, frame)",
+    "CREATE INDEX IF NOT EXISTS idx_speed_obs_speed ON speed_observations(speed)",
+    """
+    CREATE TABLE IF NOT EXISTS plate_observations (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        frame INTEGER NOT NULL,
+        track_id INTEGER,
+        plate_text TEXT,
+        confidence REAL,
+        x1 INTEGER, y1 INTEGER, x2 INTEGER, y2 INTEGER,
+        observed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_plate_obs_file_frame ON plate_observations(filename, frame)",
+    "CREATE INDEX IF NOT EXISTS idx_plate_obs_text ON plate_observations(plate_text)",
+]
+
+OBSERVATION_TABLES = ["timestamp_observations", "speed_observations", "plate_observations"]
+
+
+# ======================================================
+#                  BULK WRITES (REPLACE)
+# ======================================================
+def replace_timestamps(conn, filename, source, rows):
+    """
+    Replace one source's ('preview' / 'timeline') timestamp rows for a video.
+    rows: dicts with frame, text and optionally raw, confidence, epoch,
+    crop_path, full_path (the analyzer result shape).
+    """
+    cur = conn.cursor()
+    cur.execute("DELETE FROM timestamp_observations WHERE filename=? AND source=?", (filename, source))
+    cur.executemany("""
+        INSERT INTO timestamp_observations
+        (filename, frame, source, text, raw, confidence, epoch, crop_image, full_image)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(filename, r["frame"], source, r.get("text"), r.get("raw"), r.get("confidence"),
+           r.get("epoch"), r.get("crop_path"), r.get("full_path")) for r in rows])
+
+
+def replace_speeds(conn, filename, rows):
+    """rows: dicts with frame, speed (int or None) and raw."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM speed_observations WHERE filename=?", (filename,))
+    cur.executemany("""
+        INSERT INTO speed_observations (filename, frame, speed, raw) VALUES (?, ?, ?, ?)
+    """, [(filename, r["frame"], r.get("speed"), r.get("raw")) for r in rows])
+
+
+def replace_plates(conn, filename, rows):
+    """rows: dicts with frame, track_id, plate_text, confidence and box (x1, y1, x2, y2)."""
+    cur = conn.cursor()
+    cur.execute("DELETE FROM plate_observations WHERE filename=?", (filename,))
+    cur.executemany("""
+        INSERT INTO plate_observations (filename, frame, track_id, plate_text, confidence, x1, y1, x2, y2)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(filename, r["frame"], r.get("track_id"), r.get("plate_text"), r.get("confidence"),
+           *r["box"]) for r in rows])
+
+
+def delete_all(conn, filename):
+    cur = conn.cursor()
+    for table in OBSERVATION_TABLES:
+        cur.execute(f"DELETE FROM {table} WHERE filename=?", (filename,))
+
+
+# ======================================================
+#                        QUERIES
+# ======================================================
+def timestamp_rows(conn, filename, source="preview"):
+    return conn.execute("""
+        SELECT frame, text, raw, confidence, epoch, crop_image, full_image, observed_at
+        FROM timestamp_observations
+        WHERE filename=? AND source=?
+        ORDER BY frame
+    """, (filename, source)).fetchall()
+
+
+def speed_rows(conn, filename):
+    return conn.execute("""
+        SELECT frame, speed, raw FROM speed_observations
+        WHERE filename=? ORDER BY frame
+    """, (filename,)).fetchall()
+
+
+def plate_sightings(conn, plate_text):
+    """Every video and frame range where a plate was read."""
+    return conn.execute("""
+        SELECT filename, track_id, MIN(frame) AS first_frame, MAX(frame) AS last_frame,
+               COUNT(*) AS detections, MAX(confidence) AS confidence
+        FROM plate_observations
+        WHERE plate_text=?
+        GROUP BY filename, track_id
+        ORDER BY filename, first_frame
+    """, (plate_text,)).fetchall()
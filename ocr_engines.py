@@ -0,0 +1,273 @@
+"""
+Shared OCR engines for timestamp, speed and license plate recognition.
+
+Each worker process loads the easyocr detector/recognizer weights once and
+configures Tesseract once; every route and background task reuses them.
+
+Tesseract runs in-process through its C API (tesserocr) when that is
+installed: initialised engines are pooled per config, so a crop costs one
+SetImage/GetUTF8Text instead of a tesseract fork/exec, a traineddata load
+and a temp image. Without tesserocr, pytesseract's CLI path is used.
+"""
+import os
+import re
+import shlex
+import threading
+from contextlib import contextmanager
+
+import pytesseract
+
+try:
+    import tesserocr
+except ImportError:
+    tesserocr = None
+
+
+# ======================================================
+#                ENGINE STATE (PER PROCESS)
+# ======================================================
+_init_lock = threading.Lock()
+_infer_lock = threading.Lock()
+
+_easyocr_reader = None
+_easyocr_unavailable = False
+_tesseract_configured = False
+_tesseract_version = None
+
+EASYOCR_LANGS = ["en"]
+EASYOCR_GPU = os.environ.get("EASYOCR_GPU", "False") == "True"
+
+# "auto": C API when tesserocr is importable, else CLI; "api" / "cli" force one
+TESSERACT_BACKEND = os.environ.get("TESSERACT_BACKEND", "auto")
+TESSERACT_LANG = os.environ.get("TESSERACT_LANG", "eng")
+
+# Named configs; the analyzers use these strings (also part of cached-result keys)
+TESSERACT_PRESETS = {
+    "timestamp": "--oem 3 --psm 6",
+    "speed": "--oem 3 --psm 7 -c tessedit_char_whitelist=0123456789",
+    "plate": "--psm 8 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789-",
+}
+
+_api_pool = {}  # parsed config -> [idle PyTessBaseAPI]
+_api_unavailable = tesserocr is None or TESSERACT_BACKEND == "cli"
+_tesseract_health = None
+
+
+def configure_tesseract():
+    """Point pytesseract at the platform Tesseract binary (once)."""
+    global _tesseract_configured
+    if _tesseract_configured:
+        return
+    with _init_lock:
+        if _tesseract_configured:
+            return
+        if os.name == "nt":  # Windows
+            pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
+        else:  # Linux/Mac
+            pytesseract.pytesseract.tesseract_cmd = "/usr/bin/tesseract"
+        _tesseract_configured = True
+
+
+def get_easyocr_reader():
+    """
+    Return the process-wide easyocr.Reader, building it on first use.
+    Returns None when easyocr is not installed.
+    """
+    global _easyocr_reader, _easyocr_unavailable
+    if _easyocr_reader is not None or _easyocr_unavailable:
+        return _easyocr_reader
+
+    with _init_lock:
+        if _easyocr_reader is None and not _easyocr_unavailable:
+            try:
+                import easyocr
+            except ImportError:
+                print("easyocr not available - falling back to Tesseract")
+                _easyocr_unavailable = True
+                return None
+            _easyocr_reader = easyocr.Reader(EASYOCR_LANGS, gpu=EASYOCR_GPU)
+            print(f"✅ easyocr reader loaded (pid {os.getpid()})")
+    return _easyocr_reader
+
+
+# ======================================================
+#             IN-PROCESS TESSERACT (C API POOL)
+# ======================================================
+def _parse_config(config):
+    """'--oem 3 --psm 7 -c k=v' -> (oem, psm, ((k, v), ...)), hashable for the pool."""
+    oem, psm, variables = 3, 3, []
+    args = shlex.split(config or "")
+    i = 0
+    while i < len(args):
+        arg = args[i]
+        if arg in ("--oem", "--psm") and i + 1 < len(args):
+            if arg == "--oem":
+                oem = int(args[i + 1])
+            else:
+                psm = int(args[i + 1])
+            i += 2
+        elif arg == "-c" and i + 1 < len(args) and "=" in args[i + 1]:
+            variables.append(tuple(args[i + 1].split("=", 1)))
+            i += 2
+        else:
+            i += 1
+    return oem, psm, tuple(variables)
+
+
+def _new_api(key):
+    oem, psm, variables = key
+    api = tesserocr.PyTessBaseAPI(lang=TESSERACT_LANG, oem=oem, psm=psm)
+    for name, value in variables:
+        api.SetVariable(name, value)
+    return api
+
+
+@contextmanager
+def _pooled_api(config):
+    """An initialised engine for `config`, used by one thread at a time."""
+    key = _parse_config(config)
+    with _init_lock:
+        idle = _api_pool.setdefault(key, [])
+        api = idle.pop() if idle else None
+    if api is None:
+        api = _new_api(key)
+    try:
+        yield api
+    finally:
+        api.Clear()
+        with _init_lock:
+            _api_pool[key].append(api)
+
+
+def _api_text(image, config):
+    with _pooled_api(config) as api:
+        if hasattr(image, "shape"):
+            h, w = image.shape[:2]
+            channels = 1 if image.ndim == 2 else image.shape[2]
+            data = image.tobytes() if image.flags["C_CONTIGUOUS"] else image.copy().tobytes()
+            api.SetImageBytes(data, w, h, channels, w * channels)
+        else:
+            api.SetImage(image)  # PIL image
+        return api.GetUTF8Text()
+
+
+def _use_api():
+    return not _api_unavailable
+
+
+def close_engines():
+    """Release pooled C API engines (worker shutdown)."""
+    with _init_lock:
+        pools = list(_api_pool.values())
+        _api_pool.clear()
+    for idle in pools:
+        for api in idle:
+            api.End()
+
+
+# ======================================================
+#                  RECOGNITION ENTRY POINTS
+# ======================================================
+def tesseract_text(image, config=TESSERACT_PRESETS["timestamp"]):
+    global _api_unavailable
+    if _use_api():
+        try:
+            return _api_text(image, config)
+        except RuntimeError as e:
+            # Engine could not initialise (e.g. traineddata not found)
+            if TESSERACT_BACKEND == "api":
+                raise
+            print(f"⚠️ Tesseract C API unavailable ({e}) - using the tesseract CLI")
+            _api_unavailable = True
+    configure_tesseract()
+    return pytesseract.image_to_string(image, config=config)
+
+
+def tesseract_available():
+    """
+    Whether Tesseract can run at all; checked once per process (a tiny
+    OCR) and cached, instead of a throwaway OCR on every job.
+    """
+    global _tesseract_health
+    if _tesseract_health is None:
+        from PIL import Image, ImageDraw
+        test_img = Image.new("L", (100, 30), color=255)
+        ImageDraw.Draw(test_img).text((10, 10), "TEST", fill=0)
+        try:
+            tesseract_text(test_img, "--psm 6")
+            print(f"✅ Tesseract OCR is available ({'C API' if _use_api() else 'CLI'})")
+            _tesseract_health = True
+        except pytesseract.pytesseract.TesseractNotFoundError:
+            _tesseract_health = False
+        except Exception as e:
+            print(f"⚠️ Tesseract warning: {e}")
+            # Might still work for some operations
+            _tesseract_health = True
+    return _tesseract_health
+
+
+def readtext_batch(images, tesseract_config=TESSERACT_PRESETS["timestamp"]):
+    """
+    Recognise a list of preprocessed crops in one call.
+
+    Returns one string per image: the first easyocr detection, or the
+    Tesseract output when easyocr is not installed.
+    """
+    images = list(images)
+    if not images:
+        return []
+
+    reader = get_easyocr_reader()
+    if reader is None:
+        return [tesseract_text(img, tesseract_config).strip() for img in images]
+
+    with _infer_lock:
+        same_shape = len({img.shape for img in images}) == 1
+        if len(images) > 1 and same_shape and hasattr(reader, "readtext_batched"):
+            h, w = images[0].shape[:2]
+            results = reader.readtext_batched(images, n_width=w, n_height=h)
+        else:
+            results = [reader.readtext(img) for img in images]
+
+    return [r[0][1] if r else "" for r in results]
+
+
+def tesseract_version():
+    """Installed Tesseract version string (part of cached-result keys)."""
+    global _tesseract_version
+    if _tesseract_version is None:
+        if _use_api():
+            # "tesseract 5.3.0\n leptonica-..." -> same form as the CLI version
+            match = re.match(r"tesseract\s+(\S+)", tesserocr.tesseract_version())
+            _tesseract_version = f"tesseract-{match.group(1) if match else 'unknown'}"
+            return _tesseract_version
+        configure_tesseract()
+        try:
+            _tesseract_version = f"tesseract-{pytesseract.get_tesseract_version()}"
+        except Exception:
+            _tesseract_version = "tesseract-unknown"
+    return _tesseract_version
+
+
+def engine_version():
+    """Version of the engine readtext_batch() will use."""
+    reader = get_easyocr_reader()
+    if reader is None:
+        return tesseract_version()
+    import easyocr
+    return f"easyocr-{easyocr.__version__}"
+
+
+def readtext(image, tesseract_config=TESSERACT_PRESETS["timestamp"]):
+    """Recognise a single crop (see readtext_batch)."""
+    return readtext_batch([image], tesseract_config)[0]
+
+
+def warm_up():
+    """Load every OCR engine now instead of on the first request."""
+    configure_tesseract()
+    tesseract_available()
+    try:
+        get_easyocr_reader()
+    except Exception as e:
+        print(f"⚠️ easyocr warm-up failed: {e}")
@@ -0,0 +1,186 @@
+"""
+Process-pool OCR stage.
+
+OCR of overlay and plate crops is CPU-bound; one Python process only ever
+keeps one core busy with it. With OCR_WORKERS > 0 a batch of crops is
+split into chunks that run in a pool of worker processes, each holding
+its own initialised engines (ocr_engines: pooled Tesseract API / easyocr).
+
+Crops travel as 2-D uint8 (grayscale / binarized) arrays packed into one
+shared-memory block per batch; only offsets and shapes are pickled.
+Results come back in input order. Batches smaller than OCR_POOL_MIN_BATCH,
+or OCR_WORKERS=0, run in the calling process.
+
+OCR_WORKERS unset: web processes keep OCR in-process (every pool worker
+costs its own engine memory), while job workers get their share of the
+cores, capped at OCR_WORKERS_MAX (use_job_worker_default).
+"""
+import os
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import get_context, shared_memory
+
+import numpy as np
+
+import ocr_engines
+
+
+_OCR_WORKERS_ENV = os.environ.get("OCR_WORKERS", "")
+OCR_WORKERS = int(_OCR_WORKERS_ENV or 0)
+OCR_WORKERS_MAX = int(os.environ.get("OCR_WORKERS_MAX", 4))
+OCR_POOL_MIN_BATCH = int(os.environ.get("OCR_POOL_MIN_BATCH", 4))
+# Chunks per worker: >1 keeps workers busy when crops differ in cost
+OCR_POOL_CHUNKS_PER_WORKER = int(os.environ.get("OCR_POOL_CHUNKS_PER_WORKER", 4))
+# spawn: the job worker has pipeline threads running, which fork() would copy mid-state
+OCR_POOL_START_METHOD = os.environ.get("OCR_POOL_START_METHOD", "spawn")
+
+
+# ======================================================
+#                 WORKER-SIDE FUNCTIONS
+# ======================================================
+def _recognise(task, images, config):
+    if task == "text":
+        return ocr_engines.readtext_batch(images, tesseract_config=config)
+    if task == "plate":
+        from analyzers import read_plate_gray
+        return [read_plate_gray(img) for img in images]
+    raise ValueError(f"Unknown OCR task {task!r}")
+
+
+def _init_worker():
+    ocr_engines.configure_tesseract()
+
+
+def _run_chunk(task, shm_name, layout, config):
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        images = [np.ndarray(shape, np.uint8, buffer=shm.buf, offset=offset).copy()
+                  for offset, shape in layout]
+    finally:
+        shm.close()
+    return _recognise(task, images, config)
+
+
+# ======================================================
+#                      PARENT SIDE
+# ======================================================
+def _pack(images):
+    """Copy arrays into one shared-memory block; returns (shm, [(offset, shape)])."""
+    total = sum(img.size for img in images)
+    shm = shared_memory.SharedMemory(create=True, size=max(1, total))
+    flat = np.ndarray((total,), np.uint8, buffer=shm.buf)
+    layout = []
+    offset = 0
+    for img in images:
+        flat[offset:offset + img.size] = img.ravel()
+        layout.append((offset, img.shape))
+        offset += img.size
+    del flat
+    return shm, layout
+
+
+class OcrPool:
+    def __init__(self, workers):
+        self.workers = workers
+        self.batches = 0
+        self.crops = 0
+        self._executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=get_context(OCR_POOL_START_METHOD),
+            initializer=_init_worker
+        )
+
+    def map(self, task, images, config=None):
+        """OCR every image (2-D uint8) in the pool; one result per image, in order."""
+        images = [np.ascontiguousarray(img, dtype=np.uint8) for img in images]
+        if any(img.ndim != 2 for img in images):
+            raise ValueError("OCR pool takes 2-D grayscale crops")
+
+        shm, layout = _pack(images)
+        try:
+            n_chunks = min(len(images), self.workers * OCR_POOL_CHUNKS_PER_WORKER)
+            bounds = [round(i * len(images) / n_chunks) for i in range(n_chunks + 1)]
+            futures = [
+                self._executor.submit(_run_chunk, task, shm.name, layout[a:b], config)
+                for a, b in zip(bounds, bounds[1:]) if b > a
+            ]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+        finally:
+            shm.close()
+            shm.unlink()
+        self.batches += 1
+        self.crops += len(images)
+        return results
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+_lock = threading.Lock()
+_pool = None
+_pool_pid = None
+
+
+def use_job_worker_default(job_workers):
+    """
+    Size the pool for one of `job_workers` job processes unless OCR_WORKERS
+    is set: min(cores per job worker, OCR_WORKERS_MAX). Returns the size.
+    """
+    global OCR_WORKERS
+    if _OCR_WORKERS_ENV:
+        return OCR_WORKERS
+    share = min((os.cpu_count() or 1) // max(1, job_workers), OCR_WORKERS_MAX)
+    # A single pool process only adds IPC to what the job worker does itself
+    OCR_WORKERS = share if share >= 2 else 0
+    return OCR_WORKERS
+
+
+def get_pool():
+    """The process's OcrPool (None when OCR_WORKERS is 0)."""
+    global _pool, _pool_pid
+    if OCR_WORKERS <= 0:
+        return None
+    with _lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = OcrPool(OCR_WORKERS)
+            _pool_pid = os.getpid()
+            print(f"🧵 OCR pool started: {OCR_WORKERS} worker processes (pid {os.getpid()})")
+        return _pool
+
+
+def shutdown():
+    global _pool
+    with _lock:
+        pool, _pool = _pool, None
+    if pool is not None and _pool_pid == os.getpid():
+        pool.shutdown()
+
+
+atexit.register(shutdown)
+
+
+def _run(task, images, config):
+    images = list(images)
+    if not images:
+        return []
+    # A GPU easyocr reader is already parallel and would be loaded once per worker
+    in_process = len(images) < OCR_POOL_MIN_BATCH or (task == "text" and ocr_engines.EASYOCR_GPU)
+    pool = None if in_process else get_pool()
+    if pool is None:
+        return _recognise(task, images, config)
+    return pool.map(task, images, config)
+
+
+# ======================================================
+#                     ENTRY POINTS
+# ======================================================
+def readtext_batch(images, tesseract_config=ocr_engines.TESSERACT_PRESETS["timestamp"]):
+    """ocr_engines.readtext_batch over 2-D crops, spread across the pool."""
+    return _run("text", images, tesseract_config)
+
+
+def read_plates(gray_crops):
+    """analyzers.read_plate_gray over grayscale plate crops, spread across the pool."""
+    return _run("plate", gray_crops, None)
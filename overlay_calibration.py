@@ -0,0 +1,339 @@
+"""
+Automatic overlay ROI calibration and per-camera profiles.
+
+Dashcam brands burn the date/time and speed into different places, so the
+fixed ROIs in analyzers.py often cover mostly scenery. Calibration samples
+a few frames of a video and looks for *persistent edges*: burned-in text
+keeps its edges in the same place while the scene behind it moves.
+Persistent-edge blobs that look like text lines are OCR'd once to decide
+which one is the timestamp (and, if separate, the speed readout).
+
+The result is stored in camera_profiles, keyed by a camera signature
+(resolution, frame rate, codec); later clips from the same camera reuse
+the tight ROIs without calibrating again. Different brands can share a
+signature, so a profile whose timestamp ROI reads nothing on a clip
+records a miss and is recalibrated (or set aside for the default ROIs),
+see retry_profile(). A camera that could not be calibrated is only tried
+again every CALIBRATION_RETRY_CLIPS clips.
+"""
+import os
+import re
+import json
+
+import cv2
+import numpy as np
+
+import ocr_engines
+from analyzers import TIMESTAMP_ROI, SPEED_ROI, score_timestamp_text
+from overlay_roi import Binarizer, crop_roi
+
+
+OVERLAY_CALIBRATION = os.environ.get("OVERLAY_CALIBRATION", "True") == "True"
+CALIBRATION_SAMPLES = int(os.environ.get("CALIBRATION_SAMPLES", 12))
+# Frames are analysed at this width (edge statistics only)
+CALIBRATION_WIDTH = int(os.environ.get("CALIBRATION_WIDTH", 480))
+# Fraction of sampled frames in which a pixel must be an edge
+CALIBRATION_PERSISTENCE = float(os.environ.get("CALIBRATION_PERSISTENCE", 0.7))
+CALIBRATION_MAX_CANDIDATES = 6
+# score_timestamp_text() confidence that counts as a timestamp reading
+READING_MIN_CONFIDENCE = 50
+# Clips a default / stale profile is used as is before calibrating again
+CALIBRATION_RETRY_CLIPS = int(os.environ.get("CALIBRATION_RETRY_CLIPS", 10))
+# Frames OCR'd with a retry ROI before the overlay analyzers are re-run with it
+OVERLAY_RECHECK_SAMPLES = int(os.environ.get("OVERLAY_RECHECK_SAMPLES", 4))
+
+CAMERA_PROFILE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS camera_profiles (
+        signature TEXT PRIMARY KEY,
+        width INTEGER,
+        height INTEGER,
+        fps REAL,
+        codec TEXT,
+        timestamp_roi TEXT NOT NULL,
+        speed_roi TEXT NOT NULL,
+        source TEXT NOT NULL,
+        calibrated_from TEXT,
+        videos_seen INTEGER DEFAULT 1,
+        created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+        last_used TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+]
+
+# Migration 6: consecutive clips on which the profile's timestamp ROI read nothing
+CAMERA_PROFILE_MISSES_COLUMNS = [
+    "ALTER TABLE camera_profiles ADD COLUMN misses INTEGER DEFAULT 0",
+    "ALTER TABLE camera_profiles ADD COLUMN last_miss TEXT",
+]
+
+# Migration 8: clips served since the camera was last calibrated (or tried)
+CAMERA_PROFILE_BACKOFF_COLUMN = "ALTER TABLE camera_profiles ADD COLUMN clips_since_calibration INTEGER DEFAULT 0"
+
+SPEED_PATTERN = re.compile(r"\d{1,3}\s*(KM/?H|MPH)", re.IGNORECASE)
+
+
+# ======================================================
+#                  CAMERA SIGNATURE
+# ======================================================
+def camera_signature(video_path):
+    """(signature, metadata) from resolution, frame rate and codec."""
+    cap = cv2.VideoCapture(video_path)
+    try:
+        width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+        height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+        fps = round(cap.get(cv2.CAP_PROP_FPS) or 0, 2)
+        fourcc = int(cap.get(cv2.CAP_PROP_FOURCC))
+    finally:
+        cap.release()
+    codec = "".join(chr((fourcc >> 8 * i) & 0xFF) for i in range(4)).strip("\x00 ") or "unknown"
+    meta = {"width": width, "height": height, "fps": fps, "codec": codec}
+    return f"{width}x{height}@{fps:g}/{codec}", meta
+
+
+# ======================================================
+#                    CALIBRATION
+# ======================================================
+def _sample_frames(video_path, n):
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    try:
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total <= 0:
+            return frames
+        for i in np.linspace(0.05, 0.95, n):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(total * i))
+            ok, frame = cap.read()
+            if ok:
+                frames.append(frame)
+    finally:
+        cap.release()
+    return frames
+
+
+def persistent_edges(frames, width=None):
+    """Fraction of frames in which each (downscaled) pixel is an edge."""
+    width = width or CALIBRATION_WIDTH
+    h, w = frames[0].shape[:2]
+    size = (width, max(1, int(round(h * width / w))))
+    total = np.zeros((size[1], size[0]), np.float32)
+    for frame in frames:
+        gray = cv2.cvtColor(cv2.resize(frame, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+        total += cv2.Canny(gray, 100, 200) > 0
+    return total / len(frames)
+
+
+def text_regions(persistence, threshold=None):
+    """Bounding boxes (x, y, w, h) of text-like blobs of persistent edges, largest first."""
+    threshold = CALIBRATION_PERSISTENCE if threshold is None else threshold
+    mask = (persistence >= threshold).astype(np.uint8) * 255
+    h, w = mask.shape
+    # Merge characters into lines, then drop isolated specks
+    kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (max(3, w // 60), max(1, h // 120)))
+    merged = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, kernel)
+
+    n, _, stats, _ = cv2.connectedComponentsWithStats(merged)
+    regions = []
+    for x, y, bw, bh, _ in stats[1:n]:
+        if not (0.015 * h <= bh <= 0.15 * h) or bw < 2 * bh:
+            continue  # not a text line (hood edge, lane marking, logo)
+        density = mask[y:y + bh, x:x + bw].mean() / 255
+        if density < 0.08:
+            continue
+        regions.append((int(x), int(y), int(bw), int(bh)))
+    regions.sort(key=lambda r: r[2] * r[3], reverse=True)
+    return regions[:CALIBRATION_MAX_CANDIDATES]
+
+
+def region_to_roi(region, shape):
+    """Padded fractional ROI for a box found on a (h, w) analysis image."""
+    x, y, bw, bh = region
+    h, w = shape
+    # Digits that change between samples (seconds, speed) are not persistent
+    # edges, so the box can stop short of them: pad a few characters sideways
+    pad_y, pad_x = 0.3 * bh, 4 * bh
+    y0, y1 = max(0.0, (y - pad_y) / h), min(1.0, (y + bh + pad_y) / h)
+    x0, x1 = max(0.0, (x - pad_x) / w), min(1.0, (x + bw + pad_x) / w)
+    return {"y": [round(y0, 4), round(y1, 4)], "x": [round(x0, 4), round(x1, 4)]}
+
+
+def calibrate(video_path, samples=None):
+    """
+    {"timestamp_roi", "speed_roi", "candidates"} for a video, or None when
+    no overlay that reads as a timestamp was found.
+    """
+    frames = _sample_frames(video_path, samples or CALIBRATION_SAMPLES)
+    if len(frames) < 3:
+        return None
+
+    persistence = persistent_edges(frames)
+    regions = text_regions(persistence)
+    if not regions:
+        return None
+
+    binarize = Binarizer()
+    frame = frames[-1]
+    timestamp, speed, candidates = None, None, []
+    for region in regions:
+        roi = region_to_roi(region, persistence.shape)
+        crop = binarize(crop_roi(frame, roi, copy=False))
+        raw = ocr_engines.readtext(crop, tesseract_config=ocr_engines.TESSERACT_PRESETS["timestamp"])
+        text, confidence = score_timestamp_text(raw.strip())
+        candidates.append({"roi": roi, "raw": raw.strip(), "timestamp_confidence": confidence})
+        if confidence >= READING_MIN_CONFIDENCE and (timestamp is None or confidence > timestamp[1]):
+            timestamp = (roi, confidence)
+        elif confidence < READING_MIN_CONFIDENCE and speed is None and SPEED_PATTERN.search(raw):
+            speed = roi
+
+    if timestamp is None:
+        return None
+    return {
+        "timestamp_roi": timestamp[0],
+        # Speed on the timestamp line (or not found) keeps the default region
+        "speed_roi": speed or SPEED_ROI,
+        "candidates": candidates,
+    }
+
+
+# ======================================================
+#                   CAMERA PROFILES
+# ======================================================
+def _row_to_profile(row):
+    profile = dict(row)
+    profile["timestamp_roi"] = json.loads(profile["timestamp_roi"])
+    profile["speed_roi"] = json.loads(profile["speed_roi"])
+    return profile
+
+
+def get_profile(conn, signature):
+    row = conn.execute("SELECT * FROM camera_profiles WHERE signature=?", (signature,)).fetchone()
+    return _row_to_profile(row) if row else None
+
+
+def save_profile(conn, signature, meta, timestamp_roi, speed_roi, source, calibrated_from):
+    conn.execute("""
+        INSERT INTO camera_profiles
+        (signature, width, height, fps, codec, timestamp_roi, speed_roi, source, calibrated_from)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(signature) DO UPDATE SET
+            timestamp_roi=excluded.timestamp_roi,
+            speed_roi=excluded.speed_roi,
+            source=excluded.source,
+            calibrated_from=excluded.calibrated_from,
+            misses=0,
+            clips_since_calibration=0,
+            videos_seen=camera_profiles.videos_seen + 1,
+            last_used=CURRENT_TIMESTAMP
+    """, (signature, meta["width"], meta["height"], meta["fps"], meta["codec"],
+          json.dumps(timestamp_roi), json.dumps(speed_roi), source, calibrated_from))
+    conn.commit()
+
+
+def profile_for_video(conn, video_path):
+    """
+    Overlay ROIs for a video's camera. A calibrated profile is reused as
+    is; otherwise the video is calibrated (falling back to the default
+    ROIs). A default or stale profile is reused for CALIBRATION_RETRY_CLIPS
+    clips before the camera is calibrated again.
+    """
+    signature, meta = camera_signature(video_path)
+    profile = get_profile(conn, signature)
+    if profile is not None and (profile["source"] == "calibrated"
+                                or (profile["clips_since_calibration"] or 0) < CALIBRATION_RETRY_CLIPS):
+        conn.execute("""
+            UPDATE camera_profiles SET videos_seen=videos_seen + 1, last_used=CURRENT_TIMESTAMP,
+                clips_since_calibration=COALESCE(clips_since_calibration, 0) + 1
+            WHERE signature=?
+        """, (signature,))
+        conn.commit()
+        return get_profile(conn, signature)
+
+    result = None
+    if OVERLAY_CALIBRATION:
+        try:
+            result = calibrate(video_path)
+        except Exception as e:
+            print(f"⚠️ Overlay calibration failed for {os.path.basename(video_path)}: {e}")
+
+    if result is not None:
+        save_profile(conn, signature, meta, result["timestamp_roi"], result["speed_roi"],
+                     "calibrated", os.path.basename(video_path))
+        print(f"📐 Calibrated overlay for camera {signature}: timestamp {result['timestamp_roi']}, "
+              f"speed {result['speed_roi']}")
+    else:
+        save_profile(conn, signature, meta, TIMESTAMP_ROI, SPEED_ROI,
+                     "default", os.path.basename(video_path))
+    return get_profile(conn, signature)
+
+
+# ======================================================
+#                   MISSED READINGS
+# ======================================================
+def read_timestamp(ocr_results):
+    """True if any TimestampAnalyzer frame read as (part of) a timestamp."""
+    return any(r["confidence"] >= READING_MIN_CONFIDENCE for r in ocr_results)
+
+
+def reads_timestamp(video_path, roi, samples=None):
+    """True if `roi` reads as a timestamp on any of a few sampled frames."""
+    binarize = Binarizer()
+    for frame in _sample_frames(video_path, samples or OVERLAY_RECHECK_SAMPLES):
+        crop = binarize(crop_roi(frame, roi, copy=False))
+        raw = ocr_engines.readtext(crop, tesseract_config=ocr_engines.TESSERACT_PRESETS["timestamp"])
+        if score_timestamp_text(raw.strip())[1] >= READING_MIN_CONFIDENCE:
+            return True
+    return False
+
+
+def retry_profile(conn, profile, video_path, ocr_results):
+    """
+    Check a pass made with `profile`'s ROIs. A clip that read a timestamp
+    clears the profile's misses and returns None. Otherwise the miss is
+    recorded; a calibrated profile is recalibrated on this clip (another
+    brand may share the signature) or, failing that, marked stale, and the
+    profile to re-run the overlay analyzers with is returned. A stale
+    profile falls back to the default ROIs without recalibrating. Each
+    candidate must read a timestamp on a few sampled frames
+    (reads_timestamp) first; None when there is nothing worth re-running.
+    """
+    signature = profile["signature"]
+    if read_timestamp(ocr_results):
+        if profile.get("misses"):
+            conn.execute("UPDATE camera_profiles SET misses=0 WHERE signature=?", (signature,))
+            conn.commit()
+        return None
+
+    name = os.path.basename(video_path)
+    conn.execute(
+        "UPDATE camera_profiles SET misses=COALESCE(misses, 0) + 1, last_miss=? WHERE signature=?",
+        (name, signature)
+    )
+    conn.commit()
+    print(f"⚠️ No timestamp read with the {profile['source']} ROI of camera {signature} on {name}")
+    if profile["source"] == "default":
+        return None  # already on the default ROIs, and calibration just failed
+
+    if profile["source"] == "calibrated":
+        result = None
+        if OVERLAY_CALIBRATION:
+            try:
+                result = calibrate(video_path)
+            except Exception as e:
+                print(f"⚠️ Overlay recalibration failed for {name}: {e}")
+        if (result is not None and result["timestamp_roi"] != profile["timestamp_roi"]
+                and reads_timestamp(video_path, result["timestamp_roi"])):
+            _, meta = camera_signature(video_path)
+            save_profile(conn, signature, meta, result["timestamp_roi"], result["speed_roi"], "calibrated", name)
+            print(f"📐 Recalibrated overlay for camera {signature}: timestamp {result['timestamp_roi']}")
+            return get_profile(conn, signature)
+
+        conn.execute("UPDATE camera_profiles SET source='stale', clips_since_calibration=0 WHERE signature=?",
+                     (signature,))
+        conn.commit()
+
+    if profile["timestamp_roi"] == TIMESTAMP_ROI and profile["speed_roi"] == SPEED_ROI:
+        return None
+    if not reads_timestamp(video_path, TIMESTAMP_ROI):
+        print(f"⚠️ Default ROI reads no timestamp on sampled frames of {name} either; not re-running")
+        return None
+    return dict(profile, timestamp_roi=TIMESTAMP_ROI, speed_roi=SPEED_ROI, source="default")
@@ -0,0 +1,86 @@
+"""
+Fast path for overlay (timestamp / speed) crops.
+
+The decoder still produces whole frames (OpenCV cannot decode part of
+one), but the overlay analyzers take only their ROI strip off the decode
+thread. Pixel geometry for an ROI is computed once per (ROI, frame size)
+- in practice once per camera model - and the gray -> 2.5x upscale ->
+Otsu preprocessing runs through buffers allocated once per analyzer
+instead of three fresh full-size images per sample.
+"""
+import threading
+
+import cv2
+import numpy as np
+
+
+# ======================================================
+#                  ROI GEOMETRY CACHE
+# ======================================================
+_geometry = {}
+_geometry_lock = threading.Lock()
+
+
+def _roi_key(roi):
+    return tuple(roi["y"]), tuple(roi["x"])
+
+
+def roi_slices(roi, width, height):
+    """
+    (row slice, column slice) for a fractional ROI {"y": [y0, y1], "x": [x0, x1]}
+    on a width x height frame; computed once per ROI and frame size.
+    """
+    key = (_roi_key(roi), width, height)
+    slices = _geometry.get(key)
+    if slices is None:
+        (y0, y1), (x0, x1) = key[0]
+        slices = (slice(int(height * y0), int(height * y1)),
+                  slice(int(width * x0), int(width * x1)))
+        with _geometry_lock:
+            _geometry[key] = slices
+    return slices
+
+
+def crop_roi(frame, roi, copy=True):
+    """The ROI of a frame; a copy by default, so the full frame can be freed."""
+    h, w = frame.shape[:2]
+    rows, cols = roi_slices(roi, w, h)
+    crop = frame[rows, cols]
+    return crop.copy() if copy else crop
+
+
+# ======================================================
+#            FUSED BINARIZATION (REUSED BUFFERS)
+# ======================================================
+class Binarizer:
+    """
+    gray -> resize(scale) -> Otsu threshold (analyzers.BINARIZE_PARAMS),
+    with the intermediate gray and upscaled images written into buffers
+    kept between calls. Use from one thread.
+    """
+
+    def __init__(self, scale=2.5):
+        self.scale = scale
+        self._shape = None
+        self._gray = None
+        self._big = None
+
+    def _allocate(self, h, w):
+        # Let OpenCV size the upscaled buffer exactly as resize(fx=scale) does
+        probe = cv2.resize(np.zeros((h, w), np.uint8), None, fx=self.scale, fy=self.scale)
+        big_h, big_w = probe.shape
+        self._gray = np.empty((h, w), np.uint8)
+        self._big = np.empty((big_h, big_w), np.uint8)
+        self._shape = (h, w)
+
+    def __call__(self, crop_bgr, out=None):
+        """Binarized crop; written into `out` when given, else a new array."""
+        h, w = crop_bgr.shape[:2]
+        if self._shape != (h, w):
+            self._allocate(h, w)
+        cv2.cvtColor(crop_bgr, cv2.COLOR_BGR2GRAY, dst=self._gray)
+        cv2.resize(self._gray, None, dst=self._big, fx=self.scale, fy=self.scale)
+        if out is None:
+            out = np.empty_like(self._big)
+        cv2.threshold(self._big, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=out)
+        return out
@@ -0,0 +1,210 @@
+"""
+Lightweight IoU / centroid tracker for plate detections.
+
+Detections on consecutive sampled frames are linked into tracks, so the
+same vehicle seen in 40 samples becomes one track. Each track keeps only
+its best few crops (sharpness x area); once the track ends those are
+OCR'd - in batches across ended tracks, so the OCR pool can spread them
+over cores - and the readings are voted per track, giving one plate per
+vehicle.
+"""
+import os
+from collections import Counter
+
+import cv2
+
+
+# Crops kept (and OCR'd) per track
+TRACK_OCR_CROPS = int(os.environ.get("TRACK_OCR_CROPS", 3))
+# A track ends after this many sampled frames without a matching detection
+TRACK_MAX_MISSES = int(os.environ.get("TRACK_MAX_MISSES", 3))
+TRACK_IOU_THRESHOLD = float(os.environ.get("TRACK_IOU_THRESHOLD", 0.3))
+# Centroid fallback: max distance in multiples of the track box diagonal
+TRACK_MAX_CENTROID_SHIFT = float(os.environ.get("TRACK_MAX_CENTROID_SHIFT", 1.5))
+# Ended tracks' crops are OCR'd together once this many are waiting
+TRACK_OCR_BATCH = int(os.environ.get("TRACK_OCR_BATCH", 64))
+
+
+def iou(a, b):
+    x1, y1 = max(a[0], b[0]), max(a[1], b[1])
+    x2, y2 = min(a[2], b[2]), min(a[3], b[3])
+    inter = max(0, x2 - x1) * max(0, y2 - y1)
+    if inter == 0:
+        return 0.0
+    area_a = (a[2] - a[0]) * (a[3] - a[1])
+    area_b = (b[2] - b[0]) * (b[3] - b[1])
+    return inter / float(area_a + area_b - inter)
+
+
+def _centroid(box):
+    return (box[0] + box[2]) / 2.0, (box[1] + box[3]) / 2.0
+
+
+def _centroid_shift(a, b):
+    """Centroid distance between two boxes, relative to a's diagonal."""
+    (ax, ay), (bx, by) = _centroid(a), _centroid(b)
+    diag = max(1.0, ((a[2] - a[0]) ** 2 + (a[3] - a[1]) ** 2) ** 0.5)
+    return ((ax - bx) ** 2 + (ay - by) ** 2) ** 0.5 / diag
+
+
+def crop_quality(crop):
+    """Sharpness (variance of the Laplacian) times area; higher is better."""
+    gray = cv2.cvtColor(crop, cv2.COLOR_RGB2GRAY) if crop.ndim == 3 else crop
+    sharpness = cv2.Laplacian(gray, cv2.CV_64F).var()
+    return float(sharpness) * gray.shape[0] * gray.shape[1]
+
+
+class Track:
+    def __init__(self, track_id, box, frame_index):
+        self.track_id = track_id
+        self.box = box
+        self.first_frame = frame_index
+        self.last_frame = frame_index
+        self.hits = 0
+        self.misses = 0
+        self.best_confidence = 0.0
+        self.crops = []  # [(quality, frame_index, box, crop)], best first
+        self.readings = []
+
+    def add(self, box, confidence, crop, frame_index, max_crops):
+        self.box = box
+        self.last_frame = frame_index
+        self.hits += 1
+        self.misses = 0
+        self.best_confidence = max(self.best_confidence, confidence)
+
+        quality = crop_quality(crop)
+        if len(self.crops) < max_crops or quality > self.crops[-1][0]:
+            self.crops.append((quality, frame_index, box, crop.copy()))
+            self.crops.sort(key=lambda c: c[0], reverse=True)
+            del self.crops[max_crops:]
+
+    def vote(self):
+        """Most common reading, ties broken by the sharper crop (read first)."""
+        if not self.readings:
+            return None, 0
+        counts = Counter(self.readings)
+        best = max(counts, key=lambda t: (counts[t], -self.readings.index(t)))
+        return best, counts[best]
+
+    def summary(self):
+        plate_text, votes = self.vote()
+        return {
+            "track_id": self.track_id,
+            "plate_text": plate_text,
+            "votes": votes,
+            "readings": list(self.readings),
+            "hits": self.hits,
+            "first_frame": self.first_frame,
+            "last_frame": self.last_frame,
+            "confidence": self.best_confidence,
+        }
+
+
+class PlateTracker:
+    """
+    Greedy IoU matching with a centroid-distance fallback.
+
+    `read_many([(crop, frame_index, box), ...])` is the OCR function,
+    returning one text per crop; it runs only on the kept crops of ended
+    tracks, once `ocr_batch` crops are waiting (and at close()).
+    """
+
+    def __init__(self, read_many, max_crops=None, max_misses=None,
+                 iou_threshold=None, max_centroid_shift=None, ocr_batch=None):
+        self.read_many = read_many
+        self.max_crops = max(1, max_crops or TRACK_OCR_CROPS)
+        self.max_misses = TRACK_MAX_MISSES if max_misses is None else max_misses
+        self.iou_threshold = TRACK_IOU_THRESHOLD if iou_threshold is None else iou_threshold
+        self.max_centroid_shift = (TRACK_MAX_CENTROID_SHIFT if max_centroid_shift is None
+                                   else max_centroid_shift)
+        self.ocr_batch = max(1, ocr_batch or TRACK_OCR_BATCH)
+        self.active = []
+        self.finished = []
+        self._unread = []  # ended tracks whose crops are not OCR'd yet
+        self.observations = []  # one per detection: frame, track_id, box, confidence
+        self.ocr_calls = 0
+        self._next_id = 1
+
+    def update(self, frame_index, detections):
+        """detections: [(box(x1, y1, x2, y2), confidence, crop)] for one sampled frame."""
+        pairs = []
+        for ti, track in enumerate(self.active):
+            for di, (box, _, _) in enumerate(detections):
+                overlap = iou(track.box, box)
+                if overlap >= self.iou_threshold:
+                    pairs.append((1.0 + overlap, ti, di))
+                else:
+                    shift = _centroid_shift(track.box, box)
+                    if shift <= self.max_centroid_shift:
+                        pairs.append((1.0 - shift / (self.max_centroid_shift + 1e-9), ti, di))
+        pairs.sort(reverse=True)
+
+        used_tracks, used_dets = set(), set()
+        for _, ti, di in pairs:
+            if ti in used_tracks or di in used_dets:
+                continue
+            used_tracks.add(ti)
+            used_dets.add(di)
+            box, confidence, crop = detections[di]
+            self.active[ti].add(box, confidence, crop, frame_index, self.max_crops)
+            self._observe(frame_index, self.active[ti], box, confidence)
+
+        for di, (box, confidence, crop) in enumerate(detections):
+            if di in used_dets:
+                continue
+            track = Track(self._next_id, box, frame_index)
+            self._next_id += 1
+            track.add(box, confidence, crop, frame_index, self.max_crops)
+            self._observe(frame_index, track, box, confidence)
+            self.active.append(track)
+            used_tracks.add(len(self.active) - 1)
+
+        still_active = []
+        for ti, track in enumerate(self.active):
+            if ti not in used_tracks:
+                track.misses += 1
+            if track.misses > self.max_misses:
+                self._retire(track)
+            else:
+                still_active.append(track)
+        self.active = still_active
+
+    def _observe(self, frame_index, track, box, confidence):
+        self.observations.append({
+            "frame": frame_index, "track_id": track.track_id,
+            "box": tuple(box), "confidence": confidence,
+        })
+
+    def _retire(self, track):
+        self.finished.append(track)
+        self._unread.append(track)
+        if sum(len(t.crops) for t in self._unread) >= self.ocr_batch:
+            self._read_unread()
+
+    def _read_unread(self):
+        owners, items = [], []
+        for track in self._unread:
+            for _, frame_index, box, crop in track.crops:
+                owners.append(track)
+                items.append((crop, frame_index, box))
+        self._unread = []
+        if not items:
+            return
+        self.ocr_calls += len(items)
+        # Per track, crops are read best first (vote() breaks ties by that order)
+        for track, text in zip(owners, self.read_many(items)):
+            if text and len(text) > 2:
+                track.readings.append(text)
+        for track in owners:
+            track.crops = []
+
+    def close(self):
+        """End all open tracks; returns per-track summaries ordered by first appearance."""
+        for track in self.active:
+            self.finished.append(track)
+            self._unread.append(track)
+        self.active = []
+        self._read_unread()
+        self.finished.sort(key=lambda t: t.track_id)
+        return [t.summary() for t in self.finished]
@@ -0,0 +1,102 @@
+"""
+Per-case, per-evidence PDF report store.
+
+A report is identified by a digest of its input data (everything
+fetch_all_report_data() returns except the generation time), stored as
+
+    reports/<case>/<evidence>/<digest>.pdf
+
+so concurrent users never overwrite each other's reports, and asking for
+the same report again - nothing re-analysed since - serves the existing
+file without rebuilding it. PDFs are written to a temp file in the same
+folder and renamed into place, so a reader never sees a half-written one.
+"""
+import os
+import re
+import json
+import hashlib
+import tempfile
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+REPORT_FOLDER = os.environ.get("REPORT_FOLDER", os.path.join(BASE_DIR, "reports"))
+# Older reports kept per case/evidence folder
+REPORT_KEEP_PER_EVIDENCE = int(os.environ.get("REPORT_KEEP_PER_EVIDENCE", 5))
+# Bump when generate_pdf_report()'s layout changes so cached PDFs are rebuilt
+REPORT_LAYOUT_VERSION = 2
+
+# Fields that differ on every call without changing the evidence
+VOLATILE_FIELDS = ("report_date",)
+
+
+def safe_name(value, default):
+    name = re.sub(r"[^A-Za-z0-9._-]", "_", str(value or "")).strip("._")
+    return name or default
+
+
+def report_digest(data):
+    """SHA-256 of the report inputs (stable key order, volatile fields dropped)."""
+    stable = {k: v for k, v in data.items() if k not in VOLATILE_FIELDS}
+    material = json.dumps([REPORT_LAYOUT_VERSION, stable], sort_keys=True, separators=(",", ":"), default=str)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def report_dir(case_id, filename, folder=None):
+    evidence = os.path.splitext(os.path.basename(filename or ""))[0]
+    return os.path.join(folder or REPORT_FOLDER, safe_name(case_id, "no_case"), safe_name(evidence, "no_evidence"))
+
+
+def get_or_build(data, case_id, filename, generate, folder=None):
+    """
+    Path of the PDF for `data`, building it with `generate(data, path)`
+    only if no report with the same digest exists.
+    Returns (path, digest, cached).
+    """
+    digest = report_digest(data)
+    directory = report_dir(case_id, filename, folder)
+    path = os.path.join(directory, f"{digest}.pdf")
+    if os.path.isfile(path):
+        os.utime(path)  # most recently used - kept by prune()
+        return path, digest, True
+
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{digest[:12]}-", suffix=".tmp")
+    os.close(fd)
+    try:
+        generate(data, tmp_path)
+        os.replace(tmp_path, path)  # atomic on the same filesystem
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+        raise
+
+    prune(directory, keep=path)
+    return path, digest, False
+
+
+def prune(directory, keep=None, keep_count=None):
+    """Delete all but the newest REPORT_KEEP_PER_EVIDENCE reports in a folder."""
+    keep_count = REPORT_KEEP_PER_EVIDENCE if keep_count is None else keep_count
+    reports = []
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if name.endswith(".pdf") and os.path.isfile(path):
+            reports.append((os.path.getmtime(path), path))
+    reports.sort(reverse=True)
+    for _, path in reports[keep_count:]:
+        if path != keep:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+def resolve(relative_path, folder=None):
+    """Absolute path of a stored report, or None if missing or outside the store."""
+    root = os.path.realpath(folder or REPORT_FOLDER)
+    path = os.path.realpath(os.path.join(root, relative_path or ""))
+    if not path.startswith(root + os.sep) or not os.path.isfile(path):
+        return None
+    return path
@@ -0,0 +1,402 @@
+"""
+Storage for the evidence records: uploads, tamper baselines and status,
+timestamp summaries and plate results.
+
+app.py talks to a Repository instead of writing SQL against sqlite3, so the
+same code runs on:
+  SQLiteBackend - dashcam.db (or a shared in-memory database for tests)
+  MySQLBackend  - a MySQL / MariaDB server
+
+Both backends hand out pooled connections (db_pool). Queries are written
+once with `?` placeholders; each backend supplies its dialect for
+placeholders, insert-if-absent and upserts. Rows come back as plain dicts
+with datetimes formatted like SQLite's ("YYYY-MM-DD HH:MM:SS").
+
+Scope: only these evidence records move. Users, the job queue and the
+per-analysis detail tables (hash verifications, segment digests,
+observations, ...) stay in the node's own dashcam.db through get_db() in
+app.py, so DB_BACKEND=mysql serves a single app node. Sharing one
+database between nodes also needs those tables behind the repository.
+"""
+import os
+import sqlite3
+import itertools
+from datetime import datetime
+from contextlib import contextmanager
+
+import config
+import db_pool
+import migrations
+
+
+# ======================================================
+#                    MYSQL SCHEMA
+# ======================================================
+# SQLite gets the same tables from migrations.BASE_SCHEMA
+MYSQL_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS uploads (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        filename VARCHAR(255) NOT NULL UNIQUE,
+        original_name VARCHAR(255),
+        uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_uploads_uploaded_at (uploaded_at)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tamper_records (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        filename VARCHAR(255) NOT NULL UNIQUE,
+        sha256 CHAR(64) NOT NULL,
+        uploaded_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS license_results (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        filename VARCHAR(255) NOT NULL UNIQUE,
+        plate_text VARCHAR(64),
+        confidence DOUBLE,
+        detected_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+        INDEX idx_license_results_plate (plate_text)
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS timestamps (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        filename VARCHAR(255) NOT NULL UNIQUE,
+        timestamp_text VARCHAR(255) NOT NULL,
+        confidence DOUBLE DEFAULT 0.0,
+        consistency_score DOUBLE DEFAULT 0.0,
+        has_drift TINYINT DEFAULT 0,
+        frame_count INT DEFAULT 0,
+        raw_ocr_results LONGTEXT,
+        extracted_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS tampers (
+        id INT AUTO_INCREMENT PRIMARY KEY,
+        filename VARCHAR(255) NOT NULL UNIQUE,
+        tamper_status VARCHAR(64),
+        checked_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    ) ENGINE=InnoDB DEFAULT CHARSET=utf8mb4
+    """,
+]
+
+EVIDENCE_TABLES = ["uploads", "tamper_records", "timestamps", "tampers", "license_results"]
+
+
+# ======================================================
+#                      BACKENDS
+# ======================================================
+class SQLiteBackend:
+    """
+    dashcam.db through a connection pool. `acquire` overrides where
+    connections come from (app.py passes get_db so a request shares its
+    connection); path ":memory:" gives a private in-memory database that
+    lives as long as the backend.
+    """
+
+    name = "sqlite"
+    _memory_ids = itertools.count(1)
+
+    def __init__(self, path=None, acquire=None):
+        self.path = path
+        self._anchor = None
+        self.pool = None
+        # With app.py's get_db the schema comes from its migrations already,
+        # and the connection (with any pending writes) belongs to the caller
+        self.owns_schema = acquire is None
+        self.shares_connection = acquire is not None
+        if acquire is not None:
+            self._acquire = acquire
+            return
+
+        if path == ":memory:":
+            # Shared-cache URI: every pooled connection sees the same database
+            target = f"file:repository_{os.getpid()}_{next(self._memory_ids)}?mode=memory&cache=shared"
+            uri = True
+        else:
+            target, uri = path, False
+
+        def connect():
+            conn = sqlite3.connect(target, timeout=30, check_same_thread=False, uri=uri)
+            migrations.apply_pragmas(conn)
+            return conn
+
+        if uri:
+            self._anchor = connect()  # the database is dropped when its last connection closes
+        self.pool = db_pool.ConnectionPool(connect)
+        self._acquire = self.pool.acquire
+
+    def connection(self):
+        return self._acquire()
+
+    def sql(self, query):
+        return query
+
+    def insert_ignore(self, table, columns):
+        marks = ", ".join("?" * len(columns))
+        return f"INSERT OR IGNORE INTO {table} ({', '.join(columns)}) VALUES ({marks})"
+
+    def upsert(self, table, key, columns, touch=()):
+        marks = ", ".join("?" * len(columns))
+        updates = [f"{c}=excluded.{c}" for c in columns if c != key]
+        updates += [f"{c}=CURRENT_TIMESTAMP" for c in touch]
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks}) "
+                f"ON CONFLICT({key}) DO UPDATE SET {', '.join(updates)}")
+
+    def init_schema(self):
+        conn = self.connection()
+        try:
+            migrations.migrate(conn)
+        finally:
+            conn.close()
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.close_all()
+        if self._anchor is not None:
+            self._anchor.close()
+            self._anchor = None
+
+
+class MySQLBackend:
+    """
+    MySQL / MariaDB via mysqlclient (`pip install mysqlclient`), imported
+    on first connect so SQLite-only deployments don't need it.
+    """
+
+    name = "mysql"
+    owns_schema = True
+    shares_connection = False
+
+    def __init__(self, host=None, port=None, user=None, password=None, database=None,
+                 pool_size=None, connect_timeout=None):
+        self.host = host or config.MYSQL_HOST
+        self.port = port or config.MYSQL_PORT
+        self.user = user or config.MYSQL_USER
+        self.password = config.MYSQL_PASSWORD if password is None else password
+        self.database = database or config.MYSQL_DB
+        self.connect_timeout = connect_timeout or config.MYSQL_CONNECT_TIMEOUT
+        self.pool = db_pool.ConnectionPool(
+            self._connect,
+            max_idle=config.MYSQL_POOL_SIZE if pool_size is None else pool_size,
+            reset=lambda conn: conn.rollback(),
+            ping=lambda conn: conn.ping(),
+        )
+
+    def _connect(self):
+        try:
+            import MySQLdb
+        except ImportError:
+            raise RuntimeError("DB_BACKEND=mysql needs the mysqlclient package (pip install mysqlclient)")
+        return MySQLdb.connect(
+            host=self.host, port=self.port, user=self.user, passwd=self.password,
+            db=self.database, charset="utf8mb4", connect_timeout=self.connect_timeout,
+            autocommit=False
+        )
+
+    def connection(self):
+        return self.pool.acquire()
+
+    def sql(self, query):
+        # MySQLdb uses the "format" paramstyle
+        return query.replace("?", "%s")
+
+    def insert_ignore(self, table, columns):
+        marks = ", ".join(["%s"] * len(columns))
+        return f"INSERT IGNORE INTO {table} ({', '.join(columns)}) VALUES ({marks})"
+
+    def upsert(self, table, key, columns, touch=()):
+        marks = ", ".join(["%s"] * len(columns))
+        updates = [f"{c}=VALUES({c})" for c in columns if c != key]
+        updates += [f"{c}=CURRENT_TIMESTAMP" for c in touch]
+        return (f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({marks}) "
+                f"ON DUPLICATE KEY UPDATE {', '.join(updates)}")
+
+    def init_schema(self):
+        conn = self.connection()
+        try:
+            cur = conn.cursor()
+            for statement in MYSQL_SCHEMA:
+                cur.execute(statement)
+            conn.commit()
+        finally:
+            conn.close()
+
+    def close(self):
+        self.pool.close_all()
+
+
+# ======================================================
+#                     REPOSITORY
+# ======================================================
+def _value(v):
+    if isinstance(v, datetime):
+        return v.strftime("%Y-%m-%d %H:%M:%S")
+    return v
+
+
+def _rows(cur):
+    columns = [d[0] for d in cur.description]
+    return [{c: _value(v) for c, v in zip(columns, row)} for row in cur.fetchall()]
+
+
+def _now():
+    return datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+
+class Repository:
+    def __init__(self, backend):
+        self.backend = backend
+
+    @contextmanager
+    def transaction(self):
+        """
+        Cursor in one transaction: committed on success, rolled back on error.
+        On a connection shared with the caller (SQLiteBackend with `acquire`)
+        it is a savepoint instead, so the caller's own pending writes are
+        neither committed nor rolled back here; the caller commits.
+        """
+        conn = self.backend.connection()
+        if self.backend.shares_connection:
+            try:
+                conn.execute("SAVEPOINT repository")
+                cur = conn.cursor()
+                try:
+                    yield cur
+                except BaseException:
+                    conn.execute("ROLLBACK TO SAVEPOINT repository")
+                    raise
+                finally:
+                    conn.execute("RELEASE SAVEPOINT repository")
+            finally:
+                conn.close()
+            return
+        try:
+            cur = conn.cursor()
+            yield cur
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+    def _query(self, query, params=()):
+        with self.transaction() as cur:
+            cur.execute(self.backend.sql(query), params)
+            return _rows(cur)
+
+    def _one(self, query, params=()):
+        rows = self._query(query, params)
+        return rows[0] if rows else None
+
+    def init_schema(self):
+        self.backend.init_schema()
+
+    def close(self):
+        self.backend.close()
+
+    # ---------------- UPLOADS ----------------
+    def add_upload(self, filename, sha256, uploaded_at=None):
+        """
+        Record an upload and its baseline hash (first acquisition only);
+        returns True if the baseline was newly recorded.
+        """
+        with self.transaction() as cur:
+            cur.execute(self.backend.insert_ignore("uploads", ["filename", "uploaded_at"]),
+                        (filename, uploaded_at or _now()))
+            cur.execute(self.backend.insert_ignore("tamper_records", ["filename", "sha256"]),
+                        (filename, sha256))
+            return cur.rowcount > 0
+
+    def list_uploads(self):
+        """Newest first."""
+        return self._query("SELECT filename, uploaded_at FROM uploads ORDER BY uploaded_at DESC")
+
+    def get_upload(self, filename):
+        return self._one("SELECT filename, uploaded_at FROM uploads WHERE filename=?", (filename,))
+
+    def delete_evidence(self, filename):
+        with self.transaction() as cur:
+            for table in EVIDENCE_TABLES:
+                cur.execute(self.backend.sql(f"DELETE FROM {table} WHERE filename=?"), (filename,))
+
+    def counts(self):
+        counts = {}
+        for table in ("uploads", "timestamps", "tampers"):
+            counts[table] = self._one(f"SELECT COUNT(*) AS count FROM {table}")["count"]
+        return counts
+
+    # ---------------- TAMPER ----------------
+    def baseline(self, filename):
+        """Baseline SHA-256 recorded for a file, or None."""
+        row = self._one("SELECT sha256 FROM tamper_records WHERE filename=?", (filename,))
+        return row["sha256"] if row else None
+
+    def baselines(self):
+        """{filename: baseline sha256} for every file."""
+        return {r["filename"]: r["sha256"] for r in self._query("SELECT filename, sha256 FROM tamper_records")}
+
+    def set_baseline(self, filename, sha256):
+        with self.transaction() as cur:
+            cur.execute(self.backend.upsert("tamper_records", "filename", ["filename", "sha256"]),
+                        (filename, sha256))
+
+    def record_tamper_status(self, filename, status):
+        with self.transaction() as cur:
+            cur.execute(self.backend.upsert("tampers", "filename", ["filename", "tamper_status"],
+                                            touch=["checked_at"]),
+                        (filename, status))
+
+    def tamper_statuses(self, filename):
+        return self._query("SELECT filename, tamper_status, checked_at FROM tampers WHERE filename=?", (filename,))
+
+    # ---------------- TIMESTAMPS ----------------
+    def save_timestamp_summary(self, filename, timestamp_text, confidence, consistency_score,
+                               has_drift, frame_count, extracted_at=None):
+        # Per-frame rows live in timestamp_observations; raw_ocr_results is
+        # only read for legacy records
+        columns = ["filename", "timestamp_text", "confidence", "consistency_score",
+                   "has_drift", "frame_count", "raw_ocr_results", "extracted_at"]
+        with self.transaction() as cur:
+            cur.execute(self.backend.upsert("timestamps", "filename", columns), (
+                filename, timestamp_text, confidence, consistency_score,
+                has_drift, frame_count, None, extracted_at or _now()
+            ))
+
+    def timestamp_summary(self, filename):
+        return self._one("""
+            SELECT filename, timestamp_text, confidence, consistency_score, has_drift,
+                   frame_count, raw_ocr_results, extracted_at
+            FROM timestamps WHERE filename=?
+        """, (filename,))
+
+    # ---------------- PLATES ----------------
+    def save_plate_result(self, filename, plate_text, confidence):
+        with self.transaction() as cur:
+            cur.execute(self.backend.upsert("license_results", "filename",
+                                            ["filename", "plate_text", "confidence"],
+                                            touch=["detected_at"]),
+                        (filename, plate_text, confidence))
+
+    def plate_results(self, filename):
+        return self._query(
+            "SELECT filename, plate_text, confidence, detected_at FROM license_results WHERE filename=?",
+            (filename,)
+        )
+
+
+def create_repository(backend=None, sqlite_path=None, sqlite_acquire=None):
+    """Repository for DB_BACKEND (sqlite / mysql / memory) unless `backend` is given."""
+    backend = (backend or config.DB_BACKEND).lower()
+    if backend == "mysql":
+        return Repository(MySQLBackend())
+    if backend == "memory":
+        return Repository(SQLiteBackend(":memory:"))
+    if backend == "sqlite":
+        return Repository(SQLiteBackend(sqlite_path, acquire=sqlite_acquire))
+    raise ValueError(f"Unknown DB_BACKEND {backend!r} (expected sqlite, mysql or memory)")
@@ -0,0 +1,200 @@
+"""
+Content-addressed cache for OCR and detection results.
+
+Entries are keyed by (evidence SHA-256, kind, frame index, ROI,
+preprocessing params, engine/model version), so re-running an analysis on
+the same evidence - or a tuning run that changes one parameter - only
+computes what actually changed. The evidence identity is the baseline hash
+in tamper_records.sha256.
+
+The cache is a separate SQLite file bounded to RESULT_CACHE_MAX_MB with
+least-recently-used eviction.
+"""
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "True") == "True"
+RESULT_CACHE_PATH = os.environ.get("RESULT_CACHE_PATH", os.path.join(BASE_DIR, "result_cache.db"))
+RESULT_CACHE_MAX_MB = float(os.environ.get("RESULT_CACHE_MAX_MB", 256))
+
+CACHE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS results (
+        key TEXT PRIMARY KEY,
+        evidence_sha TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        value TEXT NOT NULL,
+        size INTEGER NOT NULL,
+        created_at REAL NOT NULL,
+        last_used REAL NOT NULL
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS idx_results_last_used ON results(last_used)",
+    "CREATE INDEX IF NOT EXISTS idx_results_evidence ON results(evidence_sha)",
+]
+
+
+def make_key(evidence_sha, kind, frame, roi, params, engine):
+    """Stable digest of everything that determines a result."""
+    material = json.dumps(
+        [evidence_sha, kind, frame, roi, params, engine],
+        sort_keys=True, separators=(",", ":"), default=str
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class ResultCache:
+    """One SQLite cache file; safe to share between threads of a process."""
+
+    def __init__(self, path=None, max_bytes=None):
+        self.path = path or RESULT_CACHE_PATH
+        self.max_bytes = int(max_bytes if max_bytes is not None else RESULT_CACHE_MAX_MB * 1024 * 1024)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        for statement in CACHE_SCHEMA:
+            self._conn.execute(statement)
+        self._conn.commit()
+        self._size = self._total_size()
+
+    def _total_size(self):
+        return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+
+    def get_many(self, keys):
+        """{key: value} for the keys present; refreshes their LRU position."""
+        keys = list(dict.fromkeys(keys))
+        if not keys:
+            return {}
+        found = {}
+        with self._lock:
+            for i in range(0, len(keys), 500):
+                chunk = keys[i:i + 500]
+                marks = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM results WHERE key IN ({marks})", chunk
+                ).fetchall()
+                found.update((k, json.loads(v)) for k, v in rows)
+                if rows:
+                    self._conn.execute(
+                        f"UPDATE results SET last_used=? WHERE key IN ({marks})",
+                        [time.time()] + chunk
+                    )
+            self._conn.commit()
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        return found
+
+    def put_many(self, items, evidence_sha, kind):
+        """items: [(key, value)]; values must be JSON-serialisable."""
+        if not items:
+            return
+        now = time.time()
+        rows = []
+        for key, value in items:
+            blob = json.dumps(value, separators=(",", ":"))
+            rows.append((key, evidence_sha, kind, blob, len(blob), now, now))
+        with self._lock:
+            self._conn.executemany("""
+                INSERT OR REPLACE INTO results (key, evidence_sha, kind, value, size, created_at, last_used)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+            """, rows)
+            self._conn.commit()
+            self._size += sum(r[4] for r in rows)
+            if self._size > self.max_bytes:
+                self._evict()
+
+    def _evict(self):
+        """Drop least-recently-used entries down to 90% of the bound."""
+        # Other processes write to the same file; start from the real total
+        self._size = self._total_size()
+        target = int(self.max_bytes * 0.9)
+        if self._size <= target:
+            return
+        freed = 0
+        doomed = []
+        for key, size in self._conn.execute("SELECT key, size FROM results ORDER BY last_used"):
+            doomed.append((key,))
+            freed += size
+            if self._size - freed <= target:
+                break
+        self._conn.executemany("DELETE FROM results WHERE key=?", doomed)
+        self._conn.commit()
+        self._size -= freed
+        print(f"🧹 Result cache evicted {len(doomed)} entries ({freed} bytes)")
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "bytes": self._size, "max_bytes": self.max_bytes}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class EvidenceCache:
+    """The cache scoped to one piece of evidence (its baseline SHA-256)."""
+
+    def __init__(self, cache, evidence_sha):
+        self.cache = cache
+        self.evidence_sha = evidence_sha
+
+    def key(self, kind, frame, roi, params, engine):
+        return make_key(self.evidence_sha, kind, frame, roi, params, engine)
+
+    def map(self, kind, parts, params, engine, compute):
+        """
+        Cached version of `compute(indices) -> values` over a list of items.
+
+        `parts` holds one (frame, roi) per item; only the items missing
+        from the cache are passed to compute(), and their results stored.
+        """
+        keys = [self.key(kind, frame, roi, params, engine) for frame, roi in parts]
+        found = self.cache.get_many(keys)
+        missing = [i for i, k in enumerate(keys) if k not in found]
+        if missing:
+            computed = compute(missing)
+            self.cache.put_many([(keys[i], v) for i, v in zip(missing, computed)], self.evidence_sha, kind)
+            found.update((keys[i], v) for i, v in zip(missing, computed))
+        return [found[k] for k in keys]
+
+
+def cached_map(cache, kind, parts, params, engine, compute):
+    """EvidenceCache.map, or a plain compute() over everything when cache is None."""
+    if cache is None:
+        return compute(list(range(len(parts))))
+    return cache.map(kind, parts, params, engine, compute)
+
+
+# ======================================================
+#               PROCESS-WIDE CACHE HANDLE
+# ======================================================
+_lock = threading.Lock()
+_cache = None
+_cache_pid = None
+
+
+def get_cache():
+    """The process's ResultCache (None when disabled)."""
+    global _cache, _cache_pid
+    if not RESULT_CACHE_ENABLED:
+        return None
+    with _lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = ResultCache()
+            _cache_pid = os.getpid()
+        return _cache
+
+
+def for_evidence(evidence_sha):
+    """EvidenceCache for a baseline hash, or None if caching is off / no hash."""
+    cache = get_cache()
+    if cache is None or not evidence_sha:
+        return None
+    return EvidenceCache(cache, evidence_sha)
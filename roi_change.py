@@ -0,0 +1,71 @@
+"""
+Cheap change detection for overlay ROIs.
+
+The timestamp / speed overlays change about once per second, so densely
+sampled frames mostly show the same text. Each crop is reduced to a small
+grayscale thumbnail and compared against the thumbnail of the last crop
+that was actually OCR'd; when too few cells differ, the previous reading
+is reused instead of running OCR again.
+"""
+import os
+
+import cv2
+import numpy as np
+
+
+# Thumbnail scale used for the comparison (0.25 = one cell per 4x4 pixels;
+# coarser thumbnails blur a single changed digit below the threshold)
+ROI_CHANGE_SCALE = float(os.environ.get("ROI_CHANGE_SCALE", 0.25))
+# A thumbnail cell counts as changed when it differs by more than this (0-255)
+ROI_CHANGE_PIXEL_DELTA = int(os.environ.get("ROI_CHANGE_PIXEL_DELTA", 24))
+# The crop counts as changed when more than this many cells changed
+ROI_CHANGE_MAX_CELLS = int(os.environ.get("ROI_CHANGE_MAX_CELLS", 2))
+
+
+class RoiChangeDetector:
+    """Tracks one ROI; `hits` = OCR skipped, `misses` = OCR needed."""
+
+    def __init__(self, scale=None, pixel_delta=None, max_cells=None):
+        self.scale = scale or ROI_CHANGE_SCALE
+        self.pixel_delta = ROI_CHANGE_PIXEL_DELTA if pixel_delta is None else pixel_delta
+        self.max_cells = ROI_CHANGE_MAX_CELLS if max_cells is None else max_cells
+        self.hits = 0
+        self.misses = 0
+        self._reference = None
+
+    def _thumbnail(self, crop):
+        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY) if crop.ndim == 3 else crop
+        return cv2.resize(gray, None, fx=self.scale, fy=self.scale,
+                          interpolation=cv2.INTER_AREA).astype(np.int16)
+
+    def changed(self, crop):
+        """True if `crop` must be OCR'd (and becomes the new reference)."""
+        thumb = self._thumbnail(crop)
+        if self._reference is not None and self._reference.shape == thumb.shape:
+            diff = np.abs(thumb - self._reference) > self.pixel_delta
+            if np.count_nonzero(diff) <= self.max_cells:
+                self.hits += 1
+                return False
+        self._reference = thumb
+        self.misses += 1
+        return True
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(100.0 * self.hits / total, 1) if total else 0.0,
+        }
+
+
+def fill_forward(readings, previous=None):
+    """Replace None entries (unchanged crops) with the last real reading."""
+    filled = []
+    for reading in readings:
+        if reading is None:
+            reading = previous
+        else:
+            previous = reading
+        filled.append(reading)
+    return filled
@@ -0,0 +1,101 @@
+import threading
+
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("pytesseract")
+
+import analyzers
+from frame_pipeline import _AnalyzerRunner, _END
+
+
+class FakeYolo:
+    """predict() records each batch's size; no plates are ever found."""
+
+    def __init__(self):
+        self.batches = []
+        self.called = threading.Event()
+
+    def predict(self, frames, conf=None, verbose=False):
+        self.batches.append(len(frames))
+        self.called.set()
+        return [None] * len(frames)
+
+
+def _frame():
+    return np.zeros((48, 64, 3), np.uint8)
+
+
+def test_partial_yolo_batch_is_flushed_without_a_new_frame():
+    model = FakeYolo()
+    analyzer = analyzers.PlateAnalyzer(model, batch_size=8, max_latency=0.05)
+    runner = _AnalyzerRunner(analyzer)
+    runner.start()
+    runner.inbox.put((14, _frame()))
+    runner.inbox.put((29, _frame()))
+    assert model.called.wait(5)  # no third frame, no finish()
+    assert model.batches == [2]
+    runner.inbox.put(_END)
+    runner.join(5)
+    assert runner.error is None and model.batches == [2]
+
+
+def test_full_yolo_batch_is_flushed_at_once():
+    model = FakeYolo()
+    analyzer = analyzers.PlateAnalyzer(model, batch_size=2, max_latency=60)
+    for idx in (14, 29, 44):
+        analyzer.process(idx, _frame())
+    assert model.batches == [2]
+    analyzer.finish()
+    assert model.batches == [2, 1]
+
+
+@pytest.mark.parametrize("raw, expected", [
+    ("2024-03-15 12:00:05 ", ("2024-03-15 12:00:05", 100)),
+    ("REC 15/03/2024  12:00:05 KM/H", ("15/03/2024 12:00:05", 100)),
+    ("15-03-2024", ("15-03-2024", 80)),
+    ("2024/03/15", ("2024/03/15", 80)),
+    ("...03/2024", ("03/2024", 50)),
+    ("garbage", ("No text detected", 0)),
+])
+def test_score_timestamp_text_reads_year_and_day_first_dates(raw, expected):
+    assert analyzers.score_timestamp_text(raw) == expected
+
+
+def test_timestamp_analyzer_reuses_reading_for_unchanged_overlay(tmp_path, monkeypatch):
+    from artifacts import JobArtifacts
+
+    batches = []
+
+    def readtext_batch(images, tesseract_config=None):
+        batches.append(len(images))
+        return ["2024-03-15 12:00:05"] * len(images)
+
+    monkeypatch.setattr(analyzers.ocr_pool, "readtext_batch", readtext_batch)
+    monkeypatch.setattr(analyzers.ocr_engines, "engine_version", lambda: "test")
+    analyzer = analyzers.TimestampAnalyzer("clip.mp4", JobArtifacts(str(tmp_path), "clip.mp4", 1),
+                                           full_previews=False)
+    frame = np.zeros((240, 320, 3), np.uint8)
+    for idx in (10, 20, 30):
+        analyzer.process(idx, analyzer.roi(frame))
+    result = analyzer.finish()
+
+    assert batches == [1]
+    assert [r["text"] for r in result["observations"]] == ["2024-03-15 12:00:05"] * 3
+    assert [r["frame"] for r in result["observations"]] == [10, 20, 30]
+    assert result["ocr_cache"] == {"hits": 2, "misses": 1, "hit_rate": 66.7}
+
+
+def test_speed_analyzer_returns_ocr_cache_stats(monkeypatch):
+    monkeypatch.setattr(analyzers.ocr_pool, "readtext_batch",
+                        lambda images, tesseract_config=None: ["42 km/h"] * len(images))
+    monkeypatch.setattr(analyzers.ocr_engines, "engine_version", lambda: "test")
+    analyzer = analyzers.SpeedAnalyzer()
+    frame = np.zeros((240, 320, 3), np.uint8)
+    for idx in (10, 20):
+        analyzer.process(idx, analyzer.roi(frame))
+    result = analyzer.finish()
+
+    assert [r["speed"] for r in result["observations"]] == [42, 42]
+    assert result["ocr_cache"]["hits"] == 1 and result["ocr_cache"]["misses"] == 1
@@ -0,0 +1,79 @@
+import os
+import time
+
+import artifacts
+
+
+def _job(store, evidence, job_id, age_hours=0.0, size=0):
+    job = store.job_dir(evidence + ".mp4", job_id)
+    if size:
+        with open(job.file("preview.jpg"), "wb") as f:
+            f.write(b"\0" * size)
+    stamp = time.time() - age_hours * 3600
+    os.utime(job.path, (stamp, stamp))
+    return job.path
+
+
+def _store(root, **kwargs):
+    options = dict(retention_hours=72, keep_per_evidence=10, evidence_max_mb=100,
+                   total_max_mb=1000, min_age_seconds=0)
+    options.update(kwargs)
+    return artifacts.ArtifactStore(str(root), **options)
+
+
+def test_evidence_key_is_path_safe():
+    assert artifacts.evidence_key("../../etc/passwd") == "passwd"
+    assert artifacts.evidence_key("clip one.mp4") == "clip_one"
+
+
+def test_expired_jobs_are_removed(tmp_path):
+    store = _store(tmp_path)
+    old = _job(store, "a", 1, age_hours=100)
+    new = _job(store, "a", 2, age_hours=1)
+    assert store.collect_garbage()[0] == 1
+    assert not os.path.exists(old) and os.path.exists(new)
+
+
+def test_only_newest_jobs_per_evidence_are_kept(tmp_path):
+    store = _store(tmp_path, keep_per_evidence=2)
+    paths = [_job(store, "a", i, age_hours=5 - i) for i in range(4)]
+    other = _job(store, "b", 9, age_hours=10)
+    store.collect_garbage()
+    assert [os.path.exists(p) for p in paths] == [False, False, True, True]
+    assert os.path.exists(other)
+
+
+def test_total_quota_removes_oldest_first(tmp_path):
+    mb = 1024 * 1024
+    store = _store(tmp_path, total_max_mb=2.5)
+    paths = [_job(store, e, 1, age_hours=3 - i, size=mb) for i, e in enumerate("abc")]
+    store.collect_garbage()
+    assert [os.path.exists(p) for p in paths] == [False, True, True]
+
+
+def test_young_and_protected_jobs_survive(tmp_path):
+    store = _store(tmp_path, keep_per_evidence=0, min_age_seconds=600)
+    young = _job(store, "a", 1, age_hours=0)
+    protected = _job(store, "a", 2, age_hours=100)
+    old = _job(store, "a", 3, age_hours=100)
+    store.collect_garbage(protect=[protected])
+    assert os.path.exists(young) and os.path.exists(protected) and not os.path.exists(old)
+
+
+def test_empty_evidence_folder_is_removed(tmp_path):
+    store = _store(tmp_path)
+    _job(store, "a", 1, age_hours=100)
+    store.collect_garbage()
+    assert not os.path.exists(tmp_path / "a")
+
+
+def test_result_links_to_collected_job_folder_are_expired(tmp_path):
+    store = _store(tmp_path, keep_per_evidence=1)
+    job = store.job_dir("a.mp4", 1)
+    result = {"previews": [{"crop_path": job.rel("crop.jpg")}]}
+    _job(store, "a", 1, age_hours=5)
+    _job(store, "a", 2, age_hours=1)
+    assert not store.expired("a.mp4", 1, result)
+    store.collect_garbage()
+    assert store.expired("a.mp4", 1, result)
+    assert not store.expired("a.mp4", 1, {"previews": []})  # nothing linked, nothing missing
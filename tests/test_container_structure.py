@@ -0,0 +1,120 @@
+import sqlite3
+import struct
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+import container_structure as cs
+
+FRAMES = 300
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    """A short MP4 as written by OpenCV's ffmpeg backend."""
+    path = str(tmp_path_factory.mktemp("clips") / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (64, 48))
+    for i in range(FRAMES):
+        writer.write(np.full((48, 64, 3), i % 255, np.uint8))
+    writer.release()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def _with_keyframes(data, keys):
+    """Rewrite the stss table in place (never longer than the original)."""
+    data = bytearray(data)
+    at = data.find(b"stss")
+    assert len(keys) <= struct.unpack_from(">I", data, at + 8)[0]
+    struct.pack_into(">I", data, at + 8, len(keys))
+    struct.pack_into(f">{len(keys)}I", data, at + 12, *keys)
+    return bytes(data)
+
+
+def _analyze(tmp_path, data, name="ev.mp4"):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return cs.analyze(str(path))
+
+
+def _codes(summary):
+    return {f["code"] for f in summary["flags"]}
+
+
+def test_transcoded_file_needs_review(tmp_path, clip):
+    summary = _analyze(tmp_path, clip)
+    assert summary["format"] == "mp4"
+    assert summary["tracks"][0]["handler"] == "vide"
+    assert "editing_software" in _codes(summary)
+    assert summary["verdict"] == "Review recommended ⚠️"
+
+
+def test_regular_gop_is_not_flagged(tmp_path, clip):
+    keys = [1 + 30 * k for k in range(10)]
+    summary = _analyze(tmp_path, _with_keyframes(clip, keys))
+    assert summary["tracks"][0]["gop"]["nominal"] == 30
+    assert not _codes(summary) & {"irregular_gop", "adaptive_gop"}
+
+
+def test_spliced_gop_is_high_severity(tmp_path, clip):
+    keys = [1 + 30 * k for k in range(10)]
+    keys[4] = 112  # one short GOP in an otherwise fixed cadence
+    summary = _analyze(tmp_path, _with_keyframes(clip, keys))
+    flag = next(f for f in summary["flags"] if f["code"] == "irregular_gop")
+    assert flag["severity"] == "high"
+    assert summary["verdict"] == "Structural anomalies ❌"
+
+
+def test_truncated_file(tmp_path, clip):
+    moov = clip.find(b"moov") - 4
+    summary = _analyze(tmp_path, clip[:moov + 100])
+    assert "truncated" in _codes(summary)
+    assert summary["verdict"] == "Structural anomalies ❌"
+
+
+def test_missing_moov(tmp_path, clip):
+    summary = _analyze(tmp_path, clip[:clip.find(b"moov") - 4])
+    assert "no_moov" in _codes(summary)
+    assert summary["verdict"] == "Structural anomalies ❌"
+
+
+def test_other_containers_are_not_analysed(tmp_path):
+    summary = _analyze(tmp_path, b"RIFF\x00\x10\x00\x00AVI LIST" + bytes(64), name="ev.avi")
+    assert _codes(summary) == {"not_iso_bmff"}
+    assert summary["verdict"] == cs.NOT_ANALYSED
+
+
+def test_analyze_and_store_round_trip(tmp_path, clip):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    for statement in cs.CONTAINER_SCHEMA:
+        conn.execute(statement)
+    path = tmp_path / "ev.mp4"
+    path.write_bytes(clip)
+    summary = cs.analyze_and_store(conn, "ev.mp4", str(path), "abc")
+    loaded = cs.load(conn, "ev.mp4")
+    assert loaded["verdict"] == summary["verdict"] and loaded["sha256"] == "abc"
+    cs.delete(conn, "ev.mp4")
+    assert cs.load(conn, "ev.mp4") is None
+
+
+def _with_mvhd_times(data, created, modified):
+    data = bytearray(data)
+    at = data.find(b"mvhd")
+    assert data[at + 4] == 0  # version 0: 32-bit times after version/flags
+    struct.pack_into(">II", data, at + 8, created, modified)
+    return bytes(data)
+
+
+def test_header_closed_after_recording_is_not_flagged(tmp_path, clip):
+    created = 3_800_000_000
+    summary = _analyze(tmp_path, _with_mvhd_times(clip, created, created + FRAMES // 30))
+    assert "modified_after_creation" not in _codes(summary)
+
+
+def test_header_modified_long_after_recording_is_flagged(tmp_path, clip):
+    created = 3_800_000_000
+    summary = _analyze(tmp_path, _with_mvhd_times(clip, created, created + 3600))
+    assert "modified_after_creation" in _codes(summary)
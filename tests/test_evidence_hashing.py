@@ -0,0 +1,134 @@
+import hashlib
+import sqlite3
+
+import evidence_hashing as eh
+
+SEG = 1024
+
+
+def _conn():
+    conn = sqlite3.connect(":memory:")
+    for statement in eh.SEGMENT_SCHEMA:
+        conn.execute(statement)
+    return conn
+
+
+def _write(path, data):
+    path.write_bytes(data)
+    return str(path)
+
+
+def _data(n):
+    return bytes(i % 251 for i in range(n))
+
+
+def _baseline(conn, path, name="ev.mp4"):
+    digest, size, segments = eh.hash_file_segments(path, segment_size=SEG)
+    eh.store_segments(conn, name, size, segments, segment_size=SEG)
+    return digest, segments
+
+
+# ======================================================
+#                     MERKLE ROOT
+# ======================================================
+def test_merkle_root_empty_and_single_leaf():
+    assert eh.merkle_root([]) == hashlib.sha256(b"").hexdigest()
+    leaf = hashlib.sha256(b"x").hexdigest()
+    assert eh.merkle_root([leaf]) == hashlib.sha256(b"\x00" + bytes.fromhex(leaf)).hexdigest()
+
+
+def test_merkle_root_promotes_unpaired_node():
+    leaves = [hashlib.sha256(bytes([i])).hexdigest() for i in range(3)]
+    h = [hashlib.sha256(b"\x00" + bytes.fromhex(d)).digest() for d in leaves]
+    pair = hashlib.sha256(b"\x01" + h[0] + h[1]).digest()
+    assert eh.merkle_root(leaves) == hashlib.sha256(b"\x01" + pair + h[2]).hexdigest()
+
+
+def test_merkle_root_depends_on_order():
+    leaves = [hashlib.sha256(bytes([i])).hexdigest() for i in range(4)]
+    assert eh.merkle_root(leaves) != eh.merkle_root(leaves[::-1])
+
+
+def test_segment_hasher_matches_whole_file_hash_for_any_chunking():
+    data = _data(5 * SEG + 17)
+    for chunk in (1, 100, SEG, 3 * SEG):
+        hasher = eh.SegmentHasher(SEG)
+        for i in range(0, len(data), chunk):
+            hasher.update(data[i:i + chunk])
+        assert hasher.hexdigest() == hashlib.sha256(data).hexdigest()
+        assert hasher.size == len(data)
+        assert hasher.segments()[-1] == hashlib.sha256(data[5 * SEG:]).hexdigest()
+        assert len(hasher.segments()) == 6
+
+
+# ======================================================
+#                  SEGMENT DIFF VERDICTS
+# ======================================================
+def test_diff_segments_unchanged_file_matches(tmp_path):
+    conn = _conn()
+    path = _write(tmp_path / "ev.mp4", _data(4 * SEG))
+    _baseline(conn, path)
+    diff = eh.diff_segments(conn, "ev.mp4", path)
+    assert diff["match"] and not diff["changed_ranges"] and not diff["size_changed"]
+
+
+def test_diff_segments_localises_modified_bytes(tmp_path):
+    conn = _conn()
+    data = bytearray(_data(6 * SEG))
+    path = _write(tmp_path / "ev.mp4", bytes(data))
+    _baseline(conn, path)
+
+    data[2 * SEG + 5] ^= 0xFF
+    data[3 * SEG + 1] ^= 0xFF
+    _write(tmp_path / "ev.mp4", bytes(data))
+    diff = eh.diff_segments(conn, "ev.mp4", path)
+    assert not diff["match"]
+    assert diff["changed_ranges"] == [
+        {"first_segment": 2, "last_segment": 3, "start": 2 * SEG, "end": 4 * SEG - 1}
+    ]
+    assert not diff["size_changed"]
+
+
+def test_diff_segments_reports_truncation(tmp_path):
+    conn = _conn()
+    data = _data(4 * SEG)
+    path = _write(tmp_path / "ev.mp4", data)
+    _baseline(conn, path)
+    _write(tmp_path / "ev.mp4", data[:2 * SEG + 10])
+    diff = eh.diff_segments(conn, "ev.mp4", path)
+    assert diff["size_changed"] and not diff["match"]
+    assert diff["changed_ranges"][0]["first_segment"] == 2
+    assert diff["changed_ranges"][-1]["last_segment"] == 3
+
+
+def test_diff_segments_without_baseline_is_none(tmp_path):
+    path = _write(tmp_path / "ev.mp4", _data(10))
+    assert eh.diff_segments(_conn(), "ev.mp4", path) is None
+
+
+def test_spot_check_flags_only_modified_segment(tmp_path):
+    conn = _conn()
+    data = bytearray(_data(4 * SEG))
+    path = _write(tmp_path / "ev.mp4", bytes(data))
+    _baseline(conn, path)
+    data[SEG] ^= 0xFF
+    _write(tmp_path / "ev.mp4", bytes(data))
+    results = eh.spot_check(conn, "ev.mp4", path, indices=[0, 1, 2, 3])
+    assert [r["ok"] for r in results] == [True, False, True, True]
+    assert eh.spot_check(conn, "ev.mp4", path, samples=0) == []
+    assert eh.spot_check(conn, "ev.mp4", path, samples=-1) == []
+
+
+# ======================================================
+#                   BATCH VERIFICATION
+# ======================================================
+def test_verify_many_reports_missing_files(tmp_path):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    conn.execute(eh.VERIFICATION_SCHEMA)
+    path = _write(tmp_path / "ok.mp4", _data(3 * SEG))
+    files = [("ok.mp4", path), ("gone.mp4", str(tmp_path / "gone.mp4"))]
+    results = {r["filename"]: r for r in eh.verify_many(conn, files)}
+    assert set(results) == {"ok.mp4", "gone.mp4"}
+    assert results["ok.mp4"]["sha256"] == hashlib.sha256(_data(3 * SEG)).hexdigest()
+    assert "error" in results["gone.mp4"] and "sha256" not in results["gone.mp4"]
@@ -0,0 +1,104 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from frame_pipeline import Analyzer, AtFrames, EveryNFrames, FramePipeline
+
+FRAMES = 90
+
+
+@pytest.fixture(scope="module")
+def clip(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("clips") / "clip.mp4")
+    writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*"mp4v"), 30, (64, 48))
+    for i in range(FRAMES):
+        writer.write(np.full((48, 64, 3), i, np.uint8))
+    writer.release()
+    return path
+
+
+class Recorder(Analyzer):
+    def __init__(self, name, policy):
+        self.name = name
+        self.policy = policy
+        self.seen = []
+        self.finished = False
+
+    def process(self, index, data):
+        self.seen.append(index)
+
+    def finish(self):
+        self.finished = True
+        return list(self.seen)
+
+
+class Stop(Exception):
+    pass
+
+
+def test_each_analyzer_gets_its_own_frames(clip):
+    pipeline = FramePipeline(clip)
+    every = pipeline.register(Recorder("every", EveryNFrames(10)))
+    some = pipeline.register(Recorder("some", AtFrames([5, 60])))
+    results = pipeline.run()
+    assert results == {"every": list(range(0, FRAMES, 10)), "some": [5, 60]}
+    assert every.finished and some.finished
+    assert pipeline.stats["retrieved"] == len(set(results["every"]) | {5, 60})
+
+
+def test_exception_in_progress_skips_finish(clip):
+    def progress(done, total):
+        raise Stop()
+
+    pipeline = FramePipeline(clip)
+    recorder = pipeline.register(Recorder("every", EveryNFrames(1)))
+    with pytest.raises(Stop):
+        pipeline.run(progress=progress)
+    assert not recorder.finished
+
+
+def test_analyzer_error_is_raised(clip):
+    class Broken(Recorder):
+        def process(self, index, data):
+            raise ValueError("bad frame")
+
+    pipeline = FramePipeline(clip)
+    pipeline.register(Broken("broken", EveryNFrames(1)))
+    healthy = pipeline.register(Recorder("healthy", EveryNFrames(30)))
+    with pytest.raises(ValueError):
+        pipeline.run()
+    assert healthy.seen == [0, 30, 60]
+
+
+def test_idle_is_called_when_no_frame_arrives_in_time():
+    import threading
+    from frame_pipeline import _AnalyzerRunner, _END
+
+    class Batching(Recorder):
+        def __init__(self):
+            super().__init__("batching", EveryNFrames(1))
+            self.pending = []
+            self.flushed = threading.Event()
+
+        def process(self, index, data):
+            self.pending.append(index)
+
+        def wait_timeout(self):
+            return 0.05 if self.pending else None
+
+        def idle(self):
+            self.seen.extend(self.pending)
+            self.pending = []
+            self.flushed.set()
+
+    analyzer = Batching()
+    runner = _AnalyzerRunner(analyzer)
+    runner.start()
+    runner.inbox.put((7, None))
+    # Flushed while the runner is still waiting for more frames
+    assert analyzer.flushed.wait(5)
+    assert analyzer.seen == [7]
+    runner.inbox.put(_END)
+    runner.join(5)
+    assert runner.result == [7] and runner.error is None
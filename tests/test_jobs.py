@@ -0,0 +1,57 @@
+import sqlite3
+
+import pytest
+
+import jobs
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    monkeypatch.setitem(jobs.TASKS, "noop", lambda job: None)
+    conn = sqlite3.connect(":memory:", isolation_level=None)
+    conn.row_factory = sqlite3.Row
+    for statement in (jobs.JOBS_SCHEMA, jobs.JOBS_WORKER_HOST_COLUMN, jobs.JOBS_ATTEMPTS_COLUMN):
+        conn.execute(statement)
+    return conn
+
+
+def _status(conn, job_id):
+    return jobs.get_job(conn, job_id)["status"]
+
+
+def test_claim_counts_attempts(conn):
+    job_id = jobs.enqueue(conn, "noop", {})
+    job = jobs.claim_next(conn)
+    assert job["id"] == job_id and job["status"] == jobs.RUNNING
+    assert job["attempts"] == 1 and job["worker_host"] == jobs.WORKER_HOST
+    assert jobs.claim_next(conn) is None
+
+
+def test_job_of_a_live_worker_is_left_running(conn):
+    job_id = jobs.enqueue(conn, "noop", {})
+    jobs.claim_next(conn)  # claimed by this (live) process
+    assert jobs.requeue_orphans(conn) == 0
+    assert _status(conn, job_id) == jobs.RUNNING
+
+
+def test_job_claimed_on_another_host_is_left_running(conn, monkeypatch):
+    job_id = jobs.enqueue(conn, "noop", {})
+    jobs.claim_next(conn)
+    conn.execute("UPDATE jobs SET worker_host='other-node'")
+    monkeypatch.setattr(jobs, "_pid_alive", lambda pid: False)
+    assert jobs.requeue_orphans(conn) == 0
+    assert _status(conn, job_id) == jobs.RUNNING
+
+
+def test_job_that_keeps_killing_its_worker_is_failed(conn, monkeypatch):
+    monkeypatch.setattr(jobs, "_pid_alive", lambda pid: False)  # every worker "crashed"
+    job_id = jobs.enqueue(conn, "noop", {})
+    for attempt in (1, 2):
+        assert jobs.claim_next(conn)["attempts"] == attempt
+        assert jobs.requeue_orphans(conn, max_attempts=3) == 1
+        assert _status(conn, job_id) == jobs.QUEUED
+    jobs.claim_next(conn)
+    assert jobs.requeue_orphans(conn, max_attempts=3) == 0
+    job = jobs.get_job(conn, job_id)
+    assert job["status"] == jobs.FAILED and "3 times" in job["error"]
+    assert jobs.claim_next(conn) is None
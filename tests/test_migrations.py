@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("pytesseract")
+
+import migrations
+
+
+def _conn():
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    return conn
+
+
+def _tables(conn):
+    return {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+def test_applies_in_order_and_records_versions():
+    conn = _conn()
+    order = []
+    steps = [
+        (1, "one", ["CREATE TABLE a (x)", lambda c: order.append(1)]),
+        (2, "two", [lambda c: order.append(2), "CREATE TABLE b (x)"]),
+    ]
+    assert migrations.migrate(conn, steps) == 2
+    assert order == [1, 2]
+    assert {"a", "b"} <= _tables(conn)
+    assert [r[0] for r in conn.execute("SELECT version FROM schema_version ORDER BY version")] == [1, 2]
+
+
+def test_skips_already_applied_versions():
+    conn = _conn()
+    calls = []
+    steps = [(1, "one", [lambda c: calls.append(1)])]
+    migrations.migrate(conn, steps)
+    steps.append((2, "two", [lambda c: calls.append(2)]))
+    assert migrations.migrate(conn, steps) == 2
+    assert migrations.migrate(conn, steps) == 2
+    assert calls == [1, 2]
+
+
+def test_failed_migration_rolls_back_entirely():
+    conn = _conn()
+    steps = [
+        (1, "one", ["CREATE TABLE a (x)"]),
+        (2, "broken", ["CREATE TABLE b (x)", "INSERT INTO missing VALUES (1)"]),
+    ]
+    with pytest.raises(sqlite3.OperationalError):
+        migrations.migrate(conn, steps)
+    # Nothing of the run survives, not even migration 1 from the same transaction
+    assert "b" not in _tables(conn)
+    assert "a" not in _tables(conn)
+    assert migrations.current_version(conn) == 0
+
+
+def test_real_schema_migrates_from_scratch_and_is_idempotent():
+    conn = _conn()
+    latest = max(v for v, _, _ in migrations.MIGRATIONS)
+    assert migrations.migrate(conn) == latest
+    assert migrations.migrate(conn) == latest
+    assert {"uploads", "jobs", "tamper_segments", "camera_profiles", "container_structure"} <= _tables(conn)
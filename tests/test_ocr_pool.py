@@ -0,0 +1,83 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("pytesseract")
+
+import ocr_pool
+
+
+def _describe(task, images, config):
+    # Stand-in recogniser: enough to tell every crop apart
+    return [f"{task}:{config}:{img.shape}:{int(img.sum())}" for img in images]
+
+
+def _crops(n):
+    rng = np.random.default_rng(0)
+    # Mixed sizes so chunk offsets into the shared block are all different
+    return [(rng.random((10 + i % 7, 30 + 3 * i)) * 255).astype(np.uint8) for i in range(n)]
+
+
+def test_pack_and_run_chunk_round_trip(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "_recognise", lambda task, images, config: images)
+    crops = _crops(9)
+    shm, layout = ocr_pool._pack(crops)
+    try:
+        images = ocr_pool._run_chunk("text", shm.name, layout[3:7], None)
+    finally:
+        shm.close()
+        shm.unlink()
+    assert len(images) == 4
+    for got, want in zip(images, crops[3:7]):
+        assert np.array_equal(got, want)
+
+
+def test_pool_returns_results_in_input_order(monkeypatch):
+    # fork so the workers inherit the patched recogniser
+    monkeypatch.setattr(ocr_pool, "OCR_POOL_START_METHOD", "fork")
+    monkeypatch.setattr(ocr_pool, "OCR_POOL_CHUNKS_PER_WORKER", 3)
+    monkeypatch.setattr(ocr_pool, "_recognise", _describe)
+    monkeypatch.setattr(ocr_pool, "_init_worker", lambda: None)
+    crops = _crops(25)
+    pool = ocr_pool.OcrPool(2)
+    try:
+        assert pool.map("text", crops, "cfg") == _describe("text", crops, "cfg")
+        assert pool.batches == 1 and pool.crops == 25
+    finally:
+        pool.shutdown()
+
+
+def test_pool_rejects_colour_crops():
+    pool = ocr_pool.OcrPool.__new__(ocr_pool.OcrPool)
+    with pytest.raises(ValueError):
+        pool.map("text", [np.zeros((4, 4, 3), np.uint8)])
+
+
+def test_small_batches_stay_in_process(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "_recognise", _describe)
+    monkeypatch.setattr(ocr_pool, "get_pool", lambda: pytest.fail("pool used for a small batch"))
+    crops = _crops(ocr_pool.OCR_POOL_MIN_BATCH - 1)
+    assert ocr_pool.readtext_batch(crops, "cfg") == _describe("text", crops, "cfg")
+    assert ocr_pool.readtext_batch([]) == []
+
+
+@pytest.mark.parametrize("cores, job_workers, expected", [
+    (16, 2, 4),  # capped at OCR_WORKERS_MAX
+    (8, 2, 4),
+    (6, 2, 3),
+    (4, 4, 0),  # one core each: no pool
+    (2, 1, 2),
+])
+def test_job_worker_default_is_a_bounded_share_of_the_cores(monkeypatch, cores, job_workers, expected):
+    monkeypatch.setattr(ocr_pool, "_OCR_WORKERS_ENV", "")
+    monkeypatch.setattr(ocr_pool, "OCR_WORKERS_MAX", 4)
+    monkeypatch.setattr(ocr_pool, "OCR_WORKERS", 0)
+    monkeypatch.setattr(ocr_pool.os, "cpu_count", lambda: cores)
+    assert ocr_pool.use_job_worker_default(job_workers) == expected
+    assert ocr_pool.OCR_WORKERS == expected
+
+
+def test_explicit_ocr_workers_wins(monkeypatch):
+    monkeypatch.setattr(ocr_pool, "_OCR_WORKERS_ENV", "1")
+    monkeypatch.setattr(ocr_pool, "OCR_WORKERS", 1)
+    monkeypatch.setattr(ocr_pool.os, "cpu_count", lambda: 64)
+    assert ocr_pool.use_job_worker_default(2) == 1
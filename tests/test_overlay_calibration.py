@@ -0,0 +1,108 @@
+import sqlite3
+
+import pytest
+
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("pytesseract")
+
+import migrations
+import overlay_calibration as oc
+from analyzers import TIMESTAMP_ROI, SPEED_ROI
+
+SIGNATURE = "1920x1080@30/avc1"
+META = {"width": 1920, "height": 1080, "fps": 30, "codec": "avc1"}
+CALIBRATED = {"y": [0.9, 0.95], "x": [0.6, 0.95]}
+OTHER_BRAND = {"y": [0.02, 0.07], "x": [0.05, 0.4]}
+
+HIT = [{"confidence": 0}, {"confidence": 100}]
+MISS = [{"confidence": 0}, {"confidence": 0}]
+
+
+@pytest.fixture
+def conn(monkeypatch):
+    conn = sqlite3.connect(":memory:")
+    conn.row_factory = sqlite3.Row
+    migrations.migrate(conn)
+    monkeypatch.setattr(oc, "camera_signature", lambda path: (SIGNATURE, META))
+    monkeypatch.setattr(oc, "OVERLAY_CALIBRATION", True)
+    monkeypatch.setattr(oc, "reads_timestamp", lambda path, roi: True)
+    oc.save_profile(conn, SIGNATURE, META, CALIBRATED, SPEED_ROI, "calibrated", "first.mp4")
+    return conn
+
+
+def _calibrates_to(monkeypatch, roi):
+    result = None if roi is None else {"timestamp_roi": roi, "speed_roi": SPEED_ROI, "candidates": []}
+    monkeypatch.setattr(oc, "calibrate", lambda path: result)
+
+
+def test_reading_clears_misses(conn, monkeypatch):
+    conn.execute("UPDATE camera_profiles SET misses=2")
+    profile = oc.get_profile(conn, SIGNATURE)
+    monkeypatch.setattr(oc, "calibrate", lambda path: pytest.fail("recalibrated after a good read"))
+    assert oc.retry_profile(conn, profile, "clip.mp4", HIT) is None
+    assert oc.get_profile(conn, SIGNATURE)["misses"] == 0
+
+
+def test_miss_recalibrates_on_this_clip(conn, monkeypatch):
+    _calibrates_to(monkeypatch, OTHER_BRAND)
+    retry = oc.retry_profile(conn, oc.get_profile(conn, SIGNATURE), "/x/other.mp4", MISS)
+    assert retry["timestamp_roi"] == OTHER_BRAND and retry["source"] == "calibrated"
+    stored = oc.get_profile(conn, SIGNATURE)
+    assert stored["timestamp_roi"] == OTHER_BRAND and stored["calibrated_from"] == "other.mp4"
+    assert stored["misses"] == 0  # a fresh calibration starts clean
+
+
+def test_miss_without_new_overlay_falls_back_to_defaults(conn, monkeypatch):
+    _calibrates_to(monkeypatch, None)
+    retry = oc.retry_profile(conn, oc.get_profile(conn, SIGNATURE), "/x/other.mp4", MISS)
+    assert retry["timestamp_roi"] == TIMESTAMP_ROI and retry["source"] == "default"
+    stored = oc.get_profile(conn, SIGNATURE)
+    assert stored["misses"] == 1 and stored["last_miss"] == "other.mp4"
+    assert stored["source"] == "stale" and stored["timestamp_roi"] == CALIBRATED
+
+
+def test_stale_profile_is_recalibrated_after_backoff(conn, monkeypatch):
+    monkeypatch.setattr(oc, "CALIBRATION_RETRY_CLIPS", 2)
+    _calibrates_to(monkeypatch, None)
+    oc.retry_profile(conn, oc.get_profile(conn, SIGNATURE), "other.mp4", MISS)
+    monkeypatch.setattr(oc, "calibrate", lambda path: pytest.fail("calibrated during backoff"))
+    for name in ("next.mp4", "later.mp4"):
+        profile = oc.profile_for_video(conn, name)
+        assert profile["source"] == "stale" and profile["timestamp_roi"] == CALIBRATED
+    _calibrates_to(monkeypatch, CALIBRATED)
+    profile = oc.profile_for_video(conn, "third.mp4")
+    assert profile["source"] == "calibrated" and profile["misses"] == 0
+    assert profile["clips_since_calibration"] == 0
+
+
+def test_default_profile_backs_off_calibration(conn, monkeypatch):
+    monkeypatch.setattr(oc, "CALIBRATION_RETRY_CLIPS", 3)
+    conn.execute("DELETE FROM camera_profiles")
+    calls = []
+    monkeypatch.setattr(oc, "calibrate", lambda path: calls.append(path))
+    for i in range(5):
+        assert oc.profile_for_video(conn, f"clip{i}.mp4")["source"] == "default"
+    assert calls == ["clip0.mp4", "clip4.mp4"]
+
+
+def test_stale_profile_miss_falls_back_without_recalibrating(conn, monkeypatch):
+    conn.execute("UPDATE camera_profiles SET source='stale'")
+    monkeypatch.setattr(oc, "calibrate", lambda path: pytest.fail("recalibrated a stale profile"))
+    retry = oc.retry_profile(conn, oc.get_profile(conn, SIGNATURE), "clip.mp4", MISS)
+    assert retry["timestamp_roi"] == TIMESTAMP_ROI and retry["source"] == "default"
+
+
+def test_retry_rois_that_read_nothing_on_samples_are_not_rerun(conn, monkeypatch):
+    _calibrates_to(monkeypatch, OTHER_BRAND)
+    monkeypatch.setattr(oc, "reads_timestamp", lambda path, roi: False)
+    assert oc.retry_profile(conn, oc.get_profile(conn, SIGNATURE), "other.mp4", MISS) is None
+    stored = oc.get_profile(conn, SIGNATURE)
+    assert stored["source"] == "stale" and stored["timestamp_roi"] == CALIBRATED
+
+
+def test_miss_on_default_rois_is_only_recorded(conn, monkeypatch):
+    oc.save_profile(conn, SIGNATURE, META, TIMESTAMP_ROI, SPEED_ROI, "default", "clip.mp4")
+    monkeypatch.setattr(oc, "calibrate", lambda path: pytest.fail("calibration retried"))
+    assert oc.retry_profile(conn, oc.get_profile(conn, SIGNATURE), "clip.mp4", MISS) is None
+    assert oc.get_profile(conn, SIGNATURE)["misses"] == 1
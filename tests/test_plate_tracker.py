@@ -0,0 +1,86 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+
+from plate_tracker import PlateTracker, iou
+
+
+def _detection(x, y, sharpness=0, conf=0.9):
+    crop = np.zeros((20, 60), np.uint8)
+    crop[1::2, ::2] = sharpness  # checkerboard: higher = sharper crop
+    return (x, y, x + 60, y + 20), conf, crop
+
+
+class Reader:
+    """Fake batch OCR: text by frame index, recording each batch's frames."""
+
+    def __init__(self, texts):
+        self.texts = texts
+        self.batches = []
+
+    def __call__(self, items):
+        self.batches.append([frame for _, frame, _ in items])
+        return [self.texts.get(frame, "") for _, frame, _ in items]
+
+
+def test_iou():
+    assert iou((0, 0, 10, 10), (0, 0, 10, 10)) == 1.0
+    assert iou((0, 0, 10, 10), (20, 20, 30, 30)) == 0.0
+    assert abs(iou((0, 0, 10, 10), (5, 0, 15, 10)) - 1 / 3) < 1e-9
+
+
+def test_moving_plate_becomes_one_track_with_voted_reading():
+    reader = Reader({0: "ABC123", 1: "ABC123", 2: "A8C123", 3: "ABC123"})
+    tracker = PlateTracker(reader, max_crops=4, max_misses=1)
+    for frame in range(4):
+        tracker.update(frame, [_detection(100 + 5 * frame, 50)])
+    tracks = tracker.close()
+    assert len(tracks) == 1
+    assert tracks[0]["plate_text"] == "ABC123" and tracks[0]["votes"] == 3
+    assert tracks[0]["hits"] == 4
+    assert (tracks[0]["first_frame"], tracks[0]["last_frame"]) == (0, 3)
+
+
+def test_separate_vehicles_get_separate_tracks():
+    tracker = PlateTracker(Reader({}), max_misses=1)
+    for frame in range(3):
+        tracker.update(frame, [_detection(10, 10), _detection(400, 300)])
+    tracks = tracker.close()
+    assert [t["track_id"] for t in tracks] == [1, 2]
+    assert all(t["hits"] == 3 for t in tracks)
+
+
+def test_track_ends_after_misses_and_new_track_starts():
+    tracker = PlateTracker(Reader({}), max_misses=1)
+    tracker.update(0, [_detection(10, 10)])
+    tracker.update(1, [])
+    tracker.update(2, [])  # second miss: retired
+    tracker.update(3, [_detection(10, 10)])
+    assert [t["track_id"] for t in tracker.close()] == [1, 2]
+
+
+def test_only_the_sharpest_crops_are_read():
+    reader = Reader({})
+    tracker = PlateTracker(reader, max_crops=2, max_misses=0)
+    for frame, sharpness in enumerate([10, 200, 30, 250, 20]):
+        tracker.update(frame, [_detection(10, 10, sharpness)])
+    tracker.close()
+    assert reader.batches == [[3, 1]]  # best first
+    assert tracker.ocr_calls == 2
+
+
+def test_ended_tracks_are_read_in_batches():
+    reader = Reader({})
+    tracker = PlateTracker(reader, max_crops=2, max_misses=0, ocr_batch=4)
+    # Three short tracks, one after another, each seen on 3 frames
+    for t in range(3):
+        for k in range(3):
+            tracker.update(t * 10 + k, [_detection(10 + 300 * t, 10)])
+        tracker.update(t * 10 + 5, [])
+        if t == 0:
+            assert reader.batches == []  # 2 crops waiting, below the batch size
+    tracker.close()
+    # The first batch fires once 4 crops wait; close() reads the rest
+    assert [len(b) for b in reader.batches] == [4, 2]
+    assert tracker.ocr_calls == 6
@@ -0,0 +1,124 @@
+import pytest
+
+pytest.importorskip("dotenv")
+pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("pytesseract")
+
+import repository
+
+
+@pytest.fixture
+def repo():
+    repo = repository.create_repository(backend="memory")
+    assert repo.backend.owns_schema
+    repo.init_schema()
+    yield repo
+    repo.close()
+
+
+def test_app_connection_backend_leaves_schema_to_the_app():
+    backend = repository.SQLiteBackend(acquire=lambda: None)
+    assert not backend.owns_schema
+
+
+def test_memory_databases_are_private():
+    first = repository.create_repository(backend="memory")
+    second = repository.create_repository(backend="memory")
+    first.init_schema()
+    second.init_schema()
+    first.add_upload("a.mp4", "aa")
+    assert second.list_uploads() == []
+    first.close()
+    second.close()
+
+
+def test_upload_records_first_baseline_only(repo):
+    assert repo.add_upload("a.mp4", "aa", uploaded_at="2024-01-01 10:00:00")
+    assert not repo.add_upload("a.mp4", "bb")
+    repo.add_upload("b.mp4", "cc", uploaded_at="2024-01-02 10:00:00")
+    assert repo.baseline("a.mp4") == "aa"
+    assert [u["filename"] for u in repo.list_uploads()] == ["b.mp4", "a.mp4"]
+    assert repo.get_upload("a.mp4")["uploaded_at"] == "2024-01-01 10:00:00"
+    assert repo.get_upload("missing.mp4") is None
+
+
+def test_set_baseline_replaces_hash(repo):
+    repo.add_upload("a.mp4", "aa")
+    repo.set_baseline("a.mp4", "bb")
+    repo.set_baseline("new.mp4", "cc")
+    assert repo.baselines() == {"a.mp4": "bb", "new.mp4": "cc"}
+
+
+def test_tamper_status_is_one_row_per_file(repo):
+    repo.record_tamper_status("a.mp4", "Tampered ❌")
+    repo.record_tamper_status("a.mp4", "Original ✅")
+    statuses = repo.tamper_statuses("a.mp4")
+    assert [s["tamper_status"] for s in statuses] == ["Original ✅"]
+    assert statuses[0]["checked_at"]
+
+
+def test_timestamp_and_plate_results_upsert(repo):
+    repo.save_timestamp_summary("a.mp4", "2024-01-01 10:00:00", 80, 0.9, 0, 120)
+    repo.save_timestamp_summary("a.mp4", "2024-01-01 10:00:05", 90, 0.95, 1, 150)
+    summary = repo.timestamp_summary("a.mp4")
+    assert summary["confidence"] == 90 and summary["frame_count"] == 150
+    repo.save_plate_result("a.mp4", "ABC123", 0.8)
+    assert [r["plate_text"] for r in repo.plate_results("a.mp4")] == ["ABC123"]
+
+
+def test_delete_evidence_removes_every_record(repo):
+    repo.add_upload("a.mp4", "aa")
+    repo.record_tamper_status("a.mp4", "Original ✅")
+    repo.save_timestamp_summary("a.mp4", "x", 80, 0.9, 0, 1)
+    repo.save_plate_result("a.mp4", "ABC123", 0.8)
+    assert repo.counts() == {"uploads": 1, "timestamps": 1, "tampers": 1}
+    repo.delete_evidence("a.mp4")
+    assert repo.counts() == {"uploads": 0, "timestamps": 0, "tampers": 0}
+    assert repo.baseline("a.mp4") is None and repo.plate_results("a.mp4") == []
+
+
+def test_failed_transaction_rolls_back(repo):
+    with pytest.raises(RuntimeError):
+        with repo.transaction() as cur:
+            cur.execute("INSERT INTO uploads (filename, uploaded_at) VALUES ('a.mp4', '2024-01-01')")
+            raise RuntimeError("boom")
+    assert repo.list_uploads() == []
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError):
+        repository.create_repository(backend="oracle")
+
+
+@pytest.fixture
+def shared(tmp_path):
+    import sqlite3
+    import db_pool
+    import migrations
+
+    conn = sqlite3.connect(str(tmp_path / "dashcam.db"))
+    migrations.migrate(conn)
+    repo = repository.Repository(repository.SQLiteBackend(acquire=lambda: db_pool.SharedConnection(None, conn)))
+    yield conn, repo
+    conn.close()
+
+
+def test_shared_connection_writes_are_left_to_the_caller(shared):
+    conn, repo = shared
+    conn.execute("INSERT INTO uploads (filename, uploaded_at) VALUES ('pending.mp4', '2024-01-01')")
+    repo.set_baseline("a.mp4", "aa")
+    assert conn.in_transaction
+    conn.rollback()
+    assert repo.baseline("a.mp4") is None and repo.list_uploads() == []
+
+
+def test_shared_connection_failure_keeps_callers_pending_writes(shared):
+    conn, repo = shared
+    conn.execute("INSERT INTO uploads (filename, uploaded_at) VALUES ('pending.mp4', '2024-01-01')")
+    with pytest.raises(RuntimeError):
+        with repo.transaction() as cur:
+            cur.execute("INSERT INTO uploads (filename, uploaded_at) VALUES ('a.mp4', '2024-01-01')")
+            raise RuntimeError("boom")
+    conn.commit()
+    assert [u["filename"] for u in repo.list_uploads()] == ["pending.mp4"]
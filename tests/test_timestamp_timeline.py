@@ -0,0 +1,86 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("cv2")
+pytest.importorskip("pytesseract")
+
+from timestamp_timeline import analyze_timeline, parse_timestamp
+
+START = 1_700_000_000.0
+
+
+def _series(n=120, rate=1.0):
+    video = np.arange(n, dtype=float)
+    return list(range(0, n * 30, 30)), video, START + video * rate
+
+
+def test_parse_timestamp_formats():
+    assert parse_timestamp("2024/03/01 12:00:05") == parse_timestamp("2024-03-01 12:00:05")
+    # Day-first overlays, as score_timestamp_text() passes them on
+    assert parse_timestamp("01/03/2024 12:00:05") == parse_timestamp("2024-03-01 12:00:05")
+    assert parse_timestamp("01-03-2024 12:00:05") == parse_timestamp("2024-03-01 12:00:05")
+    assert parse_timestamp("garbage") is None
+    assert parse_timestamp("") is None
+
+
+def test_clean_clock_has_no_drift_or_anomalies():
+    frames, video, clock = _series()
+    result = analyze_timeline(frames, video, clock)
+    assert result["slope"] == pytest.approx(1.0)
+    assert not result["has_drift"]
+    assert result["anomalies"] == []
+
+
+def test_drifting_clock_is_measured():
+    frames, video, clock = _series(n=600, rate=1.01)  # 36 s/hour fast
+    result = analyze_timeline(frames, video, clock)
+    assert result["drift_per_hour"] == pytest.approx(36.0, rel=1e-6)
+    assert result["has_drift"]
+
+
+def test_forward_jump_is_flagged_without_faking_drift():
+    frames, video, clock = _series()
+    clock = clock.copy()
+    clock[60:] += 300  # five minutes cut out
+    result = analyze_timeline(frames, video, clock)
+    jumps = [a for a in result["anomalies"] if a["kind"] == "jump"]
+    assert len(jumps) == 1 and jumps[0]["start_frame"] == frames[59]
+    assert jumps[0]["magnitude"] == pytest.approx(300)
+    assert not result["has_drift"]
+
+
+def test_backwards_step_is_flagged():
+    frames, video, clock = _series()
+    clock = clock.copy()
+    clock[80:] -= 120
+    kinds = [a["kind"] for a in analyze_timeline(frames, video, clock)["anomalies"]]
+    assert "backwards" in kinds
+
+
+def test_frozen_clock_is_flagged():
+    frames, video, clock = _series()
+    clock = clock.copy()
+    clock[40:60] = clock[40]
+    frozen = [a for a in analyze_timeline(frames, video, clock)["anomalies"] if a["kind"] == "frozen"]
+    assert len(frozen) == 1 and frozen[0]["start_frame"] == frames[40]
+
+
+def test_isolated_ocr_misread_is_ignored():
+    frames, video, clock = _series()
+    clock = clock.copy()
+    clock[50] += 3600  # one bad read, not a clock event
+    result = analyze_timeline(frames, video, clock)
+    assert result["anomalies"] == []
+
+
+def test_unparsed_samples_are_skipped():
+    frames, video, clock = _series()
+    clock = clock.copy()
+    clock[::3] = np.nan
+    result = analyze_timeline(frames, video, clock)
+    assert result["parsed"] == 80 and result["anomalies"] == []
+
+
+def test_too_few_samples_returns_no_fit():
+    result = analyze_timeline([0, 1], [0.0, 1.0], [START, START + 1])
+    assert result["slope"] is None and result["anomalies"] == []
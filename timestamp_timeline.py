@@ -0,0 +1,310 @@
+"""
+Full-timeline timestamp analysis.
+
+The overlay clock is sampled across the whole clip (not just 5 frames),
+parsed to epoch seconds and fitted against video time with NumPy. The fit
+gives the clock drift; the residuals and step-to-step differences flag
+forward jumps, backwards steps and frozen clocks. All checks are
+vectorized, so an hour of footage at 1 sample/s is a few thousand points.
+"""
+import os
+import calendar
+from datetime import datetime
+
+import numpy as np
+
+import ocr_engines
+import ocr_pool
+from analyzers import (
+    score_timestamp_text, TIMESTAMP_ROI, BINARIZE_PARAMS, TIMESTAMP_TESSERACT_CONFIG
+)
+from overlay_roi import Binarizer, crop_roi
+from result_cache import cached_map
+from frame_pipeline import Analyzer, EverySeconds
+from roi_change import RoiChangeDetector, fill_forward
+
+
+# Sampling rate of the overlay clock (seconds of video between samples)
+TIMELINE_SAMPLE_SECONDS = float(os.environ.get("TIMELINE_SAMPLE_SECONDS", 1.0))
+# Crops are OCR'd in batches of this size while decoding continues
+TIMELINE_OCR_BATCH = int(os.environ.get("TIMELINE_OCR_BATCH", 32))
+
+# Clock error (s) beyond the fit that counts as a jump
+JUMP_THRESHOLD = float(os.environ.get("TIMELINE_JUMP_THRESHOLD", 2.0))
+# Clock unchanged for longer than this (s of video) counts as frozen
+FREEZE_THRESHOLD = float(os.environ.get("TIMELINE_FREEZE_THRESHOLD", 3.0))
+# Drift above this many seconds per hour sets has_drift
+DRIFT_THRESHOLD = float(os.environ.get("TIMELINE_DRIFT_THRESHOLD", 2.0))
+
+# Text accepted by analyzers.score_timestamp_text; slashed and dashed
+# dates with the year last are read day-first
+TIMESTAMP_FORMATS = [
+    "%Y-%m-%d %H:%M:%S",
+    "%Y/%m/%d %H:%M:%S",
+    "%d-%m-%Y %H:%M:%S",
+    "%d/%m/%Y %H:%M:%S",
+]
+
+
+# ======================================================
+#                   SCHEMA / STORAGE
+# ======================================================
+TIMELINE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS timestamp_drift (
+        filename TEXT PRIMARY KEY,
+        samples INTEGER,
+        parsed INTEGER,
+        slope REAL,
+        offset REAL,
+        drift_ppm REAL,
+        drift_per_hour REAL,
+        residual_std REAL,
+        has_drift INTEGER DEFAULT 0,
+        analyzed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS timestamp_anomalies (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        filename TEXT NOT NULL,
+        kind TEXT NOT NULL,
+        start_frame INTEGER,
+        end_frame INTEGER,
+        start_time REAL,
+        end_time REAL,
+        clock_before TEXT,
+        clock_after TEXT,
+        magnitude REAL
+    )
+    """,
+]
+
+
+def store_timeline(conn, filename, analysis):
+    """Replace the stored drift fit and anomaly segments for one video."""
+    cur = conn.cursor()
+    cur.execute("""
+        INSERT OR REPLACE INTO timestamp_drift
+        (filename, samples, parsed, slope, offset, drift_ppm, drift_per_hour, residual_std, has_drift, analyzed_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
+    """, (filename, analysis["samples"], analysis["parsed"], analysis["slope"], analysis["offset"],
+          analysis["drift_ppm"], analysis["drift_per_hour"], analysis["residual_std"],
+          int(analysis["has_drift"])))
+    cur.execute("DELETE FROM timestamp_anomalies WHERE filename=?", (filename,))
+    cur.executemany("""
+        INSERT INTO timestamp_anomalies
+        (filename, kind, start_frame, end_frame, start_time, end_time, clock_before, clock_after, magnitude)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, [(filename, a["kind"], a["start_frame"], a["end_frame"], a["start_time"], a["end_time"],
+           a["clock_before"], a["clock_after"], a["magnitude"]) for a in analysis["anomalies"]])
+    conn.commit()
+
+
+# ======================================================
+#                       PARSING
+# ======================================================
+def parse_timestamp(text):
+    """Overlay text -> epoch seconds (clock taken as UTC), or None."""
+    if not text:
+        return None
+    text = " ".join(text.replace("_", " ").split())
+    for fmt in TIMESTAMP_FORMATS:
+        try:
+            return float(calendar.timegm(datetime.strptime(text, fmt).timetuple()))
+        except ValueError:
+            continue
+    return None
+
+
+def format_epoch(epoch):
+    if epoch is None or np.isnan(epoch):
+        return None
+    return datetime.utcfromtimestamp(float(epoch)).strftime("%Y-%m-%d %H:%M:%S")
+
+
+# ======================================================
+#                  VECTORIZED ANALYSIS
+# ======================================================
+def analyze_timeline(frames, video_times, clock_times,
+                     jump_threshold=JUMP_THRESHOLD, freeze_threshold=FREEZE_THRESHOLD):
+    """
+    frames / video_times / clock_times are equal-length sequences; clock
+    values that failed to parse are NaN.
+
+    The clock rate is fitted by least squares over the continuous pieces
+    between discontinuities (one shared slope, one offset per piece), so a
+    single jump does not masquerade as drift. Returns the fit, the drift
+    (ppm and seconds per hour) and a list of anomaly segments.
+    """
+    frames = np.asarray(frames, dtype=np.int64)
+    video_t = np.asarray(video_times, dtype=np.float64)
+    clock_t = np.asarray(clock_times, dtype=np.float64)
+
+    result = {
+        "samples": int(len(frames)),
+        "parsed": int(np.count_nonzero(~np.isnan(clock_t))),
+        "slope": None, "offset": None,
+        "drift_ppm": None, "drift_per_hour": None, "residual_std": None,
+        "has_drift": False,
+        "anomalies": [],
+    }
+
+    valid = ~np.isnan(clock_t)
+    f, v, c = frames[valid], video_t[valid], clock_t[valid]
+    if len(v) < 3 or np.ptp(v) <= 0:
+        return result
+
+    # ===== DROP ISOLATED OCR MISREADS =====
+    # One bad sample shows up as a step out and an equal step back; only
+    # sustained departures are real clock events.
+    err = np.diff(c) - np.diff(v)
+    spike = ((np.abs(err[:-1]) > jump_threshold) & (np.abs(err[1:]) > jump_threshold)
+             & (np.abs(err[:-1] + err[1:]) <= jump_threshold))
+    keep = np.ones(len(c), dtype=bool)
+    keep[1:-1][spike] = False
+    f, v, c = f[keep], v[keep], c[keep]
+
+    dv = np.diff(v)
+    dc = np.diff(c)
+
+    # ===== FROZEN RUNS (identical consecutive readings) =====
+    change = np.flatnonzero(dc != 0)
+    run_starts = np.concatenate(([0], change + 1))
+    run_ends = np.concatenate((change, [len(c) - 1]))
+    run_spans = v[run_ends] - v[run_starts]
+    frozen_runs = run_spans > freeze_threshold
+    frozen = np.zeros(len(c), dtype=bool)
+    for s, e in zip(run_starts[frozen_runs], run_ends[frozen_runs]):
+        frozen[s:e + 1] = True
+
+    # ===== PIECEWISE FIT: SHARED SLOPE, OFFSET PER CONTINUOUS PIECE =====
+    breaks = (np.abs(dc - dv) > jump_threshold) | (dc < 0)
+    piece = np.concatenate(([0], np.cumsum(breaks)))
+    fit = ~frozen
+    if np.count_nonzero(fit) < 3:
+        return result
+    pieces = piece[fit]
+    counts = np.bincount(pieces)
+    v_mean = np.bincount(pieces, weights=v[fit]) / np.maximum(counts, 1)
+    c_mean = np.bincount(pieces, weights=c[fit]) / np.maximum(counts, 1)
+    vd = v[fit] - v_mean[pieces]
+    cd = c[fit] - c_mean[pieces]
+    denom = np.dot(vd, vd)
+    if denom <= 0:
+        return result
+    slope = np.dot(vd, cd) / denom
+    first = pieces[0]
+    offset = c_mean[first] - slope * v_mean[first]
+
+    result["slope"] = float(slope)
+    result["offset"] = float(offset)
+    result["drift_ppm"] = float((slope - 1.0) * 1e6)
+    result["drift_per_hour"] = float((slope - 1.0) * 3600.0)
+    result["residual_std"] = float(np.std(cd - slope * vd))
+    result["has_drift"] = abs(result["drift_per_hour"]) > DRIFT_THRESHOLD
+
+    anomalies = []
+
+    def segment(kind, i, j, magnitude):
+        anomalies.append({
+            "kind": kind,
+            "start_frame": int(f[i]), "end_frame": int(f[j]),
+            "start_time": float(v[i]), "end_time": float(v[j]),
+            "clock_before": format_epoch(c[i]), "clock_after": format_epoch(c[j]),
+            "magnitude": float(magnitude),
+        })
+
+    # ===== BACKWARDS STEPS / FORWARD JUMPS / FROZEN CLOCK =====
+    step_error = dc - dv * slope
+    for i in np.flatnonzero(dc < 0):
+        segment("backwards", i, i + 1, dc[i])
+    for i in np.flatnonzero((dc >= 0) & (step_error > jump_threshold)):
+        segment("jump", i, i + 1, step_error[i])
+    for s, e, span in zip(run_starts[frozen_runs], run_ends[frozen_runs], run_spans[frozen_runs]):
+        segment("frozen", s, e, span)
+
+    anomalies.sort(key=lambda a: (a["start_frame"], a["kind"]))
+    result["anomalies"] = anomalies
+    return result
+
+
+# ======================================================
+#                 PIPELINE ANALYZER
+# ======================================================
+class TimelineAnalyzer(Analyzer):
+    """
+    Samples the overlay clock every `sample_seconds` across the whole clip.
+    Crops that have not changed since the last OCR'd one reuse its reading.
+    """
+    name = "timeline"
+
+    def __init__(self, sample_seconds=None, batch_size=None, cache=None, roi=None):
+        self.cache = cache
+        self.overlay_roi = roi or TIMESTAMP_ROI
+        self.sample_seconds = sample_seconds or TIMELINE_SAMPLE_SECONDS
+        self.policy = EverySeconds(self.sample_seconds)
+        self.batch_size = max(1, batch_size or TIMELINE_OCR_BATCH)
+        self.queue_size = max(self.queue_size, self.batch_size)
+        self.frames = []
+        self.clock = []
+        self.texts = []
+        self.raws = []
+        self.change = RoiChangeDetector()
+        self.binarize = Binarizer()
+        self._pending = []
+        self._last_raw = ""
+
+    def roi(self, frame):
+        return crop_roi(frame, self.overlay_roi)
+
+    def process(self, idx, crop):
+        # None = unchanged since the last OCR'd crop
+        self._pending.append((idx, self.binarize(crop) if self.change.changed(crop) else None))
+        if len(self._pending) >= self.batch_size:
+            self._flush()
+
+    def _flush(self):
+        pending, self._pending = self._pending, []
+        changed = [(idx, c) for idx, c in pending if c is not None]
+        try:
+            texts = cached_map(
+                self.cache, "ocr", [(idx, self.overlay_roi) for idx, _ in changed],
+                {"pre": BINARIZE_PARAMS, "config": TIMESTAMP_TESSERACT_CONFIG},
+                ocr_engines.engine_version(),
+                lambda todo: ocr_pool.readtext_batch(
+                    [changed[i][1] for i in todo], tesseract_config=TIMESTAMP_TESSERACT_CONFIG
+                )
+            ) if changed else []
+        except Exception as e:
+            print(f"OCR error for timeline frames: {e}")
+            texts = [""] * len(changed)
+
+        texts = iter(texts)
+        readings = fill_forward(
+            [next(texts) if c is not None else None for _, c in pending], self._last_raw
+        )
+        if readings:
+            self._last_raw = readings[-1]
+
+        for (idx, _), raw in zip(pending, readings):
+            text, confidence = score_timestamp_text(raw.strip())
+            epoch = parse_timestamp(text) if confidence == 100 else None
+            self.frames.append(idx)
+            self.texts.append(text)
+            self.raws.append(raw.strip())
+            self.clock.append(np.nan if epoch is None else epoch)
+
+    def finish(self):
+        if self._pending:
+            self._flush()
+        fps = self.video_info.get("fps") or 30.0
+        video_times = [i / fps for i in self.frames]
+        analysis = analyze_timeline(self.frames, video_times, self.clock)
+        analysis["sample_seconds"] = self.sample_seconds
+        analysis["ocr_cache"] = self.change.stats()
+        analysis["observations"] = [
+            {"frame": f, "text": t, "raw": r, "epoch": None if np.isnan(e) else float(e)}
+            for f, t, r, e in zip(self.frames, self.texts, self.raws, self.clock)
+        ]
+        return analysis